@@ -0,0 +1,323 @@
+from math import sqrt
+from statistics import NormalDist
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+def z_value(confidence: float) -> float:
+    """Two-sided critical value of the normal distribution for a confidence level"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+class RunningStats:
+    """
+    Streaming mean and variance of a series of outcomes
+
+    Outcomes are folded in one at a time with Welford's update, so the
+    accumulator holds a few numbers whatever the number of trials, and
+    accumulators of separate runs (e.g. of the workers of a pool) combine
+    exactly with :meth:`merge`.
+    """
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self, values: Iterable[float] = ()):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        for x in values:
+            self.add(x)
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Fold the outcomes of ``other`` into this accumulator"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (0 until there are two outcomes)"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return sqrt(self.variance)
+
+    @property
+    def sem(self) -> float:
+        """Standard error of the mean"""
+        return sqrt(self.variance / self.count) if self.count else float('inf')
+
+    def half_width(self, confidence: float = 0.95) -> float:
+        """Half the width of the normal confidence interval of the mean"""
+        return z_value(confidence) * self.sem
+
+    def interval(self, confidence: float = 0.95) -> Tuple[float, float]:
+        half_width = self.half_width(confidence)
+        return self.mean - half_width, self.mean + half_width
+
+    def __repr__(self):
+        return f'RunningStats(count={self.count}, mean={self.mean:.3f}, std={self.std:.3f})'
+
+
+class IntegerHistogram:
+    """
+    Counts of non-negative integer outcomes (counters, meld, scores)
+
+    Outcomes of a hand take few distinct values, so the histogram keeps the
+    whole distribution in a small array: quantiles and the CDF are exact,
+    and histograms of separate runs add up with :meth:`merge`.
+    """
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.extend(values)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def _grow(self, size: int):
+        if size > len(self.counts):
+            counts = np.zeros(max(size, 2 * len(self.counts)), dtype=np.int64)
+            counts[:len(self.counts)] = self.counts
+            self.counts = counts
+
+    def add(self, x: int):
+        if x < 0:
+            raise ValueError(f'Histogram values must be non-negative, got {x}')
+        self._grow(x + 1)
+        self.counts[x] += 1
+
+    def extend(self, values: Iterable[int]):
+        values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=np.int64)
+        if not len(values):
+            return
+        if values.min() < 0:
+            raise ValueError(f'Histogram values must be non-negative, got {values.min()}')
+        counts = np.bincount(values)
+        self._grow(len(counts))
+        self.counts[:len(counts)] += counts
+
+    def merge(self, other: 'IntegerHistogram') -> 'IntegerHistogram':
+        self._grow(len(other.counts))
+        self.counts[:len(other.counts)] += other.counts
+        return self
+
+    def stats(self) -> RunningStats:
+        """Mean and variance of the outcomes counted so far"""
+        stats = RunningStats()
+        values = np.nonzero(self.counts)[0]
+        if not len(values):
+            return stats
+        weights = self.counts[values]
+        stats.count = int(weights.sum())
+        stats.mean = float(np.dot(values, weights) / stats.count)
+        stats._m2 = float(np.dot((values - stats.mean) ** 2, weights))
+        stats.min, stats.max = int(values[0]), int(values[-1])
+        return stats
+
+    def cdf(self, x: int) -> float:
+        """Fraction of the outcomes that are at most ``x``"""
+        total = self.count
+        if not total or x < 0:
+            return 0.0
+        return float(self.counts[:x + 1].sum() / total)
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Smallest outcome with at least a fraction ``q`` of the outcomes at or below it"""
+        total = self.count
+        if not total:
+            return None
+        cumulative = np.cumsum(self.counts)
+        return int(np.searchsorted(cumulative, max(q * total, 1), side='left'))
+
+    def values(self) -> np.ndarray:
+        """All the outcomes in increasing order"""
+        return np.repeat(np.arange(len(self.counts)), self.counts)
+
+
+class PairedComparison:
+    """
+    Statistics of candidates evaluated on the same trials
+
+    When every candidate is scored on the same random trial (common random
+    numbers), the noise the candidates share cancels out of their
+    differences, so the difference of two candidates is estimated from the
+    trial-by-trial differences rather than from their separate means. The
+    differences of every pair are accumulated as the trials come in.
+    """
+
+    def __init__(self, keys: Iterable[Hashable]):
+        self.keys = list(keys)
+        self.stats = {key: RunningStats() for key in self.keys}
+        self._differences = {
+            (a, b): RunningStats() for i, a in enumerate(self.keys) for b in self.keys[i + 1:]
+        }
+
+    def add(self, outcomes: Dict[Hashable, float]):
+        """Record the outcomes of the candidates (all or some of them) on one trial"""
+        for key, outcome in outcomes.items():
+            self.stats[key].add(outcome)
+        for (a, b), stats in self._differences.items():
+            if a in outcomes and b in outcomes:
+                stats.add(outcomes[a] - outcomes[b])
+
+    def difference(self, a: Hashable, b: Hashable) -> RunningStats:
+        """Statistics of the outcome of ``a`` minus the outcome of ``b``"""
+        if a == b:
+            stats = RunningStats()
+            stats.count = self.stats[a].count
+            stats.min = stats.max = 0
+            return stats
+        if (a, b) in self._differences:
+            return self._differences[(a, b)]
+        stats = self._differences[(b, a)]
+        mirrored = RunningStats()
+        if not stats.count:
+            return mirrored
+        mirrored.count, mirrored.mean, mirrored._m2 = stats.count, -stats.mean, stats._m2
+        mirrored.min, mirrored.max = -stats.max, -stats.min
+        return mirrored
+
+    def best(self, maximize: bool = True, keys: Optional[Iterable[Hashable]] = None) -> Hashable:
+        sign = 1 if maximize else -1
+        return max(self.keys if keys is None else keys, key=lambda key: sign * self.stats[key].mean)
+
+
+class StoppingRule:
+    """
+    When a simulation has run enough trials
+
+    A single estimate is done when the confidence interval of its mean is
+    at most ``ci_width`` wide. A comparison of several candidates is done
+    when every interval is that narrow, or as soon as a winner is clear:
+    the interval of the best mean lies above the intervals of all the others.
+    Nothing stops before ``min_trials`` trials, which keeps the normal
+    approximation (and the checks made after every trial) honest.
+
+    Parameters
+    ----------
+    ci_width: float, optional
+        Target width of the confidence intervals; without it, only a clear
+        winner stops a comparison early
+    confidence: float
+        Confidence level of the intervals
+    min_trials: int
+        Trials to run (per candidate) before stopping can be considered
+    """
+
+    def __init__(self, ci_width: Optional[float] = None, confidence: float = 0.95, min_trials: int = 30):
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.min_trials = min_trials
+        self.z = z_value(confidence)
+
+    def converged(self, stats: RunningStats) -> bool:
+        """Whether the interval of one estimate is narrow enough"""
+        if self.ci_width is None or stats.count < max(self.min_trials, 2):
+            return False
+        return 2 * self.z * sqrt(stats.variance / stats.count) <= self.ci_width
+
+    def winner(self, stats: Dict[Hashable, RunningStats], maximize: bool = True) -> Optional[Hashable]:
+        """The candidate whose interval lies above all the others, if there is one"""
+        if len(stats) < 2 or any(s.count < max(self.min_trials, 2) for s in stats.values()):
+            return None
+        sign = 1 if maximize else -1
+        best = max(stats, key=lambda key: sign * stats[key].mean)
+        best_bound = sign * stats[best].mean - self.z * stats[best].sem
+        for key, other in stats.items():
+            if key != best and sign * other.mean + self.z * other.sem >= best_bound:
+                return None
+        return best
+
+    def dominated(
+        self,
+        comparison: PairedComparison,
+        keys: Optional[Iterable[Hashable]] = None,
+        paired: bool = False,
+        maximize: bool = True,
+    ) -> List[Hashable]:
+        """
+        Candidates (among ``keys``, all by default) that are clearly worse than
+        the best one: their interval lies below the interval of the best mean
+        or, when ``paired``, their difference to the best is clearly negative
+        """
+        keys = comparison.keys if keys is None else list(keys)
+        if any(comparison.stats[key].count < max(self.min_trials, 2) for key in keys):
+            return []
+        sign = 1 if maximize else -1
+        best = comparison.best(maximize, keys)
+        best_stats = comparison.stats[best]
+        dominated = []
+        for key in keys:
+            if key == best:
+                continue
+            if paired:
+                difference = comparison.difference(best, key)
+                clear = sign * difference.mean - self.z * difference.sem > 0
+            else:
+                other = comparison.stats[key]
+                clear = sign * best_stats.mean - self.z * best_stats.sem > sign * other.mean + self.z * other.sem
+            if clear:
+                dominated.append(key)
+        return dominated
+
+    def paired_winner(
+        self,
+        comparison: PairedComparison,
+        keys: Optional[Iterable[Hashable]] = None,
+        maximize: bool = True,
+    ) -> Optional[Hashable]:
+        """The candidate whose differences to all the others are clearly in its favour, if there is one"""
+        keys = comparison.keys if keys is None else list(keys)
+        if len(keys) < 2 or len(self.dominated(comparison, keys, True, maximize)) < len(keys) - 1:
+            return None
+        return comparison.best(maximize, keys)
+
+    def settled(self, stats: Dict[Hashable, RunningStats], maximize: bool = True) -> bool:
+        """Whether a comparison of candidates can stop"""
+        if stats and all(self.converged(s) for s in stats.values()):
+            return True
+        return self.winner(stats, maximize) is not None
+
+    def paired_settled(
+        self,
+        comparison: PairedComparison,
+        keys: Optional[Iterable[Hashable]] = None,
+        maximize: bool = True,
+    ) -> bool:
+        """
+        Whether a paired comparison can stop: a winner is clear, or the
+        differences to the best candidate are all known to ``ci_width``
+        """
+        keys = comparison.keys if keys is None else list(keys)
+        best = comparison.best(maximize, keys)
+        others = [comparison.difference(key, best) for key in keys if key != best]
+        if others and all(self.converged(d) for d in others):
+            return True
+        return self.paired_winner(comparison, keys, maximize) is not None
@@ -0,0 +1,385 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+import json
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from GameLogic.cards import (
+    Card,
+    Hand,
+    PinochleDeck,
+    DoublePinochleDeck,
+    FirehousePinochleDeck,
+)
+from GameLogic.games import (
+    Pinochle,
+    DoubleDeckPinochle,
+    FirehousePinochle,
+)
+from GameLogic.meld import Meld
+from GameLogic.players import RandomPinochlePlayer, SimplePinochlePlayer
+from GameLogic.rng import make_rng
+from GameLogic.state_log import StateLog
+from GameLogic.tricks import Trick
+
+
+SEED = 1234
+
+# Root of the repository, from which fresh interpreters import GameLogic
+base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only print or plot, which importing the engine must not load
+presentation_modules = ('termcolor', 'matplotlib', 'torch')
+
+# Import time of the engine allowed by --check_imports, in milliseconds
+IMPORT_BUDGET_MS = 300.0
+
+# Registry of benchmark name -> (setup function, number of operations per call)
+benchmarks = {}
+
+
+def benchmark(name: str, ops: int):
+    """
+    Register a benchmark
+
+    The decorated function does the (untimed) setup with a fixed seed and
+    returns the callable to time, which performs ``ops`` operations.
+    """
+    def register(setup: Callable[[], Callable[[], None]]):
+        benchmarks[name] = (setup, ops)
+        return setup
+    return register
+
+
+def _random_hands(deck_type: type, n: int, seed: int = SEED) -> List[Hand]:
+    rng = make_rng(seed)
+    return [deck_type.get_random_hand(rng=rng) for _ in range(n)]
+
+
+@benchmark('card_compare', ops=10_000)
+def _card_compare():
+    PinochleDeck()
+    rng = make_rng(SEED)
+    cards = Card.one_of_each()
+    pairs = [(cards[i], cards[j]) for i, j in rng.integers(len(cards), size=(10_000, 2))]
+
+    def run():
+        for a, b in pairs:
+            a < b
+            a == b
+    return run
+
+
+@benchmark('hand_add_discard', ops=1_000)
+def _hand_add_discard():
+    hands = _random_hands(FirehousePinochleDeck, 1_000)
+    cards = [hand.cards[0] for hand in hands]
+
+    def run():
+        for hand, card in zip(hands, cards):
+            hand.discard(card)
+            hand.add_card(card)
+    return run
+
+
+def _meld_construction(deck_type: type):
+    def setup():
+        hands = _random_hands(deck_type, 200)
+
+        def run():
+            for hand in hands:
+                Meld(hand)
+        return run
+    return setup
+
+
+benchmark('meld_construction[single]', ops=200)(_meld_construction(PinochleDeck))
+benchmark('meld_construction[firehouse]', ops=200)(_meld_construction(FirehousePinochleDeck))
+
+
+@benchmark('trick_legal_plays', ops=2_000)
+def _trick_legal_plays():
+    rng = make_rng(SEED)
+    cases = []
+    for _ in range(2_000):
+        deck = DoublePinochleDeck(rng=rng)
+        deck.shuffle()
+        hands = [Hand(deck.deal_hand()) for _ in range(4)]
+        trump = Card.suits[rng.integers(len(Card.suits))]
+        trick = Trick(4, trump)
+        for hand in hands[:rng.integers(4)]:
+            trick.add_card(trick.legal_plays(hand)[0], None)
+        cases.append((trick, hands[3]))
+
+    def run():
+        for trick, hand in cases:
+            trick.legal_plays(hand)
+    return run
+
+
+def _play_hand(game_type: type, player_type: type, n_hands: int):
+    def setup():
+        def run():
+            players = [player_type(f'P{idx}') for idx in range(game_type.rules.n_players)]
+            game = game_type(players)
+            game.seed(SEED)
+            for _ in range(n_hands):
+                game.play_hand()
+        return run
+    return setup
+
+
+for _game_name, _game_type in (('single', Pinochle), ('double', DoubleDeckPinochle), ('firehouse', FirehousePinochle)):
+    for _player_name, _player_type in (('random', RandomPinochlePlayer), ('simple', SimplePinochlePlayer)):
+        benchmark(f'play_hand[{_game_name}-{_player_name}]', ops=20)(_play_hand(_game_type, _player_type, 20))
+
+
+def _logged_hand_states(game_type: type = FirehousePinochle) -> list:
+    players = [SimplePinochlePlayer(f'P{idx}') for idx in range(game_type.rules.n_players)]
+    game = game_type(players, logging=True)
+    game.seed(SEED)
+    game.play_hand()
+    return game._state_log
+
+
+@benchmark('get_state', ops=100)
+def _get_state():
+    states = [s for s in _logged_hand_states() if isinstance(s, dict) and s['trick'] is not None]
+    game = Pinochle.restore_state(states[len(states) // 2])
+
+    def run():
+        for _ in range(100):
+            game.get_state()
+    return run
+
+
+@benchmark('restore_state', ops=100)
+def _restore_state():
+    states = [s for s in _logged_hand_states() if isinstance(s, dict) and s['trick'] is not None]
+    state = states[len(states) // 2]
+
+    def run():
+        for _ in range(100):
+            Pinochle.restore_state(state)
+    return run
+
+
+@benchmark('state_log_indexing', ops=1)
+def _state_log_indexing():
+    log = _logged_hand_states()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'state_log.json')
+        with open(filename, 'w') as f:
+            json.dump({'state_log': log, 'timestamp': 'benchmark'}, f)
+        state_log = StateLog(filename)
+
+    def run():
+        state_log.get_card_play_indices()
+    return run
+
+
+@benchmark('import_game_logic', ops=1)
+def _import_game_logic():
+    # A fresh interpreter pays the full import, like every spawned worker of a pool
+    command = [sys.executable, '-c', 'import GameLogic.games']
+
+    def run():
+        subprocess.run(command, cwd=base_path, check=True)
+    return run
+
+
+# Run in a fresh interpreter by check_imports: time the import, and list the
+# presentation modules it loaded and the processes it started
+_import_probe = '''
+import json, sys, time
+spawned = []
+sys.addaudithook(lambda event, args: spawned.append(event) if event in {events!r} else None)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'presentation_modules': [name for name in {presentation!r} if name in sys.modules],
+    'subprocesses': spawned,
+}}))
+'''
+
+
+def check_imports(module: str = 'GameLogic.games', repeats: int = 5) -> dict:
+    """
+    Measure the cost of importing ``module`` in fresh interpreters
+
+    Returns
+    -------
+    dict
+        Best and median import times in milliseconds, with the presentation
+        modules the import loaded and the processes it started (both should
+        be empty)
+    """
+    code = _import_probe.format(
+        module=module,
+        presentation=presentation_modules,
+        events=('os.system', 'os.posix_spawn', 'os.exec', 'subprocess.Popen'),
+    )
+    probes = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=base_path, check=True,
+                                capture_output=True, text=True).stdout
+        probes.append(json.loads(output.strip().splitlines()[-1]))
+
+    times = [1e3 * probe['seconds'] for probe in probes]
+    return {
+        'module': module,
+        'repeats': repeats,
+        'best_ms': min(times),
+        'median_ms': median(times),
+        'presentation_modules': probes[0]['presentation_modules'],
+        'subprocesses': probes[0]['subprocesses'],
+    }
+
+
+def time_benchmark(run: Callable[[], None], ops: int, repeats: int, min_time: float) -> dict:
+    """Time ``run`` with enough inner loops to last ``min_time`` seconds per repeat"""
+    run()  # Warm up
+    loops = 1
+    while True:
+        start = perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((perf_counter() - start) / (loops * ops))
+
+    return {
+        'ops': ops,
+        'loops': loops,
+        'repeats': repeats,
+        'best_us': 1e6 * min(times),
+        'median_us': 1e6 * median(times),
+        'mean_us': 1e6 * sum(times) / len(times),
+    }
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None,
+    repeats: int = 5,
+    min_time: float = 0.2,
+    print_func: Callable = print,
+) -> dict:
+    """
+    Run the registered benchmarks and return the machine-readable results
+
+    Parameters
+    ----------
+    names: List[str], optional
+        Substrings selecting the benchmarks to run; all are run by default
+    repeats: int
+        Number of timed repeats; the best and median times are reported
+    min_time: float
+        Minimum duration of a single repeat, in seconds
+    print_func: Callable
+        Function used to report progress
+
+    Returns
+    -------
+    dict
+        Metadata about the environment and the timing of each benchmark
+        in microseconds per operation
+    """
+    results = {}
+    for name, (setup, ops) in benchmarks.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        results[name] = time_benchmark(setup(), ops, repeats, min_time)
+        print_func(f'{name:<40}{results[name]["best_us"]:>12.2f} us/op (median {results[name]["median_us"]:.2f})')
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'seed': SEED,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'benchmarks': results,
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.2) -> Dict[str, float]:
+    """Return the benchmarks whose best time regressed by more than ``tolerance`` (as ratios)"""
+    regressions = {}
+    for name, result in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        ratio = result['best_us'] / baseline['benchmarks'][name]['best_us']
+        if ratio > 1 + tolerance:
+            regressions[name] = ratio
+    return regressions
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    parser = ArgumentParser('Benchmark the GameLogic hot paths')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare with the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown relative to the baseline')
+    parser.add_argument('--filter', type=str, nargs='*', default=None, help='Only run benchmarks containing these names')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of timed repeats per benchmark')
+    parser.add_argument('--min_time', type=float, default=0.2, help='Minimum seconds per repeat')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+    parser.add_argument('--check_imports', action='store_true', help='Check the import time and side effects of GameLogic')
+    parser.add_argument('--import_budget', type=float, default=IMPORT_BUDGET_MS, help='Allowed import time in milliseconds')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(benchmarks))
+        exit()
+
+    results = run_benchmarks(args.filter, repeats=args.repeats, min_time=args.min_time)
+
+    import_problems = []
+    if args.check_imports:
+        imports = results['imports'] = check_imports(repeats=args.repeats)
+        print(f'import {imports["module"]}: {imports["best_ms"]:.1f} ms (median {imports["median_ms"]:.1f}, '
+              f'budget {args.import_budget:.0f})')
+        if imports['median_ms'] > args.import_budget:
+            import_problems.append(f'import took {imports["median_ms"]:.1f} ms, over the budget of {args.import_budget:.0f} ms')
+        if imports['presentation_modules']:
+            import_problems.append(f'import loaded {", ".join(imports["presentation_modules"])}')
+        if imports['subprocesses']:
+            import_problems.append(f'import started processes ({", ".join(imports["subprocesses"])})')
+        for problem in import_problems:
+            print(f'IMPORT {problem}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Wrote results to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for name, ratio in regressions.items():
+            print(f'REGRESSION {name}: {ratio:.2f}x slower than baseline')
+        if regressions:
+            exit(1)
+
+    if import_problems:
+        exit(1)
@@ -0,0 +1,396 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+from GameLogic.accumulators import IntegerHistogram
+from GameLogic.cards import Card
+from GameLogic.games import (
+    Pinochle,
+    DoubleDeckPinochle,
+    FirehousePinochle,
+)
+from GameLogic.meld import Meld
+from GameLogic.rng import SeedLike, make_rng
+from GameLogic.rules import RuleSet, rules_grid
+
+
+def deal_counts(rules: RuleSet, n_deals: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Deal ``n_deals`` random deals at once
+
+    Returns
+    -------
+    np.ndarray
+        Card counts of shape (n_deals, n_players, 4 suits, n_values), with
+        values ordered as in ``rules.deck_type.values`` (low to high)
+    """
+    deck_type = rules.deck_type
+    n_values = len(deck_type.values)
+    n_types = len(Card.suits) * n_values
+    n_players = rules.n_players
+    n_dealt = n_players * deck_type.cards_per_hand
+
+    deck = np.repeat(np.arange(n_types, dtype=np.int32), deck_type.card_instances)
+    shuffled = rng.permuted(np.broadcast_to(deck, (n_deals, len(deck))), axis=1)[:, :n_dealt]
+
+    # Deal consecutive blocks of cards to the players, like Deck.deal_hand
+    seat = np.arange(n_dealt) // deck_type.cards_per_hand
+    flat = (np.arange(n_deals)[:, None] * n_players + seat[None, :]) * n_types + shuffled
+    counts = np.bincount(flat.ravel(), minlength=n_deals * n_players * n_types)
+    return counts.reshape(n_deals, n_players, len(Card.suits), n_values).astype(np.int8)
+
+
+class HandArrays:
+    """
+    Vectorized equivalent of :class:`Meld` for many hands at once
+
+    All arrays are indexed like the counts they are built from, with a
+    trailing suit axis (ordered as ``Card.suits``) where it applies.
+    """
+
+    def __init__(self, counts: np.ndarray, values: Sequence[str]):
+        self.counts = counts
+        self.values = list(values)
+        counts = counts.astype(np.int64)
+
+        def value(v):
+            return counts[..., self.values.index(v)]
+
+        def worth_table(worth: Dict[int, int]) -> np.ndarray:
+            return np.array([worth.get(i, 0) for i in range(max(worth) + 1)], dtype=np.int64)
+
+        suit_idx = {suit: idx for idx, suit in enumerate(Card.suits)}
+
+        # Meld that does not depend on trump
+        marriages = np.minimum(value('Q'), value('K'))
+        pinochles = np.minimum(counts[..., suit_idx['Spades'], self.values.index('Q')],
+                               counts[..., suit_idx['Diamonds'], self.values.index('J')])
+        around = np.zeros(counts.shape[:-2], dtype=np.int64)
+        for v, worth in Meld.card_around_meld_worth.items():
+            if v in self.values:
+                n = value(v).min(axis=-1)
+                around += np.where(n > 0, worth * 10 ** np.maximum(n - 1, 0), 0)
+
+        self.marriage_melds = marriages * Meld.marriage_meld_worth
+        self.pinochle_meld = worth_table(Meld.pinochle_meld_worth)[pinochles]
+        self.meld_without_trump = self.marriage_melds.sum(axis=-1) + self.pinochle_meld + around
+
+        # Meld that depends on trump
+        families = np.stack([value(v) for v in Meld.family], axis=-1).min(axis=-1)
+        self.family_melds = worth_table(Meld.family_meld_worth)[families]
+        nines = value('9') * Meld.nine_of_trump_worth if '9' in self.values else 0
+        self.total_meld_given_trump = (self.meld_without_trump[..., None] + self.marriage_melds
+                                       + self.family_melds + nines)
+
+        # Power and rank used by the simple bidding strategy
+        n_suit = counts.sum(axis=-1)
+        weights = np.arange(len(self.values)) ** 2
+        self.power = n_suit * (counts * weights).sum(axis=-1)
+        self.has_marriage = self.marriage_melds > 0
+        self.rank = np.where(self.has_marriage, self.total_meld_given_trump * 5 + self.power, 0)
+
+        # First suit with the highest rank, like Meld.best_ranked_suit
+        self.best_ranked_suit = self.rank.argmax(axis=-1)
+        self.best_meld = np.take_along_axis(self.total_meld_given_trump, self.best_ranked_suit[..., None], -1)[..., 0]
+        self.best_rank = self.rank.max(axis=-1)
+
+
+class BidPolicy:
+    """
+    Vectorized bidding strategy
+
+    A policy returns, for every hand, the highest bid the player is
+    willing to make. The player keeps raising by the bid increment while
+    the next bid does not exceed this amount, like
+    :meth:`SimplePinochlePlayer.place_bid`. A value of 0 always passes.
+    """
+
+    def max_bids(self, hands: HandArrays) -> np.ndarray:
+        """Highest bid of each hand; the base policy always passes"""
+        return np.zeros(hands.best_meld.shape, dtype=np.int64)
+
+
+class PassPolicy(BidPolicy):
+    """Always pass, like :class:`RandomPinochlePlayer`"""
+
+
+class MeldPlusOffsetPolicy(BidPolicy):
+    """Bid up to the meld of the best ranked suit plus ``offset``"""
+
+    def __init__(self, offset: int = 20):
+        self.offset = offset
+
+    def max_bids(self, hands: HandArrays) -> np.ndarray:
+        return hands.best_meld + self.offset
+
+
+class RankThresholdPolicy(MeldPlusOffsetPolicy):
+    """Bid up to meld plus ``offset``, but only with a best suit rank of at least ``threshold``"""
+
+    def __init__(self, threshold: int, offset: int = 20):
+        super().__init__(offset)
+        self.threshold = threshold
+
+    def max_bids(self, hands: HandArrays) -> np.ndarray:
+        return np.where(hands.best_rank >= self.threshold, super().max_bids(hands), 0)
+
+
+class BiddingResults:
+
+    def __init__(self, high_bidder: np.ndarray, final_bid: np.ndarray, dropped: np.ndarray,
+                 trump: np.ndarray, bidder_meld: np.ndarray):
+        self.high_bidder = high_bidder
+        self.final_bid = final_bid
+        self.dropped = dropped
+        self.trump = trump
+        self.bidder_meld = bidder_meld
+
+    @staticmethod
+    def concatenate(results: List['BiddingResults']) -> 'BiddingResults':
+        return BiddingResults(*[
+            np.concatenate([getattr(r, name) for r in results])
+            for name in ('high_bidder', 'final_bid', 'dropped', 'trump', 'bidder_meld')
+        ])
+
+    def __len__(self):
+        return len(self.final_bid)
+
+    def summary(self) -> dict:
+        n_seats = int(self.high_bidder.max()) + 1 if len(self) else 0
+        taken = self.final_bid[~self.dropped]
+        return {
+            'n_deals': len(self),
+            'dropped_rate': float(self.dropped.mean()) if len(self) else 0.0,
+            'high_bidder_rate': (np.bincount(self.high_bidder, minlength=n_seats) / max(len(self), 1)).tolist(),
+            'mean_final_bid': float(self.final_bid.mean()) if len(self) else 0.0,
+            'mean_taken_bid': float(taken.mean()) if len(taken) else 0.0,
+            'taken_bid_quantiles': np.percentile(taken, [10, 50, 90]).tolist() if len(taken) else [],
+        }
+
+
+class BidLadder:
+    """
+    Chances of saving every bid with one hand and trump suit
+
+    Built from the points the high bidder's side made in simulated hands
+    (counters of the bidder and its partner plus the bidder's meld, as in
+    :meth:`Pinochle.update_scores`). The play of a hand does not depend on
+    the bid, so one simulation answers every bid: a bid is saved in the
+    trials that made at least that many points, and scores the points made
+    when saved or loses the bid when set.
+
+    Parameters
+    ----------
+    trump: str
+        Trump suit of the simulated hands
+    points: array of int
+        Points of the bidder's side in each trial
+    rules: RuleSet
+        Minimum bid and bid increment of the ladder
+    """
+
+    def __init__(self, trump: str, points: Sequence[int], rules: RuleSet):
+        self.trump = trump
+        self.rules = rules
+        self.points = IntegerHistogram(points)
+        self.n_trials = self.points.count
+
+        # Number of trials making at least x points, and the sum of their points
+        counts = self.points.counts
+        self.max_points = int(np.nonzero(counts)[0][-1]) if self.n_trials else 0
+        self._at_least = np.cumsum(counts[::-1])[::-1]
+        self._points_at_least = np.cumsum((counts * np.arange(len(counts)))[::-1])[::-1]
+
+    def save_probability(self, bid: int) -> float:
+        """Fraction of the trials that saved ``bid``, i.e. ``1 - points.cdf(bid - 1)``"""
+        if not self.n_trials or bid >= len(self._at_least):
+            return 0.0
+        return float(self._at_least[max(bid, 0)] / self.n_trials)
+
+    def expected_score(self, bid: int) -> float:
+        """Mean change of the bidder's score: the points made when saved, minus the bid when set"""
+        if not self.n_trials:
+            return 0.0
+        saved_points = self._points_at_least[bid] if 0 <= bid < len(self._at_least) else 0
+        p_save = self.save_probability(bid)
+        return float(saved_points / self.n_trials - bid * (1 - p_save))
+
+    def bids(self) -> List[int]:
+        """Bids from the minimum bid up to the most points made, by the bid increment"""
+        rules = self.rules
+        top = max(self.max_points, rules.minimum_bid_amt)
+        return list(range(rules.minimum_bid_amt, top + 1, rules.bid_increment_amt))
+
+    def ladder(self) -> List[dict]:
+        """Save probability and expected score of every bid"""
+        return [
+            {'bid': bid, 'save_probability': self.save_probability(bid), 'expected_score': self.expected_score(bid)}
+            for bid in self.bids()
+        ]
+
+    def max_bid(self, min_save_probability: float = 0.5) -> Optional[int]:
+        """Highest bid saved at least this often, or None"""
+        bids = [bid for bid in self.bids() if self.save_probability(bid) >= min_save_probability]
+        return bids[-1] if bids else None
+
+
+def run_auction(max_bids: np.ndarray, rules: RuleSet):
+    """
+    Play out the bidding of :meth:`Pinochle.bidding_process` for many deals at once
+
+    Players are asked in seat order, skipping those who passed, until all
+    but one have passed. Each player bids the next increment while it does
+    not exceed their maximum bid, and passes for good otherwise.
+
+    Parameters
+    ----------
+    max_bids: np.ndarray
+        Highest bid of each seat, shape (n_deals, n_players)
+
+    Returns
+    -------
+    np.ndarray
+        Seat of the high bidder of each deal
+    np.ndarray
+        High bid of each deal; equal to the starting amount when no one bid
+    """
+    n_deals, n_players = max_bids.shape
+    bid_increment_amt = rules.bid_increment_amt
+    high_bid = np.full(n_deals, rules.start_bid_amt, dtype=np.int64)
+    high_bidder = np.full(n_deals, n_players - 1, dtype=np.int64)
+    passed = np.zeros((n_deals, n_players), dtype=bool)
+
+    active = np.arange(n_deals)
+    seat = 0
+    while len(active):
+        asked = active[~passed[active, seat]]
+        next_bid = high_bid[asked] + bid_increment_amt
+        bids = next_bid <= max_bids[asked, seat]
+        high_bid[asked[bids]] = next_bid[bids]
+        high_bidder[asked[bids]] = seat
+        passed[asked[~bids], seat] = True
+
+        active = active[passed[active].sum(axis=1) < n_players - 1]
+        seat = (seat + 1) % n_players
+
+    return high_bidder, high_bid
+
+
+def simulate_bidding(
+    game_type: type,
+    policies: Union[BidPolicy, Sequence[BidPolicy]],
+    n_deals: int,
+    seed: SeedLike = None,
+    chunk_size: int = 100_000,
+    rules: Optional[RuleSet] = None,
+) -> BiddingResults:
+    """
+    Simulate only the bidding of many random deals
+
+    Parameters
+    ----------
+    game_type: type[Pinochle]
+        Game variant, which gives the default rule set
+    policies: BidPolicy or Sequence[BidPolicy]
+        Bidding strategy of every seat, or one per seat in bidding order
+    n_deals: int
+        Number of random deals
+    seed: int, optional
+        Seed of the deals
+    chunk_size: int
+        Number of deals processed at once, which bounds the memory used
+    rules: RuleSet, optional
+        Settings to use instead of the rules of ``game_type``
+
+    Returns
+    -------
+    BiddingResults
+        High bidder, final bid, whether the bid was dropped, and the trump
+        suit (best ranked suit) and meld of the high bidder for each deal
+    """
+    rules = game_type.rules if rules is None else rules
+    if isinstance(policies, BidPolicy):
+        policies = [policies] * rules.n_players
+
+    rng = make_rng(seed)
+    results = []
+    for start in range(0, n_deals, chunk_size):
+        n = min(chunk_size, n_deals - start)
+        hands = HandArrays(deal_counts(rules, n, rng), rules.deck_type.values)
+        max_bids = np.stack([policy.max_bids(hands)[:, seat] for seat, policy in enumerate(policies)], axis=1)
+
+        high_bidder, high_bid = run_auction(max_bids, rules)
+        dropped = high_bid == rules.start_bid_amt
+        rows = np.arange(n)
+        results.append(BiddingResults(
+            high_bidder=high_bidder,
+            final_bid=np.where(dropped, rules.dropped_bid_amt, high_bid),
+            dropped=dropped,
+            trump=hands.best_ranked_suit[rows, high_bidder],
+            bidder_meld=hands.best_meld[rows, high_bidder],
+        ))
+
+    return BiddingResults.concatenate(results)
+
+
+def simulate_bidding_over_rules(
+    game_type: type,
+    policies: Union[BidPolicy, Sequence[BidPolicy]],
+    rule_sets: Sequence[RuleSet],
+    n_deals: int,
+    seed: SeedLike = None,
+    chunk_size: int = 100_000,
+) -> Dict[RuleSet, BiddingResults]:
+    """
+    Simulate the bidding under each rule set
+
+    Every rule set sees the same deals (as long as the deck and the number
+    of players are the same), so differences between the results come
+    from the rules and not from the cards.
+    """
+    if seed is None or isinstance(seed, np.random.Generator):
+        seed = int(make_rng(seed).integers(2 ** 63))
+    return {
+        rules: simulate_bidding(game_type, policies, n_deals, seed=seed, chunk_size=chunk_size, rules=rules)
+        for rules in rule_sets
+    }
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    from time import time
+
+    parser = ArgumentParser('Simulate the bidding of many random deals')
+    parser.add_argument('--game', type=str, default='firehouse', choices=['single', 'double', 'firehouse'], help='Game variant')
+    parser.add_argument('--deals', type=int, default=1_000_000, help='Number of deals')
+    parser.add_argument('--offsets', type=int, nargs='+', default=[10, 20, 30], help='Meld-plus-offset policies to compare')
+    parser.add_argument('--minimum_bid', type=int, nargs='+', default=None, help='Minimum bids to compare')
+    parser.add_argument('--dropped_bid', type=int, nargs='+', default=None, help='Dropped bids to compare')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the deals')
+    args = parser.parse_args()
+
+    game_types = {
+        'single': Pinochle,
+        'double': DoubleDeckPinochle,
+        'firehouse': FirehousePinochle,
+    }
+
+    game_type = game_types[args.game]
+    options = {}
+    if args.minimum_bid:
+        options['minimum_bid_amt'] = args.minimum_bid
+    if args.dropped_bid:
+        options['dropped_bid_amt'] = args.dropped_bid
+    rule_sets = list(rules_grid(game_type.rules, **options))
+
+    for offset in args.offsets:
+        start = time()
+        results = simulate_bidding_over_rules(game_type, MeldPlusOffsetPolicy(offset), rule_sets, args.deals, seed=args.seed)
+        print(f'Meld + {offset} ({round(time() - start, 1)} seconds)')
+        for rules, result in results.items():
+            settings = ', '.join(f'{name}={getattr(rules, name)}' for name in options)
+            print(f'  {settings or "default rules"}: {result.summary()}')
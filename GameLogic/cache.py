@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+import numpy as np
+
+from GameLogic.rng import SeedLike
+
+
+class SimulationCache:
+    """
+    On-disk cache of simulation results, keyed by the content of the simulation
+
+    Results are arrays of integer outcomes indexed by trial number (e.g. the
+    counters and meld of every trial of :func:`simulate_full_hand`). Trials
+    are seeded from the master seed and their index, so a cached array is a
+    prefix of any longer run with the same inputs: a repeated analysis reads
+    it back, and a larger one only runs the trials that are missing.
+
+    Entries live in one SQLite file. Once the stored arrays pass ``max_bytes``,
+    the least recently used entries are evicted.
+
+    Parameters
+    ----------
+    path: str
+        File of the cache, created if needed
+    max_bytes: int
+        Size of the stored arrays above which old entries are evicted
+    """
+
+    def __init__(self, path: str = 'logs/simulation_cache.sqlite', max_bytes: int = 256 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, dtype TEXT, shape TEXT, data BLOB, size INTEGER, last_used REAL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self.connection.commit()
+
+    @staticmethod
+    def key(kind: str, **parts) -> str:
+        """Digest of the kind of simulation and everything its results depend on"""
+        text = json.dumps({'kind': kind, **parts}, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.connection.execute('SELECT dtype, shape, data FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        self.connection.commit()
+        dtype, shape, data = row
+        return np.frombuffer(data, dtype=dtype).reshape(json.loads(shape)).copy()
+
+    def put(self, key: str, results: np.ndarray):
+        results = np.ascontiguousarray(results)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+            (key, results.dtype.str, json.dumps(results.shape), results.tobytes(), results.nbytes, time.time()),
+        )
+        self._evict()
+        self.connection.commit()
+
+    def _evict(self):
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY last_used').fetchall():
+            self.connection.execute('DELETE FROM results WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        self.connection.execute('DELETE FROM results')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def seed_key(seed: SeedLike) -> Optional[list]:
+    """
+    Cache key part of a master seed
+
+    Unseeded runs share one entry (``None``): their trials are independent
+    random samples, so any of them can extend the others. Generators have
+    no stable identity and are treated like unseeded runs.
+    """
+    if seed is None or isinstance(seed, np.random.Generator):
+        return None
+    if isinstance(seed, np.random.SeedSequence):
+        return [str(seed.entropy), list(seed.spawn_key)]
+    return [str(seed), []]
@@ -1,11 +1,9 @@
-from typing import Iterable, List
-import copy
+from typing import Iterable, List, Optional
 import numpy as np
 from itertools import product
-from termcolor import colored
 
-import os
-os.system('color')
+from GameLogic.rng import get_rng, choose
+from GameLogic.terminal import colored
 
 
 class Card:
@@ -39,16 +37,16 @@ class Card:
         Card.suit_colors = {'Spades': Card.not_red, 'Hearts': Card.red, 'Clubs': Card.not_red, 'Diamonds': Card.red}
 
     @staticmethod
-    def random_suit():
-        return np.random.choice(Card.suits)
+    def random_suit(rng: Optional[np.random.Generator] = None):
+        return choose(get_rng(rng), Card.suits)
 
     @staticmethod
-    def random_value():
-        return np.random.choice(Card.values)
+    def random_value(rng: Optional[np.random.Generator] = None):
+        return choose(get_rng(rng), Card.values)
 
     @staticmethod
-    def random():
-        return Card(Card.random_suit(), Card.random_value())
+    def random(rng: Optional[np.random.Generator] = None):
+        return Card(Card.random_suit(rng), Card.random_value(rng))
 
     @staticmethod
     def restore_state(state: dict) -> 'Card':
@@ -95,8 +93,9 @@ class PartialDeck:
         super().__init_subclass__(**kwargs)
         PartialDeck.type_from_str[cls.__name__] = cls
 
-    def __init__(self, cards):
+    def __init__(self, cards, rng: Optional[np.random.Generator] = None):
         self.cards = cards
+        self.rng = get_rng(rng)
 
     def add_card(self, card: Card):
         self.cards.append(card)
@@ -115,7 +114,7 @@ class PartialDeck:
             self.discard(card)
 
     def shuffle(self):
-        np.random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
 
     def has_suit(self, suit):
         for card in self.cards:
@@ -132,7 +131,7 @@ class PartialDeck:
     def choose_random_card(self):
         if len(self.cards) == 0:
             raise AttributeError('Cannot choose a random card, no cards in the deck')
-        return np.random.choice(self.cards)
+        return choose(self.rng, self.cards)
 
     def clear(self):
         self.cards = []
@@ -173,8 +172,8 @@ class Deck(PartialDeck):
     values = Card.values
     cards_per_hand = 0
 
-    def __init__(self):
-        super().__init__(self.build_deck())
+    def __init__(self, rng: Optional[np.random.Generator] = None):
+        super().__init__(self.build_deck(), rng=rng)
 
     def get_state(self):
         return {
@@ -198,9 +197,9 @@ class PinochleDeck(Deck):
     card_instances = 2
     cards_per_hand = 12
 
-    def __init__(self):
+    def __init__(self, rng: Optional[np.random.Generator] = None):
         Card.values = self.values
-        super().__init__()
+        super().__init__(rng=rng)
 
     @classmethod
     def total_counters(cls):
@@ -225,8 +224,8 @@ class PinochleDeck(Deck):
         return [card for card in cards if not card.is_counter]
 
     @classmethod
-    def get_random_hand(cls):
-        deck = cls()
+    def get_random_hand(cls, rng: Optional[np.random.Generator] = None):
+        deck = cls(rng=rng)
         deck.shuffle()
         return Hand(deck.deal_hand())
 
@@ -237,8 +236,8 @@ class DoublePinochleDeck(PinochleDeck):
     card_instances = 4
     cards_per_hand = 20
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rng: Optional[np.random.Generator] = None):
+        super().__init__(rng=rng)
 
 
 class FirehousePinochleDeck(DoublePinochleDeck):
@@ -247,8 +246,8 @@ class FirehousePinochleDeck(DoublePinochleDeck):
     cards_per_hand = 25
     cards_in_kitty = 5
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rng: Optional[np.random.Generator] = None):
+        super().__init__(rng=rng)
 
     def deal_kitty(self) -> List[Card]:
         cards = self.cards[:self.cards_in_kitty]
@@ -258,8 +257,8 @@ class FirehousePinochleDeck(DoublePinochleDeck):
 
 class Hand(PartialDeck):
 
-    def __init__(self, cards=None):
-        super().__init__(cards or [])
+    def __init__(self, cards=None, rng: Optional[np.random.Generator] = None):
+        super().__init__(cards or [], rng=rng)
         self.sorted_by_suit = {}
         self.sort()
 
@@ -320,18 +319,18 @@ class Hand(PartialDeck):
         if len(self.cards) == 0:
             raise AttributeError('Cannot choose a random card, no cards in the hand')
         if suit is None:
-            return np.random.choice(self.cards)
+            return choose(self.rng, self.cards)
         elif self.has_suit(suit):
-            return np.random.choice(self.sorted_by_suit[suit])
+            return choose(self.rng, self.sorted_by_suit[suit])
         else:
             raise IndexError('Hand does not contain suit {}'.format(suit))
 
     def choose_random_suit(self):
         if len(self.cards) == 0:
             raise AttributeError('Cannot choose a random card, no cards in the hand')
-        suit = Card.random_suit()
+        suit = Card.random_suit(self.rng)
         while not self.has_suit(suit):
-            suit = Card.random_suit()
+            suit = Card.random_suit(self.rng)
         return suit
 
     def enumerate(self):
@@ -352,7 +351,7 @@ class Hand(PartialDeck):
                            for suit in self.sorted_by_suit.values()])
 
     def copy(self):
-        return Hand([card.copy() for card in self.cards])
+        return Hand([card.copy() for card in self.cards], rng=self.rng)
 
     @staticmethod
     def one_of_each():
@@ -373,11 +372,11 @@ class Hand(PartialDeck):
     def __add__(self, other):
         # Todo: test add works as expected
         # Todo: test that new hand cards are not entangled to other hand cards
-        return Hand(self.cards + other.cards)
+        return Hand(self.cards + other.cards, rng=self.rng)
 
     def __sub__(self, other):
         # Todo: test sub works as expected
-        result = copy.deepcopy(self)
+        result = self.copy()
         for card in other:
             try:
                 result.discard(card)
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from typing import Dict, Optional
+import numpy as np
+
+from GameLogic.cache import seed_key
+from GameLogic.rng import SeedLike, as_seed_sequence
+
+
+class Checkpoint:
+    """
+    File keeping the progress of long simulations, so they can resume after an interruption
+
+    A checkpoint holds entries, each keyed like the entries of a
+    :class:`SimulationCache` (a digest of everything the simulation depends
+    on) and made of arrays (e.g. the outcomes of the trials played so far)
+    and of JSON values (e.g. the state of a generator, or the master seed
+    drawn for an unseeded run). A job calls :meth:`update` and :meth:`save`
+    as it goes, and the file is only written every ``interval`` seconds
+    (checking :meth:`due` first saves copying the arrays); a rerun of the job
+    with the same checkpoint reads the entries back and picks up where the
+    last write stopped.
+
+    The whole file is written to a temporary file that replaces the old one,
+    so an interruption while writing leaves the previous checkpoint intact.
+
+    Parameters
+    ----------
+    path: str
+        File of the checkpoint (``.npz``), read back if it exists
+    interval: float
+        Seconds between two writes of the file
+    """
+
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self.entries: Dict[str, dict] = {}
+        self.writes = 0
+        self._last_write = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            self._read()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Entry stored under ``key``, or None"""
+        return self.entries.get(key)
+
+    def update(self, key: str, **values):
+        """Store ``values`` (arrays and JSON values) under ``key``, replacing the stored ones (arrays are copied)"""
+        entry = self.entries.setdefault(key, {})
+        for name, value in values.items():
+            entry[name] = np.array(value) if isinstance(value, np.ndarray) else value
+
+    def master_seed(self, key: str, seed: SeedLike) -> SeedLike:
+        """
+        Master seed of a checkpointed simulation
+
+        Seeded runs keep their seed. An unseeded run (or a run seeded with a
+        generator) draws a master seed and keeps it under ``key``, so a
+        resumed run plays the same trials as the interrupted one.
+        """
+        if seed_key(seed) is not None:
+            return seed
+        entry = self.get(key)
+        if entry is None:
+            entropy = as_seed_sequence(seed).entropy
+            self.update(key, entropy=str(entropy))
+        else:
+            entropy = int(entry['entropy'])
+        return np.random.SeedSequence(entropy)
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_write >= self.interval
+
+    def save(self, force: bool = False) -> bool:
+        """Write the file if ``interval`` seconds passed since the last write (or if forced), and return whether it was written"""
+        if not (force or self.due()):
+            return False
+        self.write()
+        return True
+
+    def write(self):
+        arrays, meta = {}, {}
+        for key, entry in self.entries.items():
+            meta[key] = {'arrays': {}, 'values': {}}
+            for name, value in entry.items():
+                if isinstance(value, np.ndarray):
+                    meta[key]['arrays'][name] = f'a{len(arrays)}'
+                    arrays[f'a{len(arrays)}'] = value
+                else:
+                    meta[key]['values'][name] = value
+        arrays['meta'] = np.array(json.dumps(meta))
+
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self._last_write = time.monotonic()
+        self.writes += 1
+
+    def _read(self):
+        with np.load(self.path, allow_pickle=False) as stored:
+            meta = json.loads(str(stored['meta']))
+            for key, parts in meta.items():
+                entry = dict(parts['values'])
+                for name, array_name in parts['arrays'].items():
+                    entry[name] = stored[array_name]
+                self.entries[key] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """Forget every entry and delete the file (e.g. once a job is done)"""
+        self.entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,109 @@
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional
+
+from GameLogic.cards import Card
+from GameLogic.tricks import Trick
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+    from GameLogic.players import PinochlePlayer
+
+
+class HandStarted(NamedTuple):
+    """A new hand began and the cards have been dealt"""
+    game: 'Pinochle'
+    hand_count: int
+
+
+class BidPlaced(NamedTuple):
+    """A player bid ``bid``, or passed if ``bid`` is None"""
+    game: 'Pinochle'
+    player: 'PinochlePlayer'
+    bid: Optional[int]
+
+
+class TrumpCalled(NamedTuple):
+    game: 'Pinochle'
+    player: 'PinochlePlayer'
+    trump: str
+
+
+class CardsPassed(NamedTuple):
+    game: 'Pinochle'
+    from_player: 'PinochlePlayer'
+    to_player: 'PinochlePlayer'
+    cards: List[Card]
+
+
+class CardPlayed(NamedTuple):
+    """A card was played, ``trick`` already contains the card"""
+    game: 'Pinochle'
+    player: 'PinochlePlayer'
+    card: Card
+    trick: Trick
+
+
+class TrickWon(NamedTuple):
+    game: 'Pinochle'
+    player: 'PinochlePlayer'
+    trick: Trick
+
+
+class HandScored(NamedTuple):
+    game: 'Pinochle'
+    high_bidder: 'PinochlePlayer'
+    high_bid: int
+    saved: bool
+    counters: int
+    meld: int
+
+
+event_types = (HandStarted, BidPlaced, TrumpCalled, CardsPassed, CardPlayed, TrickWon, HandScored)
+
+# Name of the method called on a GameObserver for each event type
+handler_names = {
+    HandStarted: 'on_hand_started',
+    BidPlaced: 'on_bid_placed',
+    TrumpCalled: 'on_trump_called',
+    CardsPassed: 'on_cards_passed',
+    CardPlayed: 'on_card_played',
+    TrickWon: 'on_trick_won',
+    HandScored: 'on_hand_scored',
+}
+
+EventCallback = Callable[[NamedTuple], None]
+
+
+class GameObserver:
+    """
+    Base class for objects watching a game
+
+    Override the ``on_*`` methods of interest and attach the observer with
+    :meth:`Pinochle.attach`; only the overridden methods are subscribed.
+    """
+
+    def on_hand_started(self, event: HandStarted):
+        pass
+
+    def on_bid_placed(self, event: BidPlaced):
+        pass
+
+    def on_trump_called(self, event: TrumpCalled):
+        pass
+
+    def on_cards_passed(self, event: CardsPassed):
+        pass
+
+    def on_card_played(self, event: CardPlayed):
+        pass
+
+    def on_trick_won(self, event: TrickWon):
+        pass
+
+    def on_hand_scored(self, event: HandScored):
+        pass
+
+    def handlers(self):
+        """Yield (event type, bound method) for each overridden handler"""
+        for event_type, name in handler_names.items():
+            if getattr(type(self), name) is not getattr(GameObserver, name):
+                yield event_type, getattr(self, name)
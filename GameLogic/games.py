@@ -9,6 +9,7 @@ from typing import Optional, List, Dict
 from uuid import uuid4
 import json
 from datetime import datetime
+import numpy as np
 
 from GameLogic.cards import (
     Card,
@@ -24,21 +25,36 @@ from GameLogic.players import (
     HumanPinochlePlayer,
     Kitty,
 )
+from GameLogic.events import (
+    EventCallback,
+    GameObserver,
+    HandStarted,
+    BidPlaced,
+    TrumpCalled,
+    CardsPassed,
+    CardPlayed,
+    TrickWon,
+    HandScored,
+)
+from GameLogic.rng import SeedLike, AntitheticGenerator, get_rng, make_rng, spawn_seeds
+from GameLogic.rules import RuleSet
 from GameLogic.tricks import Trick
 
 
 class Pinochle:
 
-    # Settings
-    last_trick_value = 1
-    deck_type = PinochleDeck
-    dropped_bid_amt = 25
-    minimum_bid_amt = 30
-    bid_increment_amt = 5
-    n_players = 4
-    n_cards_to_pass = 3
-    winning_score = 350
-    partner_gets_points = False
+    # Default settings of the variant, a game may be given its own rule set
+    rules = RuleSet(
+        deck_type=PinochleDeck,
+        n_players=4,
+        last_trick_value=1,
+        dropped_bid_amt=25,
+        minimum_bid_amt=30,
+        bid_increment_amt=5,
+        n_cards_to_pass=3,
+        winning_score=350,
+        partner_gets_points=False,
+    )
 
     type_from_str = {}
 
@@ -46,13 +62,20 @@ class Pinochle:
         super().__init_subclass__(**kwargs)
         Pinochle.type_from_str[cls.__name__] = cls
 
-    def __init__(self, players=None, printing=False, logging=False):
+    def __init__(self, players=None, printing=False, logging=False, rng: Optional[np.random.Generator] = None,
+                 rules: Optional[RuleSet] = None):
+
+        # Settings
+        if rules is not None:
+            self.rules = rules
 
         # Operational parameters
         self.game_id = str(uuid4())
         self._printing = printing
         self._logging = logging
         self._state_log = []
+        self._subscribers = {}
+        self.rng = get_rng(rng)
 
         # Simulation parameters
         self.shuffle = True
@@ -64,7 +87,6 @@ class Pinochle:
         # Game information
         self.deck = None
         self.players = players or []
-        self.initialize_players()
         self.human_player = self.find_human_player()
         self.hand_count = -1
         self.scores = {p.id: p.score for p in self.players}
@@ -84,7 +106,10 @@ class Pinochle:
         # Trick information
         self.trick = None
         self.trick_winner = None
-        self.remaining_cards = {suit: {val: self.deck_type.card_instances for val in Card.values} for suit in Card.suits}
+        self.remaining_cards = {suit: {val: self.rules.deck_type.card_instances for val in self.rules.deck_type.values} for suit in Card.suits}
+
+        # Seat the players once the game is set up, so they can look at it
+        self.initialize_players()
 
         # Log initial state
         self.log_state('INITIALIZE GAME')
@@ -103,13 +128,29 @@ class Pinochle:
 
     def play_game(self):
         self.log_state('START GAME', save_state=False)
-        while not any([p.score > self.winning_score for p in self.players]):
+        while not any([p.score > self.rules.winning_score for p in self.players]):
             self.play_hand()
         self.log_state('END GAME', save_state=False)
 
     def initialize_players(self):
         for idx, player in enumerate(self.players):
             player.index = idx
+            player.join_game(self)
+
+    def seed(self, seed: SeedLike = None, antithetic: bool = False):
+        """
+        Give the game and each player an independent random stream derived from ``seed``
+
+        Reseeding before every hand makes the outcome of the hand depend
+        only on the seed, which is what makes parallel simulations
+        reproducible. With ``antithetic``, every stream is the mirror image
+        of the one ``seed`` gives (see :class:`AntitheticGenerator`).
+        """
+        wrap = AntitheticGenerator if antithetic else (lambda rng: rng)
+        game_seed, *player_seeds = spawn_seeds(seed, len(self.players) + 1)
+        self.rng = wrap(make_rng(game_seed))
+        for player, player_seed in zip(self.players, player_seeds):
+            player.set_rng(wrap(make_rng(player_seed)))
 
     def start_next_hand(self):
 
@@ -131,23 +172,13 @@ class Pinochle:
         # Trick information
         self.trick = None
         self.trick_winner = None
-        self.remaining_cards = {suit: {val: self.deck_type.card_instances for val in Card.values} for suit in Card.suits}
+        self.remaining_cards = {suit: {val: self.rules.deck_type.card_instances for val in self.rules.deck_type.values} for suit in Card.suits}
 
         self.print('\nBeginning hand {}'.format(self.hand_count))
         self.log_state(f'START HAND {self.hand_count}')
 
     def get_settings_state(self):
-        return {
-            'last_trick_value': self.last_trick_value,
-            'deck_type': self.deck_type.__name__,
-            'dropped_bid_amt': self.dropped_bid_amt,
-            'minimum_bid_amt': self.minimum_bid_amt,
-            'bid_increment_amt': self.bid_increment_amt,
-            'n_players': self.n_players,
-            'n_cards_to_pass': self.n_cards_to_pass,
-            'winning_score': self.winning_score,
-            'partner_gets_points': False,
-        }
+        return self.rules.get_state()
 
     def get_state(self):
         return {
@@ -178,14 +209,14 @@ class Pinochle:
     @staticmethod
     def restore_state(state: dict, printing: bool = False, logging: bool = False) -> 'Pinochle':
         game_type = Pinochle.type_from_str[state['game_type']]
-        game = game_type(printing=printing, logging=logging)
+        game = game_type(printing=printing, logging=logging, rules=RuleSet.restore_state(state))
+        settings = game.get_settings_state()
         for key in state:
-            if key == 'game_type':
+            if key == 'game_type' or key in settings:
                 continue
             game.__setattr__(key, state[key])
 
         game.players = [PinochlePlayer.restore_state(state) for state in state['players']]
-        game.deck_type = PinochleDeck.type_from_str[game.deck_type]
         game.cards_played = [(Card.restore_state(c), p) for c, p in game.cards_played]
 
         if game.trick is not None:
@@ -196,6 +227,8 @@ class Pinochle:
 
     def finalize_restore_state(self, state: dict):
         self.replace_player_index_with_player()
+        for player in self.players:
+            player.join_game(self)
 
     def get_player_by_index_map(self) -> Dict[int, PinochlePlayer]:
         return {p.index: p for p in self.players}
@@ -229,6 +262,29 @@ class Pinochle:
         state['players'] = [p.get_shared_state() for p in self.players]
         return state
 
+    def subscribe(self, event_type: type, callback: EventCallback):
+        """Call ``callback(event)`` every time an event of ``event_type`` happens"""
+        self._subscribers.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type: type, callback: EventCallback):
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._subscribers.pop(event_type, None)
+
+    def attach(self, observer: GameObserver):
+        for event_type, callback in observer.handlers():
+            self.subscribe(event_type, callback)
+
+    def detach(self, observer: GameObserver):
+        for event_type, callback in observer.handlers():
+            self.unsubscribe(event_type, callback)
+
+    def emit(self, event):
+        for callback in self._subscribers.get(type(event), ()):
+            callback(event)
+
     def log_state(self, action: str, save_state: bool = True):
         if self._logging:
             self._state_log.append(f'<<<{action}>>>')
@@ -252,10 +308,10 @@ class Pinochle:
             print(f'Wrote hand to {filename}')
 
     def play_to(self, winning_score):
-        self.winning_score = winning_score
+        self.rules = self.rules.replace(winning_score=winning_score)
 
     def set_include_partners_meld(self, value):
-        self.partner_gets_points = value
+        self.rules = self.rules.replace(partner_gets_points=value)
 
     def _deal_cards(self):
 
@@ -273,7 +329,7 @@ class Pinochle:
     def deal(self):
 
         # Initialize and shuffle deck
-        self.deck = self.deck_type()
+        self.deck = self.rules.deck_type(rng=self.rng)
         if self.shuffle:
             self.deck.shuffle()
 
@@ -281,6 +337,8 @@ class Pinochle:
         self._deal_cards()
         self.show_human_hand_and_meld()
         self.log_state('CARDS DELT')
+        if HandStarted in self._subscribers:
+            self.emit(HandStarted(self, self.hand_count))
 
     def find_human_player(self):
         for player in self.players:
@@ -297,17 +355,27 @@ class Pinochle:
 
     def take_cards(self):
         self.log_state(f'WAITING FOR PLAYER {self.high_bidder.partner.index} TO PASS CARDS', save_state=False)
-        from_partner = self.high_bidder.partner.pass_cards(self.n_cards_to_pass)
+        from_partner = self.high_bidder.partner.pass_cards(self.rules.n_cards_to_pass)
+        self.apply_take_cards(from_partner)
+
+    def apply_take_cards(self, from_partner: List[Card]):
         self.high_bidder.take_cards(from_partner)
         if self.high_bidder is self.human_player:
             self.print('New meld: ', self.high_bidder.meld)
         self.log_state('TAKE CARDS')
+        if CardsPassed in self._subscribers:
+            self.emit(CardsPassed(self, self.high_bidder.partner, self.high_bidder, list(from_partner)))
 
     def give_cards(self):
         self.log_state(f'WAITING FOR PLAYER {self.high_bidder.index} TO PASS CARDS', save_state=False)
-        to_partner = self.high_bidder.pass_cards(self.n_cards_to_pass)
+        to_partner = self.high_bidder.pass_cards(self.rules.n_cards_to_pass)
+        self.apply_give_cards(to_partner)
+
+    def apply_give_cards(self, to_partner: List[Card]):
         self.high_bidder.partner.take_cards(to_partner)
         self.log_state('GIVE CARDS')
+        if CardsPassed in self._subscribers:
+            self.emit(CardsPassed(self, self.high_bidder, self.high_bidder.partner, list(to_partner)))
 
     def pass_cards(self):
         self.take_cards()
@@ -331,16 +399,32 @@ class Pinochle:
         rotates player order each hand so the bid order changes.
         """
         # Find and order current players
-        n, N = self.n_players, len(self.players)
+        n, N = self.rules.n_players, len(self.players)
         self.current_players = [self.players[i % N] for i in range(self.hand_count, self.hand_count + n)]
         for player in self.current_players:
             player.reset_hand_state()
 
     def bidding_process(self):
+        passed = self.start_bidding()
+
+        # Everyone keeps bidding until everyone passes except one person
+        idx = 0
+        n_players = len(self.current_players)
+        while not self.bidding_is_over(passed):
+            player = self.current_players[idx]
+            if not passed[player]:
+                self.log_state(f'WAITING ON PLAYER {player.index} TO BID', save_state=False)
+                self.player_bids(player, passed)
+
+            idx = (idx + 1) % n_players
+
+        self.finish_bidding()
+
+    def start_bidding(self) -> Dict[PinochlePlayer, bool]:
+        """Reset the bid and return which players have passed"""
 
         # If no one bids, then the bid gets dropped on the last bidder
-        start_bid_amt = self.minimum_bid_amt - self.bid_increment_amt
-        self.high_bid = start_bid_amt
+        self.high_bid = self.rules.start_bid_amt
         self.high_bidder = self.current_players[-1]
         passed = {player: False for player in self.current_players}
 
@@ -351,21 +435,18 @@ class Pinochle:
                 self.high_bid = self.preset_bid
             passed = {key: True for key in passed}
 
-        # Everyone keeps bidding until everyone passes except one person
-        idx = 0
-        n_players = len(self.current_players)
-        while sum(passed.values()) < n_players - 1:
-            player = self.current_players[idx]
-            if not passed[player]:
-                self.log_state(f'WAITING ON PLAYER {player.index} TO BID', save_state=False)
-                self.player_bids(player, passed)
+        return passed
 
-            idx = (idx + 1) % n_players
+    @staticmethod
+    def bidding_is_over(passed: Dict[PinochlePlayer, bool]) -> bool:
+        return sum(passed.values()) >= len(passed) - 1
+
+    def finish_bidding(self):
 
         # Check to see if the bid was dropped or taken
         self.high_bidder.is_high_bidder = True
-        if self.high_bid == start_bid_amt:
-            self.high_bid = self.dropped_bid_amt
+        if self.high_bid == self.rules.start_bid_amt:
+            self.high_bid = self.rules.dropped_bid_amt
             self.dropped_bid = True
             self.log_state(f'BID DROPPED ON PLAYER {self.high_bidder.index} AT {self.high_bid}')
             self.print(f'The bid was dropped on {self.high_bidder} at {self.high_bid}')
@@ -373,23 +454,26 @@ class Pinochle:
             self.log_state(f'PLAYER {self.high_bidder.index} TOOK BID AT {self.high_bid}')
             self.print(f'{self.high_bidder} took the bid at {self.high_bid}')
 
-    def player_bids(self, player: PinochlePlayer, player_has_passed: dict):
-
-        def bid_too_small(bid):
-            return bid <= self.high_bid
+    def bid_error(self, bid: Optional[int]) -> Optional[str]:
+        """Explain why a bid is not allowed, or return None for a valid bid or a pass"""
+        if not bid:
+            return None
+        if bid <= self.high_bid:
+            return 'Bid is too small'
+        if bid % self.rules.bid_increment_amt != 0:
+            return 'Bid is not a valid increment'
+        return None
 
-        def bid_not_increment(bid):
-            return bid % self.bid_increment_amt != 0
+    def player_bids(self, player: PinochlePlayer, player_has_passed: dict):
+        this_bid = player.place_bid(self.high_bid, self.rules.bid_increment_amt)
+        if isinstance(player, HumanPinochlePlayer):
+            while self.bid_error(this_bid):
+                print(self.bid_error(this_bid))
+                this_bid = player.place_bid(self.high_bid, self.rules.bid_increment_amt)
 
-        this_bid = player.place_bid(self.high_bid, self.bid_increment_amt)
-        if isinstance(player, HumanPinochlePlayer) and this_bid is not None:
-            while bid_too_small(this_bid) or bid_not_increment(this_bid):
-                if bid_too_small(this_bid):
-                    print('Bid is too small')
-                elif bid_not_increment(this_bid):
-                    print('Bid is not a valid increment')
-                this_bid = player.place_bid(self.high_bid, self.bid_increment_amt)
+        self.apply_bid(player, this_bid, player_has_passed)
 
+    def apply_bid(self, player: PinochlePlayer, this_bid: Optional[int], player_has_passed: dict):
         if this_bid:
             self.high_bid = this_bid
             self.high_bidder = player
@@ -398,6 +482,9 @@ class Pinochle:
             player_has_passed[player] = True
             self.log_state(f'PLAYER {player.index} PASSED')
 
+        if BidPlaced in self._subscribers:
+            self.emit(BidPlaced(self, player, this_bid or None))
+
     def set_lead_player(self):
         lead_idx = self.current_players.index(self.lead_player)
         n = len(self.current_players)
@@ -439,10 +526,15 @@ class Pinochle:
 
     def call_trump(self):
         if self.preset_trump:
-            self.trump = self.preset_trump
+            trump = self.preset_trump
         else:
             self.log_state(f'WAITING ON PLAYER {self.high_bidder.index} TO CALL TRUMP', save_state=False)
-            self.trump = self.high_bidder.choose_trump()
+            trump = self.high_bidder.choose_trump()
+
+        self.apply_trump(trump)
+
+    def apply_trump(self, trump: str):
+        self.trump = trump
 
         # Update player states
         for p in self.current_players:
@@ -450,6 +542,8 @@ class Pinochle:
 
         self.print(f'Trump is {self.trump}')
         self.log_state('CALL TRUMP')
+        if TrumpCalled in self._subscribers:
+            self.emit(TrumpCalled(self, self.high_bidder, self.trump))
 
     @property
     def lead_player(self):
@@ -482,29 +576,35 @@ class Pinochle:
         self.trick.add_card(card, player)
 
         self.cards_played.append((card, player))
-        # Todo: update the shared state variables pertaining to cards
+        self.remaining_cards[card.suit][card.value] -= 1
 
         self.log_state(f'PLAYER {player.index} PLAYS {card.to_str()}')
+        if CardPlayed in self._subscribers:
+            self.emit(CardPlayed(self, player, card, self.trick))
 
     def update_scores(self):
 
         # Give "last trick" points to the winner of the last trick
-        self.trick_winner.took_last_trick = True
+        # (no tricks are played when the hand cannot be played)
+        hand_played = self.trick_winner is not None
+        if hand_played:
+            self.trick_winner.took_last_trick = True
 
         # Count points of the high bidder and their partner
-        bidder_counters = self.high_bidder.counters(self.last_trick_value)
-        partner_counters = self.high_bidder.partner.counters(self.last_trick_value)
+        rules = self.rules
+        bidder_counters = self.high_bidder.counters(rules.last_trick_value)
+        partner_counters = self.high_bidder.partner.counters(rules.last_trick_value)
         counters = bidder_counters + partner_counters
 
         # Find out if the bid was saved or set
         meld = self.high_bidder.meld.total_meld_given_trump[self.trump]
-        self.saved_bid = counters + meld >= self.high_bid
+        self.saved_bid = hand_played and counters + meld >= self.high_bid
 
         # If we saved the bid, add points to score
         if self.saved_bid:
             score = counters + meld
             self.high_bidder.add_points(score)
-            if self.partner_gets_points:
+            if rules.partner_gets_points:
                 partner = self.high_bidder.partner
                 partner.add_points(partner.meld.calculate_meld_with_trump(self.trump))
 
@@ -517,6 +617,9 @@ class Pinochle:
             self.high_bidder.remove_points(self.high_bid)
             self.log_state(f'HAND RESULT: PLAYER {self.high_bidder.index} WAS SET')
 
+        if HandScored in self._subscribers:
+            self.emit(HandScored(self, self.high_bidder, self.high_bid, self.saved_bid, counters, meld))
+
     def can_play_hand(self) -> bool:
         """
         Make sure the player has a marriage in trump and sufficient meld to save the bid
@@ -526,8 +629,7 @@ class Pinochle:
         if not self.high_bidder.hand.has_marriage(self.trump):
             return False
 
-        total_counters = self.last_trick_value + self.deck_type.total_counters()
-        if self.high_bid > self.high_bidder.meld.total_meld_given_trump[self.trump] + total_counters:
+        if self.high_bid > self.high_bidder.meld.total_meld_given_trump[self.trump] + self.rules.total_counters:
             return False
         return True
 
@@ -561,7 +663,7 @@ class Pinochle:
 
     def set_up_trick(self):
         self.set_lead_player()
-        self.trick = Trick(self.n_players, self.trump)
+        self.trick = Trick(self.rules.n_players, self.trump)
 
     def play_cards_in_trick(self):
         while len(self.trick) < len(self.current_players):
@@ -575,6 +677,8 @@ class Pinochle:
               f'----------------------------'
         self.print(msg)
         self.log_state(f'PLAYER {self.trick_winner.index} TOOK TRICK')
+        if TrickWon in self._subscribers:
+            self.emit(TrickWon(self, self.trick_winner, self.trick))
 
     def play_next_trick(self):
         self.set_up_trick()
@@ -582,28 +686,37 @@ class Pinochle:
         self.finish_trick()
 
 
+Pinochle.type_from_str[Pinochle.__name__] = Pinochle
+
+
 class DoubleDeckPinochle(Pinochle):
 
-    last_trick_value = 2
-    deck_type = DoublePinochleDeck
-    dropped_bid_amt = 50
-    minimum_bid_amt = 60
-    bid_increment_amt = 10
+    rules = Pinochle.rules.replace(
+        deck_type=DoublePinochleDeck,
+        last_trick_value=2,
+        dropped_bid_amt=50,
+        minimum_bid_amt=60,
+        bid_increment_amt=10,
+    )
 
-    def __init__(self, players=None, printing=False, logging=False):
-        Pinochle.__init__(self, players, printing=printing, logging=logging)
+    def __init__(self, players=None, printing=False, logging=False, rng: Optional[np.random.Generator] = None,
+                 rules: Optional[RuleSet] = None):
+        Pinochle.__init__(self, players, printing=printing, logging=logging, rng=rng, rules=rules)
 
 
 class FirehousePinochle(DoubleDeckPinochle):
 
-    deck_type = FirehousePinochleDeck
-    n_players = 3
-    n_cards_to_pass = 5
+    rules = DoubleDeckPinochle.rules.replace(
+        deck_type=FirehousePinochleDeck,
+        n_players=3,
+        n_cards_to_pass=5,
+    )
 
-    def __init__(self, players=None, printing=False, logging=False):
+    def __init__(self, players=None, printing=False, logging=False, rng: Optional[np.random.Generator] = None,
+                 rules: Optional[RuleSet] = None):
         self.preset_kitty_hand = None
         self.kitty = Kitty()
-        DoubleDeckPinochle.__init__(self, players, printing=printing, logging=logging)
+        DoubleDeckPinochle.__init__(self, players, printing=printing, logging=logging, rng=rng, rules=rules)
 
     def get_state(self):
         return {
@@ -626,6 +739,7 @@ class FirehousePinochle(DoubleDeckPinochle):
     def finalize_restore_state(self, state: dict):
         self.kitty = PinochlePlayer.restore_state(state['kitty'])
         super().finalize_restore_state(state)
+        self.kitty.replace_player_index_with_player(self.get_player_by_index_map())
 
     def _deal_cards(self):
         super()._deal_cards()
@@ -639,7 +753,7 @@ class FirehousePinochle(DoubleDeckPinochle):
 
     def set_partners(self):
         self.high_bidder.partner = self.kitty
-        self.kitty.partner = self.high_bidder.partner
+        self.kitty.partner = self.high_bidder
 
         idx = self.current_players.index(self.high_bidder) - 1
         self.current_players[idx].partner = self.current_players[idx - 1]
@@ -676,7 +790,7 @@ def play_and_save_hands(game_type, players):
         the_game.write_log_to_file(path='logs/hands')
 
 
-def test():
+def test(n_runs: int = 10000, seed: SeedLike = None):
     from time import time
 
     player_type = SimplePinochlePlayer
@@ -685,11 +799,16 @@ def test():
                player_type('Charlie', 100),
                player_type('Dave', 100)]
 
+    game = FirehousePinochle(players[:3])
+    game.seed(seed)
+
     scores = []
-    n_runs, count = 10000, 0
+    count = 0
     start = time()
     for _ in range(n_runs):
-        score = test_game(FirehousePinochle, players[:3])
+        score_before = {p: p.score for p in game.players}
+        game.play_hand()
+        score = game.high_bidder.score - score_before[game.high_bidder]
         if score > 0:
             count += 1
             scores.append(score)
@@ -0,0 +1,373 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional, Sequence, Tuple
+import numpy as np
+
+from GameLogic.cards import (
+    Card,
+    Hand,
+    FirehousePinochleDeck,
+)
+from GameLogic.cache import SimulationCache, seed_key
+from GameLogic.checkpoint import Checkpoint
+from GameLogic.games import FirehousePinochle
+from GameLogic.monte_carlo import simulate_outcomes
+from GameLogic.players import (
+    PinochlePlayer,
+    RandomPinochlePlayer,
+    SimplePinochlePlayer,
+)
+from GameLogic.positions import CardLayout
+from GameLogic.rng import SeedLike, as_seed_sequence, make_rng, spawn_seeds, trial_seed
+from GameLogic.rules import RuleSet
+
+
+class HandStrengthTable:
+    """
+    Simulated strength of many Firehouse hands, stored by columns
+
+    The table is a directory with one ``.npy`` file per column and a
+    ``meta.json`` file with the settings of the simulation. Columns are
+    memory-mapped, so tables larger than memory can be filled by many
+    processes at once (each writing its own rows) and read back lazily.
+    Row ``i`` holds hand ``i``; per-suit columns follow ``Card.suits``.
+
+    Columns
+    -------
+    hands: uint8 (n_hands, n_cards)
+        Card counts of the hand in :class:`CardLayout` order
+    marriage: bool (n_hands, 4)
+        Whether the hand can call the suit trump (the other columns of the
+        suit are 0 otherwise)
+    trials: int32 (n_hands, 4)
+        Trials simulated for the suit
+    counters: float32 (n_hands, 4)
+        Mean counters of the bidder's side (the bidder and the kitty)
+    meld: float32 (n_hands, 4)
+        Mean meld of the bidder, after the cards are passed
+    save_rate: float32 (n_hands, 4, n_bids)
+        Fraction of the trials that would have saved each bid of ``bids``
+    """
+
+    columns = {
+        'hands': np.uint8,
+        'marriage': np.bool_,
+        'trials': np.int32,
+        'counters': np.float32,
+        'meld': np.float32,
+        'save_rate': np.float32,
+    }
+
+    def __init__(self, path: str, mode: str = 'r'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.n_hands = self.meta['n_hands']
+        self.bids = self.meta['bids']
+        self.layout = CardLayout.for_values(self.meta['values'])
+        for name in self.columns:
+            setattr(self, name, np.load(self._column_path(name), mmap_mode=mode))
+        self._rows = None
+
+    @staticmethod
+    def create(path: str, n_hands: int, bids: Sequence[int], **settings) -> 'HandStrengthTable':
+        """Create an empty table of ``n_hands`` rows (``settings`` are kept in the metadata)"""
+        os.makedirs(path, exist_ok=True)
+        layout = CardLayout.for_values(FirehousePinochleDeck.values)
+        meta = {
+            'n_hands': n_hands,
+            'bids': list(bids),
+            'values': layout.values,
+            'suits': Card.suits,
+            **settings,
+        }
+        shapes = {
+            'hands': (n_hands, layout.n_cards),
+            'save_rate': (n_hands, len(Card.suits), len(meta['bids'])),
+        }
+        for name, dtype in HandStrengthTable.columns.items():
+            shape = shapes.get(name, (n_hands, len(Card.suits)))
+            column = np.lib.format.open_memmap(HandStrengthTable._column_file(path, name), mode='w+',
+                                               dtype=dtype, shape=shape)
+            del column
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        return HandStrengthTable(path, mode='r+')
+
+    @staticmethod
+    def _column_file(path: str, name: str) -> str:
+        return os.path.join(path, f'{name}.npy')
+
+    def _column_path(self, name: str) -> str:
+        return self._column_file(self.path, name)
+
+    def flush(self):
+        for name in self.columns:
+            column = getattr(self, name)
+            if isinstance(column, np.memmap):
+                column.flush()
+
+    def hand(self, row: int) -> Hand:
+        return Hand(self.layout.cards(self.hands[row]))
+
+    def find(self, hand: Hand) -> Optional[int]:
+        """Row of ``hand`` in the table, or None (the index of rows is built on first use)"""
+        if self._rows is None:
+            self._rows = {}
+            for row in range(self.n_hands):
+                self._rows.setdefault(self.hands[row].tobytes(), row)
+        counts = np.array(self.layout.counts(hand.cards), dtype=np.uint8)
+        return self._rows.get(counts.tobytes())
+
+    def save_rate_of(self, row: int, suit: str, bid: int) -> float:
+        """Fraction of the trials of the hand that saved ``bid`` in ``suit`` (rounded up to a bid of the table)"""
+        step = int(np.searchsorted(self.bids, bid))
+        if step == len(self.bids):
+            raise ValueError(f'Bid {bid} is above the bids of the table (up to {self.bids[-1]})')
+        return float(self.save_rate[row, Card.suits.index(suit), step])
+
+
+def evaluate_hand(
+    hand: Hand,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type],
+    seed: SeedLike,
+    rules: Optional[RuleSet],
+    bids: Sequence[int],
+) -> dict:
+    """
+    Simulate ``hand`` with each suit it can call trump
+
+    Returns
+    -------
+    dict
+        Row of each column of :class:`HandStrengthTable` except ``hands``
+    """
+    n_suits = len(Card.suits)
+    row = {
+        'marriage': np.zeros(n_suits, dtype=bool),
+        'trials': np.zeros(n_suits, dtype=np.int32),
+        'counters': np.zeros(n_suits, dtype=np.float32),
+        'meld': np.zeros(n_suits, dtype=np.float32),
+        'save_rate': np.zeros((n_suits, len(bids)), dtype=np.float32),
+    }
+    bids = np.asarray(bids)
+    for idx, suit in enumerate(Card.suits):
+        if not hand.has_marriage(suit):
+            continue
+        counters, meld, partner_counters = simulate_outcomes(
+            hand, suit, n_trials, player_type, other_player_type, seed=seed, timer=None, rules=rules,
+            n_workers=1, stopping=None, cache=None,
+        )
+        side_counters = counters + partner_counters
+        points = side_counters + meld
+        row['marriage'][idx] = True
+        row['trials'][idx] = len(points)
+        row['counters'][idx] = side_counters.mean()
+        row['meld'][idx] = meld.mean()
+        row['save_rate'][idx] = (points[None, :] >= bids[:, None]).mean(axis=1)
+    return row
+
+
+def random_hands(seed: SeedLike, start: int, stop: int) -> Iterator[Hand]:
+    """Hands ``start`` to ``stop`` of the random hands drawn from ``seed`` (hand ``i`` only depends on ``i``)"""
+    for idx in range(start, stop):
+        yield FirehousePinochleDeck.get_random_hand(rng=make_rng(trial_seed(seed, idx)))
+
+
+def _evaluate_rows(
+    path: str,
+    start: int,
+    stop: int,
+    hands_seed: Optional[np.random.SeedSequence],
+    trials_seed: np.random.SeedSequence,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type],
+    rules: Optional[RuleSet],
+) -> int:
+    """Evaluate rows ``start`` to ``stop`` of the table in a worker, writing them in place"""
+    table = HandStrengthTable(path, mode='r+')
+    if hands_seed is None:
+        hands = (table.hand(row) for row in range(start, stop))
+    else:
+        hands = random_hands(hands_seed, start, stop)
+
+    for row, hand in zip(range(start, stop), hands):
+        if hands_seed is not None:
+            table.hands[row] = table.layout.counts(hand.cards)
+        values = evaluate_hand(hand, n_trials, player_type, other_player_type, trial_seed(trials_seed, row),
+                               rules, table.bids)
+        for name, value in values.items():
+            getattr(table, name)[row] = value
+    table.flush()
+    return stop - start
+
+
+def evaluate_hands(
+    path: str,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type] = None,
+    n_hands: Optional[int] = None,
+    hands: Optional[np.ndarray] = None,
+    bids: Optional[Sequence[int]] = None,
+    seed: SeedLike = None,
+    rules: Optional[RuleSet] = None,
+    n_workers: Optional[int] = None,
+    chunk_size: int = 100,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Iterator[Tuple[int, int]]:
+    """
+    Simulate many hands on a process pool and write their strength to a table
+
+    Hands are either given, as card counts in :class:`CardLayout` order, or
+    drawn at random. Hand ``i`` and its trials are seeded from the master
+    seed and ``i``, so the table does not depend on the number of workers.
+
+    Parameters
+    ----------
+    path: str
+        Directory of the :class:`HandStrengthTable` to create
+    n_trials: int
+        Trials per hand and trump suit
+    player_type, other_player_type: type
+        Player types of the bidder and of the other players
+    n_hands: int, optional
+        Number of random hands to draw (when ``hands`` is not given)
+    hands: np.ndarray, optional
+        Card counts of the hands to evaluate, of shape (n_hands, n_cards)
+    bids: list[int], optional
+        Bids whose save rates are recorded, by default every bid from the
+        minimum bid to 250
+    seed: int, optional
+        Master seed of the hands and the trials
+    rules: RuleSet, optional
+        Settings of the simulated games
+    n_workers: int, optional
+        Number of worker processes (all cores by default)
+    chunk_size: int
+        Hands per task sent to a worker
+    checkpoint: Checkpoint, optional
+        If given, the chunks written to the table are recorded in the
+        checkpoint, and a rerun of the same job with the same checkpoint
+        reopens the table and only evaluates the other chunks
+
+    Yields
+    ------
+    Tuple[int, int]
+        Number of hands done so far, and the total, as chunks complete
+    """
+    game_rules = rules or FirehousePinochle.rules
+    if bids is None:
+        bids = range(game_rules.minimum_bid_amt, 251, game_rules.bid_increment_amt)
+    if hands is None and n_hands is None:
+        raise ValueError('Either hands or n_hands must be given')
+
+    n_hands = len(hands) if hands is not None else n_hands
+    n_chunks = -(-n_hands // chunk_size)
+    settings = dict(
+        n_trials=n_trials, player_type=player_type.__name__,
+        other_player_type=(other_player_type or player_type).__name__,
+        rules=game_rules.get_state(),
+    )
+
+    # Pick up the chunks of an interrupted run (unseeded runs keep their master seed in the checkpoint)
+    done_chunks = np.zeros(n_chunks, dtype=bool)
+    if checkpoint is not None:
+        job = SimulationCache.key(
+            'evaluate_hands', path=os.path.abspath(path), n_hands=n_hands, bids=list(bids), chunk_size=chunk_size,
+            hands=None if hands is None else hashlib.sha256(np.ascontiguousarray(hands).tobytes()).hexdigest(),
+            **settings,
+        )
+        seed = checkpoint.master_seed(SimulationCache.key(job, seed=seed_key(seed)), seed)
+        key = SimulationCache.key(job, seed=seed_key(seed))
+        entry = checkpoint.get(key)
+        if entry is not None:
+            done_chunks = entry['done'].copy()
+
+    hands_seed, trials_seed = spawn_seeds(as_seed_sequence(seed), 2)
+    if hands is not None:
+        hands_seed = None
+    if done_chunks.any():
+        table = HandStrengthTable(path, mode='r+')
+    else:
+        table = HandStrengthTable.create(
+            path, n_hands, list(bids), **settings, seed=None if seed is None else str(seed),
+        )
+        if hands is not None:
+            table.hands[:] = hands
+            table.flush()
+    del table
+
+    n_workers = n_workers or os.cpu_count() or 1
+    done = int(sum(min(chunk_size, n_hands - chunk * chunk_size) for chunk in np.flatnonzero(done_chunks)))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            executor.submit(_evaluate_rows, path, chunk * chunk_size, min((chunk + 1) * chunk_size, n_hands),
+                            hands_seed, trials_seed, n_trials, player_type, other_player_type, rules): chunk
+            for chunk in range(n_chunks) if not done_chunks[chunk]
+        }
+        for future in as_completed(futures):
+            done += future.result()
+            if checkpoint is not None:
+                done_chunks[futures[future]] = True
+                checkpoint.update(key, done=done_chunks)
+                checkpoint.save(force=done == n_hands)
+            yield done, n_hands
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    from time import time
+
+    parser = ArgumentParser('Simulate the strength of many Firehouse hands and store it by columns')
+    parser.add_argument('--output', type=str, required=True, help='Directory of the table')
+    parser.add_argument('--hands', type=int, default=1000, help='Number of random hands')
+    parser.add_argument('--input', type=str, default=None, help='.npy file of hand card counts to evaluate instead')
+    parser.add_argument('--trials', type=int, default=100, help='Trials per hand and trump suit')
+    parser.add_argument('--player', type=str, default='simple', help='Player type of the bidder')
+    parser.add_argument('--opponent', type=str, default='random', help='Player type of the others')
+    parser.add_argument('--max_bid', type=int, default=250, help='Highest bid whose save rate is recorded')
+    parser.add_argument('--chunk_size', type=int, default=100, help='Hands per task')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None, help='Master seed for reproducible runs')
+    parser.add_argument('--checkpoint', type=str, default=None, help='File keeping the progress of the job, to resume it')
+    parser.add_argument('--checkpoint_interval', type=float, default=60, help='Seconds between checkpoint writes')
+    args = parser.parse_args()
+
+    player_types = {
+        'simple': SimplePinochlePlayer,
+        'random': RandomPinochlePlayer,
+        **{name.lower(): player_type for name, player_type in PinochlePlayer.type_from_str.items()},
+    }
+    rules = FirehousePinochle.rules
+
+    start = time()
+    for done, total in evaluate_hands(
+        args.output,
+        args.trials,
+        player_types[args.player],
+        player_types[args.opponent],
+        n_hands=args.hands,
+        hands=None if args.input is None else np.load(args.input),
+        bids=range(rules.minimum_bid_amt, args.max_bid + 1, rules.bid_increment_amt),
+        seed=args.seed,
+        n_workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint=None if args.checkpoint is None else Checkpoint(args.checkpoint, interval=args.checkpoint_interval),
+    ):
+        elapsed = time() - start
+        print(f'{done}/{total} hands, {done / elapsed:.1f} hands per second')
+
+    table = HandStrengthTable(args.output)
+    best = table.counters.max(axis=1)
+    print(f'Mean counters of the best suit: {best.mean():.2f}, '
+          f'mean meld: {table.meld.max(axis=1).mean():.1f}')
@@ -0,0 +1,162 @@
+from typing import TYPE_CHECKING, Dict, List
+
+from GameLogic.cards import Card
+from GameLogic.events import (
+    GameObserver,
+    HandStarted,
+    TrumpCalled,
+    CardsPassed,
+    CardPlayed,
+)
+from GameLogic.positions import CardLayout
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+    from GameLogic.players import PinochlePlayer
+
+
+class CardKnowledge(GameObserver):
+    """
+    What one player knows about the cards of the current hand
+
+    The tracker follows the events of the game and costs O(1) per card
+    played or passed, so players can query it at every decision instead
+    of rescanning ``game.cards_played``. It holds:
+
+    - ``played`` / ``remaining``: copies of each card played, and not yet played
+    - ``hand``: the player's own cards
+    - ``known``: cards known to be in another hand (cards the player passed,
+      which the receiver keeps until it plays them; the kitty in Firehouse
+      holds exactly what the high bidder gave it)
+    - ``voids``: suits each player is known to be out of, from not following
+      suit (and trump, when it did not trump either)
+    - ``received``, ``passed``: the cards the player saw change hands
+
+    Counts are lists indexed by the integer cards of :class:`CardLayout`,
+    and other players are keyed by the player objects (the kitty included).
+
+    Parameters
+    ----------
+    game: Pinochle
+        Game to follow; the tracker is attached to it
+    player: PinochlePlayer
+        The player whose knowledge is tracked
+    """
+
+    def __init__(self, game: 'Pinochle', player: 'PinochlePlayer'):
+        self.game = game
+        self.player = player
+        self.layout = CardLayout.for_values(game.rules.deck_type.values)
+        self.card_instances = game.rules.deck_type.card_instances
+
+        self.trump = None
+        self.played = []
+        self.remaining = []
+        self.hand = []
+        self.known: Dict['PinochlePlayer', List[int]] = {}
+        self.voids: Dict['PinochlePlayer', List[bool]] = {}
+        self.received = []
+        self.passed = []
+        self.reset(game)
+        game.attach(self)
+
+    def detach(self):
+        self.game.detach(self)
+
+    def reset(self, game: 'Pinochle'):
+        """Rebuild what can be known from the state of ``game`` (e.g. after restoring it)"""
+        layout = self.layout
+        self.trump = None if game.trump is None else Card.suits.index(game.trump)
+        self.played = [0] * layout.n_cards
+        self.remaining = [self.card_instances] * layout.n_cards
+        self.hand = [0] * layout.n_cards
+        self.known = {}
+        self.voids = {}
+        self.received = []
+        self.passed = []
+
+        n_players = len(game.current_players)
+        lead_suit = None
+        for idx, (card, player) in enumerate(game.cards_played):
+            if idx % n_players == 0:
+                lead_suit = card.suit
+            self._play(player, card, lead_suit)
+        self.hand = layout.counts(self.player.hand.cards)
+
+    # Queries
+
+    def played_count(self, card: Card) -> int:
+        return self.played[self.layout.index(card)]
+
+    def remaining_count(self, card: Card) -> int:
+        return self.remaining[self.layout.index(card)]
+
+    def remaining_in_suit(self, suit: str) -> int:
+        start = Card.suits.index(suit) * self.layout.n_values
+        return sum(self.remaining[start:start + self.layout.n_values])
+
+    def remaining_trump(self) -> int:
+        return 0 if self.trump is None else self.remaining_in_suit(Card.suits[self.trump])
+
+    def is_void(self, player: 'PinochlePlayer', suit: str) -> bool:
+        voids = self.voids.get(player)
+        return voids is not None and voids[Card.suits.index(suit)]
+
+    def known_holdings(self, player: 'PinochlePlayer') -> List[Card]:
+        return self.layout.cards(self.known.get(player, ()))
+
+    def unseen(self) -> List[int]:
+        """Counts of the cards the player has not seen: not played, not in its hand, not known elsewhere"""
+        unseen = [r - h for r, h in zip(self.remaining, self.hand)]
+        for counts in self.known.values():
+            for c, n in enumerate(counts):
+                unseen[c] -= n
+        return unseen
+
+    # Events
+
+    def on_hand_started(self, event: HandStarted):
+        self.reset(event.game)
+
+    def on_trump_called(self, event: TrumpCalled):
+        self.trump = Card.suits.index(event.trump)
+
+    def on_cards_passed(self, event: CardsPassed):
+        layout = self.layout
+        if event.from_player is self.player:
+            self.passed = list(event.cards)
+            known = self.known.setdefault(event.to_player, [0] * layout.n_cards)
+            for card in event.cards:
+                c = layout.index(card)
+                self.hand[c] -= 1
+                known[c] += 1
+        elif event.to_player is self.player:
+            self.received = list(event.cards)
+            known = self.known.get(event.from_player)
+            for card in event.cards:
+                c = layout.index(card)
+                self.hand[c] += 1
+                # The partner may pass back some of the cards it was given
+                if known is not None and known[c]:
+                    known[c] -= 1
+
+    def on_card_played(self, event: CardPlayed):
+        self._play(event.player, event.card, event.trick.cards[0].suit)
+
+    def _play(self, player: 'PinochlePlayer', card: Card, lead_suit: str):
+        c = self.layout.index(card)
+        self.played[c] += 1
+        self.remaining[c] -= 1
+        if player is self.player:
+            self.hand[c] -= 1
+            return
+
+        known = self.known.get(player)
+        if known is not None and known[c]:
+            known[c] -= 1
+
+        if card.suit != lead_suit:
+            voids = self.voids.setdefault(player, [False] * len(Card.suits))
+            voids[Card.suits.index(lead_suit)] = True
+            if self.trump is not None and Card.suits.index(card.suit) != self.trump:
+                voids[self.trump] = True
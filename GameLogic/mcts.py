@@ -0,0 +1,457 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, wait
+from math import log, sqrt
+from time import monotonic
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from GameLogic.cards import Card
+from GameLogic.knowledge import CardKnowledge
+from GameLogic.positions import CardLayout, Position
+from GameLogic.rng import get_rng
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+    from GameLogic.players import PinochlePlayer
+    from GameLogic.tablebase import Tablebase
+
+
+class Determinizer:
+    """
+    What one player knows about the trick-playing phase, and sampling of
+    full deals consistent with it
+
+    The observer sees its own hand, every card played, the size of every
+    hand, the cards it knows another hand holds and the suits other
+    players are void in (see :class:`CardKnowledge`). The remaining cards
+    are dealt at random among the hidden hands, and the kitty in Firehouse.
+
+    Parameters
+    ----------
+    layout: CardLayout
+        Encoding of the cards
+    seat: int
+        Seat of the observer
+    hand: Sequence[int]
+        Card counts of the observer's hand
+    sizes: Sequence[int]
+        Number of cards in each hand, by seat, and the kitty's last if it has cards
+    known: Sequence[Sequence[int]]
+        Card counts known to be in each hand (same order as ``sizes``)
+    unseen: Sequence[int]
+        Card counts of the cards not in ``hand``, ``known`` or played
+    voids: Sequence[Sequence[bool]]
+        Whether each seat is known to be out of each suit
+    trump, side, leader, trick, last_trick_value
+        As in :class:`Position`
+    """
+
+    def __init__(
+        self,
+        layout: CardLayout,
+        seat: int,
+        hand: Sequence[int],
+        sizes: Sequence[int],
+        known: Sequence[Sequence[int]],
+        unseen: Sequence[int],
+        voids: Sequence[Sequence[bool]],
+        trump: int,
+        side: Sequence[bool],
+        leader: int,
+        trick: Sequence[int] = (),
+        last_trick_value: int = 1,
+    ):
+        self.layout = layout
+        self.seat = seat
+        self.n_seats = len(side)
+        self.hand = list(hand)
+        self.known = [list(k) for k in known]
+        self.voids = [list(v) for v in voids] + [[False] * len(Card.suits)] * (len(sizes) - len(voids))
+        self.trump = trump
+        self.side = list(side)
+        self.leader = leader
+        self.trick = list(trick)
+        self.last_trick_value = last_trick_value
+
+        # Cards to deal to each hidden hand, most constrained suits first
+        self.capacity = [size - sum(k) for size, k in zip(sizes, self.known)]
+        self.capacity[seat] = 0
+        suit_options = [sum(not v[suit] for v, n in zip(self.voids, self.capacity) if n) for suit in range(len(Card.suits))]
+        self.unseen = sorted((c for c, n in enumerate(unseen) for _ in range(n)),
+                             key=lambda c: suit_options[layout.suit_of[c]])
+        if len(self.unseen) != sum(self.capacity):
+            raise ValueError(f'{len(self.unseen)} unseen cards for {sum(self.capacity)} hidden places')
+
+    def __getstate__(self) -> dict:
+        # Workers rebuild the shared layout instead of receiving a copy of its Zobrist keys
+        state = dict(self.__dict__)
+        state['layout'] = self.layout.values
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.layout = CardLayout.for_values(state['layout'])
+
+    @staticmethod
+    def from_game(game: 'Pinochle', player: 'PinochlePlayer', knowledge: Optional[CardKnowledge] = None) -> 'Determinizer':
+        """
+        What ``player`` knows about the trick-playing phase of ``game``, as
+        tracked by ``knowledge`` (rebuilt from the game state if not given)
+        """
+        if knowledge is None:
+            knowledge = CardKnowledge(game, player)
+            knowledge.detach()
+
+        layout = knowledge.layout
+        seats = Position.game_seats(game)
+        holders = list(seats)
+        kitty = getattr(game, 'kitty', None)
+        if kitty is not None and kitty.hand:
+            holders.append(kitty)
+        no_voids = [False] * len(Card.suits)
+
+        trick = game.trick
+        if trick is None or trick.complete or not len(trick):
+            leader, trick_cards = seats.index(game.lead_player), []
+        else:
+            leader, trick_cards = seats.index(trick.card_players[0]), [layout.index(c) for c in trick.cards]
+
+        return Determinizer(
+            layout,
+            seats.index(player),
+            knowledge.hand,
+            [len(p.hand) for p in holders],
+            [knowledge.known.get(p, [0] * layout.n_cards) for p in holders],
+            knowledge.unseen(),
+            [knowledge.voids.get(p, no_voids) for p in seats],
+            knowledge.trump,
+            [p in (game.high_bidder, game.high_bidder.partner) for p in seats],
+            leader,
+            trick_cards,
+            game.rules.last_trick_value,
+        )
+
+    def sample_hands(self, rng: np.random.Generator, max_attempts: int = 20) -> List[List[int]]:
+        """
+        Deal the unseen cards among the hidden hands
+
+        Each card goes to a hand that may hold its suit, with probability
+        proportional to the room left in that hand. If the voids cannot be
+        respected after ``max_attempts`` tries they are ignored.
+        """
+        suit_of = self.layout.suit_of
+        holders = range(len(self.capacity))
+        for attempt in range(max_attempts + 1):
+            respect_voids = attempt < max_attempts
+            hands = [list(k) for k in self.known]
+            hands[self.seat] = list(self.hand)
+            room = list(self.capacity)
+            dealt = True
+            for c, u in zip(self.unseen, rng.random(len(self.unseen)).tolist()):
+                suit = suit_of[c]
+                options = [h for h in holders if room[h] and not (respect_voids and self.voids[h][suit])]
+                if not options:
+                    dealt = False
+                    break
+                target = u * sum(room[h] for h in options)
+                for h in options:
+                    target -= room[h]
+                    if target < 0:
+                        break
+                hands[h][c] += 1
+                room[h] -= 1
+            if dealt:
+                return hands
+        raise RuntimeError('Could not deal the unseen cards')
+
+    def sample(self, rng: np.random.Generator) -> Position:
+        """Random position of the trick-playing phase consistent with what the observer knows"""
+        hands = self.sample_hands(rng)[:self.n_seats]
+
+        # The position takes the cards of the trick out of the hands again
+        for slot, c in enumerate(self.trick):
+            hands[(self.leader + slot) % self.n_seats][c] += 1
+
+        return Position(self.layout, hands, self.trump, self.side, self.leader, self.trick, self.last_trick_value)
+
+
+class SearchNode:
+    """
+    Node of an information-set search tree, reached by the moves from the root
+
+    ``seat`` made the move leading here, and the statistics are from its
+    point of view. ``available`` counts the iterations in which the move
+    was legal, which replaces the parent's visit count in the UCB formula.
+    """
+
+    __slots__ = ('seat', 'visits', 'reward', 'available', 'children')
+
+    def __init__(self, seat: Optional[int] = None):
+        self.seat = seat
+        self.visits = 0
+        self.reward = 0.0
+        self.available = 0
+        self.children = {}
+
+    def child(self, move: int) -> Optional['SearchNode']:
+        return self.children.get(move)
+
+    def most_visited(self) -> int:
+        return max(self.children, key=lambda move: self.children[move].visits)
+
+
+class InformationSetMCTS:
+    """
+    Single-observer Information-Set Monte Carlo Tree Search
+
+    Every iteration samples a deal consistent with the observer's
+    knowledge (see :class:`Determinizer`), walks down the tree choosing
+    among the moves that are legal in that deal with UCB, adds one node,
+    and finishes the hand with random legal cards. The tree has one node
+    per sequence of moves, so nodes gather statistics over every deal the
+    observer cannot tell apart. Rewards are the share of the remaining
+    points won by the side of the player who moved.
+
+    Parameters
+    ----------
+    exploration: float
+        Exploration constant of the UCB formula
+    rng: np.random.Generator, optional
+        Source of randomness for deals, expansions and playouts
+    playouts_per_leaf: int
+        Playouts run from each new leaf, whose average is backed up
+        (leaf parallelism, cheaper per playout than a new iteration)
+    tablebase: Tablebase, optional
+        Endgame table of the variant; playouts stop once every hand is
+        small enough to be in it and take the exact value of the rest
+    """
+
+    def __init__(self, exploration: float = 0.7, rng: Optional[np.random.Generator] = None,
+                 playouts_per_leaf: int = 1, tablebase: Optional['Tablebase'] = None):
+        self.exploration = exploration
+        self.rng = get_rng(rng)
+        self.playouts_per_leaf = playouts_per_leaf
+        self.tablebase = tablebase
+
+    def search(
+        self,
+        root: SearchNode,
+        determinizer: Determinizer,
+        iterations: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        min_iterations: int = 0,
+        deadline: Optional[float] = None,
+    ) -> int:
+        """
+        Run iterations from ``root`` until ``iterations`` are done or
+        ``time_limit`` seconds have passed, and return the number run
+
+        ``deadline`` is an absolute ``time.monotonic()`` value, which (unlike
+        a time limit) means the same moment in every process of a pool; the
+        search stops at the earlier of the two. No iteration is started that
+        would likely end after the deadline, going by the average time of
+        the iterations so far. At least ``min_iterations`` are run even if
+        the time is already up, so the root has a move to choose.
+        """
+        if iterations is None and time_limit is None and deadline is None:
+            raise ValueError('Give a number of iterations, a time limit or a deadline')
+        start = now = monotonic()
+        if time_limit is not None:
+            deadline = start + time_limit if deadline is None else min(deadline, start + time_limit)
+
+        count = 0
+        while count < min_iterations or (iterations is None or count < iterations) and \
+                (deadline is None or now + (now - start) / max(count, 1) < deadline):
+            self.iterate(root, determinizer.sample(self.rng))
+            count += 1
+            if deadline is not None:
+                now = monotonic()
+        return count
+
+    def iterate(self, root: SearchNode, position: Position):
+        """One iteration of the search on the sampled ``position``"""
+        total = position.points_left
+        exploration = self.exploration
+        randoms = self.rng.random(position.n_cards + 1).tolist()
+        next_random = len(randoms) - 1
+
+        # Selection and expansion
+        node, path = root, []
+        while not position.is_over:
+            moves = position.legal_moves(merge=False)
+            children = node.children
+            untried = [move for move in moves if move not in children]
+            for move in moves:
+                if move in children:
+                    children[move].available += 1
+
+            seat = position.to_move
+            if untried:
+                move = untried[int(randoms[next_random] * len(untried))]
+                node = children[move] = SearchNode(seat)
+                node.available += 1
+                position.play(move)
+                path.append(node)
+                break
+
+            best_score = -1.0
+            for move in moves:
+                child = children[move]
+                score = child.reward / child.visits + exploration * sqrt(log(child.available) / child.visits)
+                if score > best_score:
+                    best_score, best_move = score, move
+            node = children[best_move]
+            position.play(best_move)
+            path.append(node)
+
+        # Simulation
+        points = position.side_points
+        if self.playouts_per_leaf == 1:
+            points += position.playout(randoms[:position.n_cards], self.tablebase)
+        else:
+            gains = [position.copy().playout(self.rng.random(position.n_cards).tolist(), self.tablebase)
+                     for _ in range(self.playouts_per_leaf)]
+            points += sum(gains) / len(gains)
+
+        # Backpropagation
+        share = points / total if total else 0.5
+        side = position.side
+        for node in path:
+            node.visits += 1
+            node.reward += share if side[node.seat] else 1.0 - share
+
+
+def root_statistics(root: SearchNode) -> Dict[int, Tuple[int, float]]:
+    """Visits and total reward of each move of the root"""
+    return {move: (child.visits, child.reward) for move, child in root.children.items()}
+
+
+def merge_root_statistics(statistics: Iterable[Dict[int, Tuple[int, float]]]) -> Dict[int, Tuple[int, float]]:
+    """Add up the root statistics of independent searches of the same decision"""
+    merged = {}
+    for stats in statistics:
+        for move, (visits, reward) in stats.items():
+            total_visits, total_reward = merged.get(move, (0, 0.0))
+            merged[move] = (total_visits + visits, total_reward + reward)
+    return merged
+
+
+def search_root(
+    determinizer: Determinizer,
+    iterations: Optional[int],
+    deadline: Optional[float],
+    exploration: float,
+    playouts_per_leaf: int,
+    seed: int,
+    tablebase: Optional['Tablebase'] = None,
+) -> Tuple[Dict[int, Tuple[int, float]], int]:
+    """
+    Search a decision from a new tree (in a worker process) until
+    ``iterations`` are done or the ``time.monotonic()`` deadline passes,
+    and return the root statistics and the number of iterations run
+    """
+    search = InformationSetMCTS(exploration, rng=np.random.default_rng(seed), playouts_per_leaf=playouts_per_leaf,
+                                tablebase=tablebase)
+    root = SearchNode()
+    count = search.search(root, determinizer, iterations, deadline=deadline)
+    return root_statistics(root), count
+
+
+class RootParallelSearch:
+    """
+    Information-Set MCTS of one decision spread over a process pool
+
+    Each worker grows its own tree from independent deals and random
+    numbers while this process searches its own tree (which may be reused
+    from earlier decisions), then the visits and rewards of the root moves
+    are added up (root parallelism). The budget applies to every process,
+    so with a time limit the decision takes the same time but runs about
+    ``n_workers`` times more iterations.
+
+    With a time limit, every process searches until the same absolute
+    deadline, less ``margin`` seconds to send and merge the results, and
+    the statistics of workers that are not done by the deadline (e.g.
+    because the pool was busy) are left out.
+
+    Parameters
+    ----------
+    n_workers: int, optional
+        Number of processes searching, including this one (all cores by default)
+    exploration: float
+        Exploration constant of the UCB formula
+    playouts_per_leaf: int
+        Playouts run from each new leaf
+    executor: Executor, optional
+        Pool to submit the searches to, e.g. shared by all the tables of a
+        server; by default a pool is started on first use
+    margin: float
+        Seconds kept before the deadline to collect the workers' results
+    tablebase: Tablebase, optional
+        Endgame table used by the playouts of every process (a table saved
+        to a directory is memory-mapped by the workers rather than copied)
+    """
+
+    def __init__(self, n_workers: Optional[int] = None, exploration: float = 0.7, playouts_per_leaf: int = 1,
+                 executor: Optional[Executor] = None, margin: float = 0.01, tablebase: Optional['Tablebase'] = None):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.exploration = exploration
+        self.playouts_per_leaf = playouts_per_leaf
+        self.tablebase = tablebase
+        self.margin = margin
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.n_workers - 1)
+        return self._executor
+
+    def close(self):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def search(
+        self,
+        root: SearchNode,
+        determinizer: Determinizer,
+        rng: np.random.Generator,
+        iterations: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Dict[int, Tuple[int, float]], int]:
+        """
+        Search the decision at ``root`` in every process until ``iterations``
+        are done or the deadline (a ``time.monotonic()`` value, by default
+        ``time_limit`` from now) passes, and return the merged root
+        statistics and the total number of iterations
+        """
+        if time_limit is not None:
+            end = monotonic() + time_limit
+            deadline = end if deadline is None else min(deadline, end)
+        search_deadline = None if deadline is None else deadline - self.margin
+
+        seeds = rng.integers(2 ** 63, size=self.n_workers - 1).tolist()
+        futures = [
+            self.executor.submit(search_root, determinizer, iterations, search_deadline,
+                                 self.exploration, self.playouts_per_leaf, seed, self.tablebase)
+            for seed in seeds
+        ]
+
+        search = InformationSetMCTS(self.exploration, rng=rng, playouts_per_leaf=self.playouts_per_leaf,
+                                    tablebase=self.tablebase)
+        count = search.search(root, determinizer, iterations, min_iterations=1, deadline=search_deadline)
+        statistics = [root_statistics(root)]
+
+        # Only the workers done by the deadline are merged; the others stop on their own
+        timeout = None if deadline is None else max(0.0, deadline - monotonic())
+        done, late = wait(futures, timeout=timeout)
+        for future in late:
+            future.cancel()
+        for future in done:
+            stats, worker_count = future.result()
+            statistics.append(stats)
+            count += worker_count
+        return merge_root_statistics(statistics), count
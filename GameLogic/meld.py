@@ -1,8 +1,5 @@
 from GameLogic.cards import Card, Hand
-from termcolor import colored
-
-import os
-os.system('color')
+from GameLogic.terminal import colored
 
 
 class Meld:
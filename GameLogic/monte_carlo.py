@@ -2,12 +2,18 @@ import os
 import sys
 sys.path.append(os.path.abspath('./'))
 
+import csv
 import json
-from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from math import ceil, log2
+from typing import Any, Callable, Dict, Optional, List, Tuple
 import numpy as np
 
-import matplotlib.pyplot as plt
-
+from GameLogic.accumulators import PairedComparison, RunningStats, StoppingRule
+from GameLogic.bidding import BidLadder
+from GameLogic.cache import SimulationCache, seed_key
+from GameLogic.checkpoint import Checkpoint
 from GameLogic.games import (
     Pinochle,
     DoubleDeckPinochle,
@@ -23,10 +29,14 @@ from GameLogic.cards import (
 from GameLogic.players import (
     PinochlePlayer,
     RandomPinochlePlayer,
+    CoupledRandomPinochlePlayer,
     SimplePinochlePlayer,
     HumanPinochlePlayer,
 )
 from GameLogic.meld import Meld
+from GameLogic.profiling import PhaseTimer
+from GameLogic.rng import SeedLike, as_seed_sequence, make_rng, spawn_seeds, trial_seed
+from GameLogic.rules import RuleSet
 
 
 # Variables for plotting
@@ -38,12 +48,25 @@ suit_colors = {
 }
 
 
+def _pyplot():
+    """matplotlib.pyplot, imported on first use so that headless runs never load it"""
+    import matplotlib.pyplot as plt
+    return plt
+
+
 def simulate_full_hand(
     hand: Hand,
     trump: str,
     n_trials: int,
     player_type: type,
     other_player_type: Optional[type] = None,
+    seed: SeedLike = None,
+    timer: Optional[PhaseTimer] = None,
+    rules: Optional[RuleSet] = None,
+    n_workers: int = 1,
+    stopping: Optional[StoppingRule] = None,
+    cache: Optional[SimulationCache] = None,
+    checkpoint: Optional[Checkpoint] = None,
 ):
     """
     Test the given human hand in a Monte Carlo-type simulation.
@@ -71,6 +94,34 @@ def simulate_full_hand(
     other_player_type : type[PinochlePlayer]
         Determines the algorithm to use to make the decisions
         for the other players in the simulation trials
+    seed : int or SeedSequence, optional
+        Master seed of the simulation. Each trial is reseeded from
+        the master seed and its trial index, so the results only
+        depend on the seed and not on how the trials are scheduled.
+    timer : PhaseTimer, optional
+        If given, the time spent in each phase of the hands and in each
+        player decision is added to this timer
+    rules : RuleSet, optional
+        Settings of the simulated Firehouse games, the variant defaults
+        are used if not given
+    n_workers : int
+        Number of processes to split the trials across
+        (see :func:`simulate_full_hand_parallel`)
+    stopping : StoppingRule, optional
+        If given, the simulation stops as soon as the confidence interval
+        of the mean counters is narrow enough, and ``n_trials`` is only an
+        upper bound (meld, with its rare huge values, is not checked).
+        Stopping is checked after every trial, in trial order, so it stops
+        after the same trial for any number of workers.
+    cache : SimulationCache, optional
+        Cache of earlier results of the same simulation (same hand, trump,
+        player types, rules and seed). Cached trials are read back, and
+        only the missing ones are played and added to the cache.
+    checkpoint : Checkpoint, optional
+        If given, the trials played so far are written to the checkpoint
+        as they run (and once they are done), and a rerun with the same
+        checkpoint starts after them. Unseeded runs keep the master seed
+        they draw in the checkpoint, so they resume on the same trials.
 
     Returns
     -----
@@ -82,9 +133,210 @@ def simulate_full_hand(
     if not hand.has_marriage(trump):
         return [], []
 
-    # Initialize the output lists
-    counters = [None] * n_trials
-    meld = [None] * n_trials
+    results = simulate_outcomes(
+        hand, trump, n_trials, player_type, other_player_type, seed, timer, rules, n_workers, stopping, cache,
+        checkpoint,
+    )
+    return results[0].tolist(), results[1].tolist()
+
+
+# Outcomes recorded for every trial of a simulation, in the rows of the result arrays
+trial_outcomes = ('counters', 'meld', 'partner_counters')
+
+
+def simulate_outcomes(
+    hand: Hand,
+    trump: str,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type],
+    seed: SeedLike,
+    timer: Optional[PhaseTimer],
+    rules: Optional[RuleSet],
+    n_workers: int,
+    stopping: Optional[StoppingRule],
+    cache: Optional[SimulationCache],
+    checkpoint: Optional[Checkpoint] = None,
+) -> np.ndarray:
+    """
+    Outcomes of every trial of :func:`simulate_full_hand`
+
+    Parameters
+    ----------
+    hand, trump, n_trials, player_type, other_player_type, seed, timer, rules, n_workers, stopping, cache, checkpoint
+        As in :func:`simulate_full_hand`; the hand must hold a marriage in trump
+
+    Returns
+    -------
+    np.ndarray
+        One row for each outcome named in ``trial_outcomes`` (counters and
+        meld of the player, counters of its partner) and one column per trial
+    """
+    tracker = _TrialTracker(stopping)
+
+    def simulation_key(seed):
+        return SimulationCache.key(
+            'simulate_full_hand',
+            outcomes=trial_outcomes,
+            hand=[card.to_str() for card in hand.cards],
+            trump=trump,
+            player_type=player_type.__name__,
+            other_player_type=(other_player_type or player_type).__name__,
+            rules=None if rules is None else rules.get_state(),
+            seed=seed_key(seed),
+        )
+
+    if checkpoint is not None:
+        seed = checkpoint.master_seed(simulation_key(seed), seed)
+    key = simulation_key(seed)
+
+    # Read back the trials of earlier runs, from the cache or from an interrupted run
+    cached = np.zeros((len(trial_outcomes), 0), dtype=np.int32)
+    if cache is not None:
+        stored = cache.get(key)
+        if stored is not None:
+            cached = stored
+    if checkpoint is not None:
+        entry = checkpoint.get(key)
+        if entry is not None and entry['outcomes'].shape[1] > cached.shape[1]:
+            cached = entry['outcomes']
+    for idx in range(min(n_trials, cached.shape[1])):
+        if tracker.add(int(cached[0, idx])):
+            return cached[:, :idx + 1]
+    if cached.shape[1] >= n_trials:
+        return cached[:, :n_trials]
+
+    progress = None
+    if checkpoint is not None:
+        def save_progress(new_outcomes: np.ndarray):
+            if checkpoint.due():
+                checkpoint.update(key, outcomes=np.concatenate([cached, new_outcomes], axis=1))
+                checkpoint.save(force=True)
+        progress = save_progress
+
+    first_trial = cached.shape[1]
+    if n_workers > 1:
+        results = _simulate_parallel(
+            hand, trump, first_trial, n_trials, player_type, other_player_type, seed, timer, rules,
+            n_workers, 4, tracker, progress,
+        )
+    else:
+        results = _simulate_sequential(
+            hand, trump, first_trial, n_trials, player_type, other_player_type, seed, timer, rules, tracker,
+            progress,
+        )
+
+    results = np.concatenate([cached, results], axis=1)
+    if cache is not None and results.shape[1] > cached.shape[1]:
+        cache.put(key, results)
+    if checkpoint is not None:
+        checkpoint.update(key, outcomes=results)
+        checkpoint.save(force=True)
+    return results
+
+
+def _simulate_sequential(
+    hand: Hand,
+    trump: str,
+    first_trial: int,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type],
+    seed: SeedLike,
+    timer: Optional[PhaseTimer],
+    rules: Optional[RuleSet],
+    tracker: '_TrialTracker',
+    progress: Optional[Callable[[np.ndarray], None]] = None,
+) -> np.ndarray:
+    """
+    Play trials ``first_trial`` to ``n_trials`` in this process, and return their outcomes
+
+    ``progress`` is called with the outcomes of the trials played so far after each trial.
+    """
+    results = np.zeros((len(trial_outcomes), n_trials - first_trial), dtype=np.int32)
+    game, player = _simulation_game(hand, trump, player_type, other_player_type, rules, timer)
+    for idx in range(first_trial, n_trials):
+        col = idx - first_trial
+        results[:, col] = _play_trial(game, player, trump, seed, idx)
+        if tracker.add(int(results[0, col])):
+            return results[:, :col + 1]
+        if progress is not None:
+            progress(results[:, :col + 1])
+    return results
+
+
+class _TrialTracker:
+    """Running statistics of the counters of a simulation, checked against a stopping rule"""
+
+    def __init__(self, stopping: Optional[StoppingRule]):
+        self.stopping = stopping
+        self.counters = RunningStats()
+
+    def add(self, counters: int) -> bool:
+        """Record a trial and return whether the simulation can stop"""
+        if self.stopping is None:
+            return False
+        self.counters.add(counters)
+        return self.stopping.converged(self.counters)
+
+
+def simulate_bid_ladder(
+    hand: Hand,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type] = None,
+    seed: SeedLike = None,
+    timer: Optional[PhaseTimer] = None,
+    rules: Optional[RuleSet] = None,
+    n_workers: int = 1,
+    stopping: Optional[StoppingRule] = None,
+    cache: Optional[SimulationCache] = None,
+    suits: Optional[List[str]] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, BidLadder]:
+    """
+    Save probability and expected score of every bid, for each suit
+    the hand can call trump
+
+    Each suit is simulated once, like in :func:`simulate_full_hand`
+    (with the same trials and cache entries), and the points of the
+    bidder's side in each trial (its counters, the counters of its
+    partner, and its meld) give the whole bid ladder at once.
+
+    Parameters
+    ----------
+    hand, n_trials, player_type, other_player_type, seed, timer, rules, n_workers, stopping, cache, checkpoint
+        As in :func:`simulate_full_hand`
+    suits : list[str], optional
+        Suits to try for trump, all of them by default
+
+    Returns
+    -------
+    Dict[str, BidLadder]
+        Ladder of each suit with a marriage in the hand
+    """
+    ladders = {}
+    for suit in suits or Card.suits:
+        if not hand.has_marriage(suit):
+            continue
+        outcomes = simulate_outcomes(
+            hand, suit, n_trials, player_type, other_player_type, seed, timer, rules, n_workers, stopping, cache,
+            checkpoint,
+        )
+        counters, meld, partner_counters = outcomes
+        ladders[suit] = BidLadder(suit, counters + partner_counters + meld, rules or FirehousePinochle.rules)
+    return ladders
+
+
+def _simulation_game(
+    hand: Hand,
+    trump: str,
+    player_type: type,
+    other_player_type: Optional[type],
+    rules: Optional[RuleSet],
+    timer: Optional[PhaseTimer],
+):
+    """Firehouse game where the first player always holds ``hand`` and wins the bid in ``trump``"""
 
     # Set up players
     if other_player_type is None:
@@ -96,7 +348,9 @@ def simulate_full_hand(
     players = [player, other_player_1, other_player_2]
 
     # Create the game
-    game = FirehousePinochle(players)
+    game = FirehousePinochle(players, rules=rules)
+    if timer is not None:
+        timer.instrument(game)
 
     # Preset the values to stay constant for all trials
     game.preset_bid = 0
@@ -104,15 +358,242 @@ def simulate_full_hand(
     game.preset_trump = trump
     game.preset_player_hands[player] = hand
 
-    # Play the hands
-    for idx in range(n_trials):
-        game.play_hand()
+    return game, player
+
+
+def _play_trial(game: FirehousePinochle, player: PinochlePlayer, trump: str, seed: SeedLike, idx: int):
+    """Play trial ``idx`` of a simulation, and return the outcomes of ``player`` (see ``trial_outcomes``)"""
+    if seed is not None:
+        game.seed(trial_seed(seed, idx))
+
+    # The seats rotate with the hand count, which must follow the trial index
+    # (and not the number of trials this game played) for the trial to be reproducible
+    game.hand_count = idx - 1
+    game.play_hand()
+    last_trick_value = game.rules.last_trick_value
+    return (
+        player.counters(last_trick_value),
+        player.meld.total_meld_given_trump[trump],
+        player.partner.counters(last_trick_value),
+    )
+
 
-        # Record the outcome
-        counters[idx] = player.counters(game.last_trick_value)
-        meld[idx] = player.meld.total_meld_given_trump[trump]
+def _simulate_trials(
+    shm_name: str,
+    first_trial: int,
+    n_trials: int,
+    start: int,
+    stop: int,
+    hand: Hand,
+    trump: str,
+    player_type: type,
+    other_player_type: Optional[type],
+    seed: np.random.SeedSequence,
+    rules: Optional[RuleSet],
+    timed: bool,
+) -> Optional[dict]:
+    """Play trials ``start`` to ``stop`` in a worker and write the results into shared memory"""
+    timer = PhaseTimer() if timed else None
+    game, player = _simulation_game(hand, trump, player_type, other_player_type, rules, timer)
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        results = np.ndarray((len(trial_outcomes), n_trials - first_trial), dtype=np.int32, buffer=shm.buf)
+        for idx in range(start, stop):
+            results[:, idx - first_trial] = _play_trial(game, player, trump, seed, idx)
+        del results
+    finally:
+        shm.close()
+
+    return None if timer is None else timer.totals
+
+
+def simulate_full_hand_parallel(
+    hand: Hand,
+    trump: str,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type] = None,
+    seed: SeedLike = None,
+    timer: Optional[PhaseTimer] = None,
+    rules: Optional[RuleSet] = None,
+    n_workers: Optional[int] = None,
+    chunks_per_worker: int = 4,
+    stopping: Optional[StoppingRule] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run :func:`simulate_full_hand` with the trials split across a process pool
+
+    Every trial is reseeded from the master seed and its index (a random
+    master seed is drawn if none is given), so the results are the same
+    as a sequential run with the same seed, whatever the number of workers.
+    Workers write the counters and meld of their trials straight into one
+    block of shared memory, so no per-trial results are pickled.
+
+    With a stopping rule, the chunks are checked trial by trial in order as
+    they complete, and the chunks that have not started are cancelled once
+    the rule is met; the results are cut after the same trial as in a
+    sequential run.
+
+    Parameters
+    ----------
+    hand, trump, n_trials, player_type, other_player_type, seed, rules, stopping
+        As in :func:`simulate_full_hand`
+    timer : PhaseTimer, optional
+        If given, the phase times of all the workers are added to this timer
+    n_workers : int, optional
+        Number of worker processes (all cores by default)
+    chunks_per_worker : int
+        The trials are split in this many chunks per worker, to balance the load
+
+    Returns
+    -------
+    np.ndarray
+        Counters pulled by the player in each trial
+    np.ndarray
+        Meld of the player in each trial
+    """
+    if not hand.has_marriage(trump):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
 
-    return counters, meld
+    results = _simulate_parallel(
+        hand, trump, 0, n_trials, player_type, other_player_type, seed, timer, rules,
+        n_workers, chunks_per_worker, _TrialTracker(stopping),
+    )
+    return results[0], results[1]
+
+
+def _simulate_parallel(
+    hand: Hand,
+    trump: str,
+    first_trial: int,
+    n_trials: int,
+    player_type: type,
+    other_player_type: Optional[type],
+    seed: SeedLike,
+    timer: Optional[PhaseTimer],
+    rules: Optional[RuleSet],
+    n_workers: Optional[int],
+    chunks_per_worker: int,
+    tracker: '_TrialTracker',
+    progress: Optional[Callable[[np.ndarray], None]] = None,
+) -> np.ndarray:
+    """
+    Play trials ``first_trial`` to ``n_trials`` on a process pool, and return their outcomes
+
+    ``progress`` is called with the outcomes of the first trials whenever
+    a chunk completes the trials before it.
+    """
+    seed = as_seed_sequence(seed)
+    n_workers = n_workers or os.cpu_count() or 1
+    n_new = n_trials - first_trial
+    n_chunks = max(1, min(n_new, n_workers * chunks_per_worker))
+    bounds = np.linspace(first_trial, n_trials, n_chunks + 1).astype(int).tolist()
+
+    chunks = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    n_used = n_new
+
+    shm = SharedMemory(create=True, size=max(1, len(trial_outcomes) * n_new * np.dtype(np.int32).itemsize))
+    try:
+        shared = np.ndarray((len(trial_outcomes), n_new), dtype=np.int32, buffer=shm.buf)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {
+                executor.submit(_simulate_trials, shm.name, first_trial, n_trials, start, stop, hand, trump,
+                                player_type, other_player_type, seed, rules, timer is not None): chunk
+                for chunk, (start, stop) in enumerate(chunks)
+            }
+
+            # Check the stopping rule on the trials in order, as the chunks complete
+            completed, next_chunk = set(), 0
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                future.result()
+                if n_used < n_new:
+                    continue
+                completed.add(futures[future])
+                while next_chunk in completed and n_used == n_new:
+                    start, stop = chunks[next_chunk]
+                    if tracker.stopping is not None:
+                        for idx in range(start - first_trial, stop - first_trial):
+                            if tracker.add(int(shared[0, idx])):
+                                n_used = idx + 1
+                                break
+                    next_chunk += 1
+                if n_used < n_new:
+                    for other in futures:
+                        other.cancel()
+                elif progress is not None and next_chunk:
+                    progress(shared[:, :chunks[next_chunk - 1][1] - first_trial])
+
+        if timer is not None:
+            for future in futures:
+                if not future.cancelled():
+                    timer.merge(future.result())
+
+        results = shared[:, :n_used].copy()
+    finally:
+        # The view must go before the block can be closed
+        shared = None
+        shm.close()
+        shm.unlink()
+
+    return results
+
+
+def flatten_results(results: Any, prefix: str = '') -> Dict[str, Any]:
+    """
+    Flatten the nested results of an analysis into named columns
+
+    Nested dictionaries are joined into names like 'Spades/counters', lists
+    of dictionaries (e.g. :meth:`BidLadder.ladder`) become one column per
+    key, and lists of numbers become arrays.
+    """
+    if isinstance(results, dict):
+        flat = {}
+        for key, value in results.items():
+            name = f'{prefix}/{key}' if prefix else str(key)
+            flat.update(flatten_results(value, name))
+        return flat
+    if isinstance(results, (list, tuple)) and results and all(isinstance(row, dict) for row in results):
+        return flatten_results({key: [row[key] for row in results] for key in results[0]}, prefix)
+    if isinstance(results, (list, tuple, np.ndarray)):
+        return {prefix: np.asarray(results)}
+    return {prefix: results.item() if isinstance(results, np.generic) else results}
+
+
+def export_results(results: Any, path: str):
+    """
+    Write the results of an analysis to a file, in the format of its extension
+
+    The results are flattened with :func:`flatten_results`. A ``.npz`` file
+    holds one array per column, a ``.json`` file one list or value per
+    column, and a ``.csv`` file one row per value, with the column name and
+    the index of the value in the column (empty for single values).
+    """
+    columns = flatten_results(results)
+    extension = os.path.splitext(path)[1].lower()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if extension == '.npz':
+        np.savez(path, **{name: np.asarray(value) for name, value in columns.items()})
+    elif extension == '.json':
+        with open(path, 'w') as f:
+            json.dump({name: value.tolist() if isinstance(value, np.ndarray) else value
+                       for name, value in columns.items()}, f, indent=2)
+    elif extension == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'index', 'value'])
+            for name, value in columns.items():
+                if isinstance(value, np.ndarray):
+                    writer.writerows((name, idx, x) for idx, x in enumerate(value.tolist()))
+                else:
+                    writer.writerow((name, '', value))
+    else:
+        raise ValueError(f'Unknown results format "{extension}", must be ".npz", ".json" or ".csv"')
 
 
 def plot_data_by_suit(
@@ -127,6 +608,8 @@ def plot_data_by_suit(
     bins: int = None,
 ):
 
+    plt = _pyplot()
+
     # Check for allowed style
     allowed_styles = ['hist', 'bar']
     if chart_style not in allowed_styles:
@@ -196,6 +679,8 @@ def plot_data_by_suit(
 
 def plot_next_card_data(data):
 
+    plt = _pyplot()
+
     # Define the suits and card ranks of interest
     suits = ['Hearts', 'Spades', 'Clubs', 'Diamonds']
     ranks = ['A', '10', 'K', 'Q', 'J']
@@ -235,63 +720,103 @@ def plot_next_card_data(data):
 
 def compare_players(
     n_trials: int = 1000,
-):
+    seed: SeedLike = None,
+    timer: Optional[PhaseTimer] = None,
+    n_workers: int = 1,
+    stopping: Optional[StoppingRule] = None,
+    cache: Optional[SimulationCache] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    plot_results: bool = False,
+) -> Dict[str, Dict[str, List[int]]]:
     """
     Compare the performance of all player types against all
     other player types with many runs on a single, random hand
-    and plot the results
 
     Parameters
     ----------
     n_trials: int
         Number of trials to run per trump suit, per hand, per
         pairing of player types
+    seed: int, optional
+        Master seed used to draw the hand and run the trials
+    timer: PhaseTimer, optional
+        Timer collecting the time spent in each phase of the hands
+    n_workers: int
+        Number of processes to split the trials of each pairing across
+    stopping: StoppingRule, optional
+        Rule to stop the trials of each pairing early
+    cache: SimulationCache, optional
+        Cache of the simulation results
+    checkpoint: Checkpoint, optional
+        Checkpoint of the simulations, to resume an interrupted comparison
+    plot_results: bool
+        If True, plot the distributions of each suit (see :func:`plot_player_comparison`)
+
+    Returns
+    -------
+    Dict[str, Dict[str, List[int]]]
+        Counters of each trial, by trump suit and by pairing
+        (e.g. 'Simp VS Rand' for a simple player against random players)
     """
 
-    hand = FirehousePinochleDeck.get_random_hand()
+    if checkpoint is not None:
+        seed = checkpoint.master_seed(SimulationCache.key('compare_players', seed=seed_key(seed)), seed)
+    hand_seed, trials_seed = spawn_seeds(seed, 2)
+    hand = FirehousePinochleDeck.get_random_hand(rng=make_rng(hand_seed))
     print('Hand')
     print(hand)
 
+    # Map names
+    names = {
+        RandomPinochlePlayer: 'Rand',
+        SimplePinochlePlayer: 'Simp',
+    }
+
     player_types = RandomPinochlePlayer, SimplePinochlePlayer
+    results = {}
     for suit in Card.suits:
         if not hand.has_marriage(suit):
             continue
 
-        results = {
-            (player_type, opponent_type): None
-            for player_type in player_types for opponent_type in player_types
-        }
-
+        print()
+        print(suit)
+        results[suit] = {}
         for player_type in player_types:
             for opponent_type in player_types:
-                counters, _ = simulate_full_hand(hand, suit, n_trials, player_type, opponent_type)
-                results[(player_type, opponent_type)] = counters
+                counters, _ = simulate_full_hand(
+                    hand, suit, n_trials, player_type, opponent_type, seed=trials_seed, timer=timer,
+                    n_workers=n_workers, stopping=stopping, cache=cache, checkpoint=checkpoint,
+                )
+                title = f'{names[player_type]} VS {names[opponent_type]}'
+                results[suit][title] = counters
 
-        # Map names
-        names = {
-            RandomPinochlePlayer: 'Rand',
-            SimplePinochlePlayer: 'Simp',
-        }
+                # Print the stats to console
+                stats = RunningStats(counters)
+                print(f'{title}: trials={stats.count}, mean={stats.mean:.2f}, std={stats.std:.2f}')
 
-        # Plot
-        print()
-        print(suit)
+    if plot_results:
+        plot_player_comparison(results)
+
+    return results
+
+
+def plot_player_comparison(results: Dict[str, Dict[str, List[int]]]):
+    """Plot the counters of each pairing of :func:`compare_players`, one figure per trump suit"""
+
+    plt = _pyplot()
+    for suit, pairings in results.items():
         fig, axs = plt.subplots(2, 2)
         all_axes = axs.flat
-        for ax, (player_type, opponent_type), counters in zip(all_axes, results, results.values()):
+        for ax, (title, counters) in zip(all_axes, pairings.items()):
 
             # Assuming the range and distribution of your data are known, adjust bins accordingly
             bins = np.linspace(min(counters), max(counters), 30)
             ax.hist(counters, bins=bins, label=suit, alpha=0.6, color=suit_colors[suit], edgecolor='black')
 
             # Customize the chart
-            title = f'{names[player_type]} VS {names[opponent_type]}'
             ax.set_title(title)
             ax.legend()
 
-            # Print the stats to console
-            print(f'{title}: mean={np.mean(counters)}, std={np.std(counters)}')
-
         # Show the plot
         plt.tight_layout()
         plt.show()
@@ -300,15 +825,18 @@ def compare_players(
 def power_rank_meld_distributions(
     n_trials: int = 1000,
     deck_type: type = FirehousePinochleDeck,
+    seed: SeedLike = None,
+    checkpoint: Optional[Checkpoint] = None,
+    plot_results: bool = False,
 ):
     """
-    Plot a distribution of the power, rank, and meld of
+    Find the distribution of the power, rank, and meld of
     many random hands and return the values
 
     Generate ``n_trials`` random hands and calculate the
     power, rank, and meld of each suit for each hand.
-    Store all of these values in 3 lists, and then bin
-    them into histograms and plot them.
+    Store all of these values in 3 lists, and optionally
+    bin them into histograms and plot them.
 
     Parameters
     ----------
@@ -320,6 +848,14 @@ def power_rank_meld_distributions(
         :class:`DoublePinochleDeck`, and
         :class:`FirehousePinochleDeck`.
         The default is :class:`FirehousePinochleDeck`.
+    seed: int, optional
+        Seed used to generate the random hands
+    checkpoint: Checkpoint, optional
+        If given, the values and the state of the generator are written to
+        the checkpoint as the hands are drawn, and a rerun with the same
+        checkpoint continues the same stream of hands
+    plot_results: bool
+        If True, plot the histograms of the values
 
     Returns
     -------
@@ -340,17 +876,44 @@ def power_rank_meld_distributions(
     powers = [None] * n_trials * 4
     melds = [None] * n_trials * 4
     ranks = [None] * n_trials * 4
-    for i in range(0, n_trials * 4, 4):
-        hand = deck_type.get_random_hand()
+    rng = make_rng(seed)
+
+    # Pick up the hands and the generator of an interrupted run
+    first = 0
+    if checkpoint is not None:
+        key = SimulationCache.key(
+            'power_rank_meld_distributions', n_trials=n_trials, deck_type=deck_type.__name__, seed=seed_key(seed),
+        )
+        entry = checkpoint.get(key)
+        if entry is not None:
+            first = len(entry['powers'])
+            powers[:first] = entry['powers'].tolist()
+            melds[:first] = entry['melds'].tolist()
+            ranks[:first] = entry['ranks'].tolist()
+            rng.bit_generator.state = json.loads(entry['rng'])
+
+    for i in range(first, n_trials * 4, 4):
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.update(key, powers=np.array(powers[:i]), melds=np.array(melds[:i]), ranks=np.array(ranks[:i]),
+                              rng=json.dumps(rng.bit_generator.state))
+            checkpoint.save(force=True)
+
+        hand = deck_type.get_random_hand(rng=rng)
         meld = Meld(hand)
         for j, suit in enumerate(Card.suits):
             powers[i + j] = meld.power[suit]
             melds[i + j] = meld.total_meld_given_trump[suit]
             ranks[i + j] = meld.rank[suit]
 
-    plot_data_by_suit({'Counts': powers}, title='Suit Power')
-    plot_data_by_suit({'Counts': melds}, title='Suit Meld')
-    plot_data_by_suit({'Counts': ranks}, title='Suit Rank')
+    if checkpoint is not None:
+        checkpoint.update(key, powers=np.array(powers), melds=np.array(melds), ranks=np.array(ranks),
+                          rng=json.dumps(rng.bit_generator.state))
+        checkpoint.save(force=True)
+
+    if plot_results:
+        plot_data_by_suit({'Counts': powers}, title='Suit Power')
+        plot_data_by_suit({'Counts': melds}, title='Suit Meld')
+        plot_data_by_suit({'Counts': ranks}, title='Suit Rank')
 
     return powers, melds, ranks
 
@@ -359,6 +922,14 @@ def choose_next_card(
     game_state: dict,
     n_trials: int,
     plot_results: bool = False,
+    seed: SeedLike = None,
+    timer: Optional[PhaseTimer] = None,
+    stopping: Optional[StoppingRule] = None,
+    paired: bool = False,
+    antithetic: bool = False,
+    allocation: Optional[str] = None,
+    cache: Optional[SimulationCache] = None,
+    checkpoint: Optional[Checkpoint] = None,
 ) -> dict:
     """
     Run many simulations of a given game state starting from some
@@ -378,9 +949,46 @@ def choose_next_card(
     game_state: dict
         A dictionary representing the game state
     n_trials: int
-        Number of trials to run for each possible card play
+        Number of trials to run for each possible card play (on
+        average, with an adaptive ``allocation``)
     plot_results: bool
         If True, plot the distributions for each possible play
+    seed: int, optional
+        Master seed of the random rollouts
+    timer: PhaseTimer, optional
+        Timer collecting the time spent in each phase of the rollouts
+    stopping: StoppingRule, optional
+        If given, the plays are simulated in rounds of one trial each, and
+        the simulation stops once the rule is settled: one play is clearly
+        best, or every confidence interval is narrow enough. ``n_trials``
+        is then an upper bound.
+    paired: bool
+        Use common random numbers: trial ``i`` of every play is run with
+        the same seed and with :class:`CoupledRandomPinochlePlayer` players,
+        which make the same plays after each candidate wherever they can,
+        and plays are compared by their trial-by-trial differences, which
+        are much less noisy than their separate means
+    antithetic: bool
+        Run the trials in pairs, the second of each pair making the mirror
+        image of the random choices of the first (see
+        :class:`AntitheticGenerator`). The pairs are treated as independent
+        trials, which overstates the standard errors a little.
+    allocation: str, optional
+        How to spread the rollouts between the plays. By default every
+        play gets ``n_trials``. With 'halving' (successive halving), the
+        budget is split in rounds and each round drops the worse half of
+        the plays. With 'elimination', the plays run in rounds of one trial
+        and a play is dropped as soon as it is clearly worse than the best
+        (see :meth:`StoppingRule.dominated`, with the rule of ``stopping``
+        or a 95% rule). Both stop once a single play is left.
+    cache: SimulationCache, optional
+        Cache of the rollouts of earlier runs from the same game state, with
+        the same seed and options. Only seeded runs are cached, so that
+        cached and new trials of paired plays stay paired.
+    checkpoint: Checkpoint, optional
+        If given, the rollouts of each play are written to the checkpoint as
+        they run, and a rerun with the same checkpoint starts after them
+        (an unseeded run keeps the master seed it draws in the checkpoint)
 
     Returns
     -------
@@ -390,12 +998,17 @@ def choose_next_card(
 
         Each dictionary contains the 'mean' and 'std' of the
         distribution as well as the distribution data itself
-        in a list called 'counters'.
+        in a list called 'counters', and the number of 'trials'
+        run for the play. Paired runs also give the
+        'difference' of the mean to that of the best play and its
+        standard error 'difference_se'.
     """
 
+    # Paired trials use random players that stay in step across the plays
+    rollout_type = CoupledRandomPinochlePlayer if paired else RandomPinochlePlayer
     game_state['human_player'] = None
     for idx in range(len(game_state['players'])):
-        game_state['players'][idx]['player_type'] = RandomPinochlePlayer.__name__
+        game_state['players'][idx]['player_type'] = rollout_type.__name__
 
     game = Pinochle.restore_state(game_state)
     if game.trick is None or game.trick.complete:
@@ -404,40 +1017,179 @@ def choose_next_card(
     player = game.get_next_player()
     player_index = player.index
     unique_legal_plays = set(game.trick.legal_plays(player.hand))
-    counters = {card.to_str(): [None] * n_trials for card in unique_legal_plays}
 
+    # An unseeded run draws the master seed it keeps in the checkpoint
+    if checkpoint is not None:
+        run_key = SimulationCache.key(
+            'choose_next_card', position=_position_key(game_state), paired=paired, antithetic=antithetic,
+            seed=seed_key(seed),
+        )
+        seed = checkpoint.master_seed(run_key, seed)
+
+    # Each play has its own stream of trial seeds, unless the plays are paired
+    # on the same trials
+    seed_part = seed_key(seed)
+    seed = as_seed_sequence(seed)
+    card_seeds = {}
     for card in unique_legal_plays:
-        for idx in range(n_trials):
-            game = Pinochle.restore_state(game_state)
-
-            if game.trick is None or game.trick.complete:
-                game.set_up_trick()
-            game.play_next_card(card)
-            game.play_cards_in_trick()
-            game.finish_trick()
-
-            game.play_tricks()
-
-            for player in game.current_players:
-                if player.index == player_index:
-                    mine = player.counters(game.last_trick_value)
-                    partners = player.partner.counters(game.last_trick_value)
-                    counters[card.to_str()][idx] = mine + partners
-                    break
+        card_index = Card.suits.index(card.suit) * len(Card.values) + Card.values.index(card.value)
+        card_seeds[card] = seed if paired else trial_seed(seed, card_index)
+
+    if allocation not in (None, 'halving', 'elimination'):
+        raise ValueError(f'Unknown allocation "{allocation}", must be "halving" or "elimination"')
+
+    plays = {card.to_str(): card for card in unique_legal_plays}
+    counters = {key: [] for key in plays}
+    comparison = PairedComparison(counters)
+    stats = comparison.stats
+
+    # Read back the rollouts of earlier runs, from the cache or from an interrupted run
+    cache_keys, cached = {}, {}
+    if (cache is not None or checkpoint is not None) and seed_part is not None:
+        position = _position_key(game_state)
+        for key in plays:
+            cache_keys[key] = SimulationCache.key(
+                'choose_next_card', position=position, card=key, paired=paired, antithetic=antithetic, seed=seed_part,
+            )
+            stored = None if cache is None else cache.get(cache_keys[key])
+            cached[key] = np.zeros(0, dtype=np.int32) if stored is None else stored
+            entry = None if checkpoint is None else checkpoint.get(cache_keys[key])
+            if entry is not None and len(entry['counters']) > len(cached[key]):
+                cached[key] = entry['counters']
+
+    # The rollout budget is n_trials per play. Adaptive allocations run the
+    # plays that are still in contention on the same trial indices, in rounds
+    budget = n_trials * len(plays)
+    active = sorted(plays)
+    rounds = max(1, ceil(log2(len(active)))) if active else 1
+    step = 2 if antithetic else 1
+    rule = stopping or StoppingRule()
+    idx, used, settled = 0, 0, False
+    while active and used < budget and not settled:
+        if allocation == 'halving':
+            # Successive halving: the budget is split evenly between the rounds,
+            # and each round keeps the better half of the plays
+            batch = max(step, budget // (rounds * len(active)) // step * step)
+        else:
+            batch = step
+
+        for _ in range(batch):
+            if used >= budget:
+                break
+
+            # With antithetic trials, every odd trial mirrors the random choices of the trial before
+            base, mirror = (idx // 2, idx % 2 == 1) if antithetic else (idx, False)
+            outcomes = {}
+            for key in active:
+                if key in cached and idx < len(cached[key]):
+                    outcome = int(cached[key][idx])
+                else:
+                    outcome = _next_card_trial(
+                        game_state, plays[key], player_index, trial_seed(card_seeds[plays[key]], base), timer,
+                        antithetic=mirror,
+                    )
+                counters[key].append(outcome)
+                outcomes[key] = outcome
+            idx += 1
+            used += len(active)
+
+            if checkpoint is not None and checkpoint.due():
+                for key, cache_key in cache_keys.items():
+                    checkpoint.update(cache_key, counters=np.asarray(counters[key], dtype=np.int32))
+                checkpoint.save(force=True)
+
+            if paired:
+                comparison.add(outcomes)
+            else:
+                for key, outcome in outcomes.items():
+                    stats[key].add(outcome)
+
+            # Antithetic pairs are only checked once complete
+            if stopping is None or (antithetic and not mirror):
+                continue
+            if stopping.paired_settled(comparison, active) if paired else stopping.settled({k: stats[k] for k in active}):
+                settled = True
+                break
+
+        if allocation == 'halving' and len(active) > 1:
+            active = sorted(active, key=lambda key: -stats[key].mean)[:ceil(len(active) / 2)]
+        elif allocation == 'elimination':
+            for key in rule.dominated(comparison, active, paired):
+                active.remove(key)
+
+        # A single play left needs no more rollouts
+        if allocation is not None and len(active) == 1:
+            break
+
+    for key, cache_key in cache_keys.items():
+        if cache is not None and len(counters[key]) > len(cached[key]):
+            cache.put(cache_key, np.asarray(counters[key], dtype=np.int32))
+        if checkpoint is not None:
+            checkpoint.update(cache_key, counters=np.asarray(counters[key], dtype=np.int32))
+    if checkpoint is not None:
+        checkpoint.save(force=True)
 
     if plot_results:
         plot_next_card_data(counters)
 
+    best = comparison.best()
     results = {}
     for card in counters:
         results[card] = {
-            'mean': np.mean(counters[card]),
-            'std': np.std(counters[card]),
+            'mean': stats[card].mean,
+            'std': stats[card].std,
             'counters': counters[card],
+            'trials': len(counters[card]),
         }
+        if paired:
+            difference = comparison.difference(card, best)
+            results[card]['difference'] = difference.mean
+            results[card]['difference_se'] = difference.sem if card != best else 0.0
     return results
 
 
+# Parts of a game state that do not change how the rest of the hand plays out
+_volatile_state_keys = {'id', 'game_id', 'human_player', 'balance', 'user_name', 'score', 'scores', 'player_type'}
+
+
+def _position_key(state):
+    """Game state without identifiers and other keys that do not change the rest of the hand"""
+    if isinstance(state, dict):
+        return {key: _position_key(value) for key, value in state.items() if key not in _volatile_state_keys}
+    if isinstance(state, list):
+        return [_position_key(value) for value in state]
+    return state
+
+
+def _next_card_trial(
+    game_state: dict,
+    card: Card,
+    player_index: int,
+    seed: np.random.SeedSequence,
+    timer: Optional[PhaseTimer],
+    antithetic: bool = False,
+) -> int:
+    """Play ``card`` in the restored game, finish the hand at random, and return the counters of the player's side"""
+    game = Pinochle.restore_state(game_state)
+    game.seed(seed, antithetic=antithetic)
+    if timer is not None:
+        timer.instrument(game)
+
+    if game.trick is None or game.trick.complete:
+        game.set_up_trick()
+    game.play_next_card(card)
+    game.play_cards_in_trick()
+    game.finish_trick()
+
+    game.play_tricks()
+
+    for player in game.current_players:
+        if player.index == player_index:
+            mine = player.counters(game.rules.last_trick_value)
+            partners = player.partner.counters(game.rules.last_trick_value)
+            return mine + partners
+
+
 if __name__ == "__main__":
 
     from argparse import ArgumentParser
@@ -446,11 +1198,50 @@ if __name__ == "__main__":
     parser.add_argument('--meld_analysis', action='store_true', help='Analyze power, rank, and meld distributions')
     parser.add_argument('--next_card', action='store_true', help='Look at the "next card" prediction distributions')
     parser.add_argument('--best_suit', action='store_true', help='Play a random hand, try calling each suit trump')
+    parser.add_argument('--bid_ladder', action='store_true', help='Chance of saving each bid with a random hand, for each trump suit')
 
     parser.add_argument('--trials', type=int, default=1000, help='Number of trials per suit per bid')
     parser.add_argument('--player', type=str, default='simple', choices=['simple', 'random'], help='Player type')
     parser.add_argument('--opponent', type=str, default='random', choices=['simple', 'random'], help='Opponent type')
+    parser.add_argument('--seed', type=int, default=None, help='Master seed for reproducible runs')
+    parser.add_argument('--timing', action='store_true', help='Report the time spent in each phase of the hands')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all cores)')
+    parser.add_argument('--ci_width', type=float, default=None, help='Stop once the confidence intervals are this narrow')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals')
+    parser.add_argument('--min_trials', type=int, default=30, help='Trials to run before stopping early')
+    parser.add_argument('--early_stop', action='store_true', help='Stop the next card simulation once one card is clearly best')
+    parser.add_argument('--paired', action='store_true', help='Compare next cards on the same random trials')
+    parser.add_argument('--antithetic', action='store_true', help='Run the next card trials in antithetic pairs')
+    parser.add_argument('--allocation', type=str, default=None, choices=['halving', 'elimination'], help='Spread the next card trials adaptively')
+    parser.add_argument('--cache', type=str, default=None, help='SQLite file caching simulation results between runs')
+    parser.add_argument('--cache_size', type=float, default=256, help='Size of the cache in MB')
+    parser.add_argument('--checkpoint', type=str, default=None, help='File keeping the progress of the run, to resume it')
+    parser.add_argument('--checkpoint_interval', type=float, default=60, help='Seconds between checkpoint writes')
+    parser.add_argument('--output', type=str, default=None, help='Export the results to a .npz, .json or .csv file')
+    parser.add_argument('--no_plot', action='store_true', help='Do not plot the results (for headless runs)')
     args = parser.parse_args()
+    plot = not args.no_plot
+
+    n_workers = args.workers or os.cpu_count() or 1
+
+    stopping = None
+    if args.ci_width is not None or args.early_stop:
+        stopping = StoppingRule(args.ci_width, confidence=args.confidence, min_trials=args.min_trials)
+
+    timer = PhaseTimer() if args.timing else None
+
+    cache = None
+    if args.cache is not None:
+        cache = SimulationCache(args.cache, max_bytes=int(args.cache_size * 2 ** 20))
+
+    checkpoint = None
+    if args.checkpoint is not None:
+        checkpoint = Checkpoint(args.checkpoint, interval=args.checkpoint_interval)
+
+    # An unseeded run keeps its master seed in the checkpoint, to draw the same hands when it resumes
+    seed = args.seed
+    if checkpoint is not None:
+        seed = checkpoint.master_seed(SimulationCache.key('monte_carlo', seed=None), seed)
 
     player_types = {
         'simple': SimplePinochlePlayer,
@@ -459,25 +1250,96 @@ if __name__ == "__main__":
 
     # Compare players head-to-head, show results, and exit
     if args.compare_players:
-        compare_players(args.trials)
+        results = compare_players(args.trials, seed=seed, timer=timer, n_workers=n_workers, stopping=stopping,
+                                  cache=cache, checkpoint=checkpoint, plot_results=plot)
+        if args.output is not None:
+            export_results(results, args.output)
+        if timer is not None:
+            print(timer)
+        if cache is not None:
+            print(f'Cache: {cache.hits} hits, {cache.misses} misses')
         exit()
 
     # Plot power, rank, and meld distributions, then exit
     if args.meld_analysis:
-        power_rank_meld_distributions(args.trials)
+        powers, melds, ranks = power_rank_meld_distributions(
+            args.trials, seed=seed, checkpoint=checkpoint, plot_results=plot,
+        )
+        if args.output is not None:
+            export_results({'power': powers, 'meld': melds, 'rank': ranks}, args.output)
         exit()
 
     # Generate distributions for the next card to play in a hand
     if args.next_card:
         with open('logs/game_state.json', 'r') as f:
             game_state = json.load(f)
-        choose_next_card(game_state=game_state, n_trials=args.trials, plot_results=True)
+        results = choose_next_card(
+            game_state=game_state, n_trials=args.trials, plot_results=plot, seed=seed, timer=timer,
+            stopping=stopping, paired=args.paired, antithetic=args.antithetic, allocation=args.allocation,
+            cache=cache, checkpoint=checkpoint,
+        )
+        for card, result in sorted(results.items(), key=lambda item: -item[1]['mean']):
+            line = f'{card}: trials={result["trials"]}, mean={result["mean"]:.2f}, std={result["std"]:.2f}'
+            if args.paired:
+                line += f', difference={result["difference"]:.2f} ± {result["difference_se"]:.2f}'
+            print(line)
+        if args.output is not None:
+            export_results(results, args.output)
+        if timer is not None:
+            print(timer)
+        if cache is not None:
+            print(f'Cache: {cache.hits} hits, {cache.misses} misses')
+        exit()
+
+    # Find the chance of saving every bid with a random hand, for each trump suit
+    if args.bid_ladder:
+
+        hand_seed, trials_seed = spawn_seeds(seed, 2)
+        hand = FirehousePinochleDeck.get_random_hand(rng=make_rng(hand_seed))
+
+        print('Hand:')
+        print(hand)
+
+        ladders = simulate_bid_ladder(
+            hand,
+            args.trials,
+            player_types[args.player],
+            other_player_type=player_types[args.opponent],
+            seed=trials_seed,
+            timer=timer,
+            n_workers=n_workers,
+            stopping=stopping,
+            cache=cache,
+            checkpoint=checkpoint,
+        )
+        for suit, ladder in ladders.items():
+            print()
+            print(f'{suit} ({ladder.n_trials} trials): highest bid saved half the time {ladder.max_bid(0.5)}')
+
+            # Only print the bids where the chance of saving changes
+            last = None
+            for step in ladder.ladder():
+                if step['save_probability'] != last:
+                    print(f'  {step["bid"]:4d}: saved {step["save_probability"]:6.1%}, '
+                          f'expected score {step["expected_score"]:7.1f}')
+                    last = step['save_probability']
+
+        if args.output is not None:
+            export_results(
+                {suit: {'trials': ladder.n_trials, 'ladder': ladder.ladder()} for suit, ladder in ladders.items()},
+                args.output,
+            )
+        if timer is not None:
+            print(timer)
+        if cache is not None:
+            print(f'Cache: {cache.hits} hits, {cache.misses} misses')
         exit()
 
     # Try playing a random hand many times, and find out which suit is best for trump
     if args.best_suit:
 
-        hand = FirehousePinochleDeck.get_random_hand()
+        hand_seed, trials_seed = spawn_seeds(seed, 2)
+        hand = FirehousePinochleDeck.get_random_hand(rng=make_rng(hand_seed))
 
         print('Hand:')
         print(hand)
@@ -497,21 +1359,29 @@ if __name__ == "__main__":
                 args.trials,
                 player_type,
                 other_player_type=other_player_type,
+                seed=trials_seed,
+                timer=timer,
+                n_workers=n_workers,
+                stopping=stopping,
+                cache=cache,
+                checkpoint=checkpoint,
             )
 
-            min_counters = min(counters[suit])
-            max_counters = max(counters[suit])
-            sum_counters = sum(counters[suit])
-            n_counters = len(counters[suit])
+            stats = RunningStats(counters[suit])
+            low, high = stats.interval(args.confidence)
+            print(f'{suit} counter stats: trials={stats.count}, min={stats.min}, max={stats.max}, '
+                  f'mean={stats.mean:.2f}, std={stats.std:.2f}, {args.confidence:.0%} CI=({low:.2f}, {high:.2f})')
 
-            mean_counters = round(sum_counters / n_counters, 2)
-            dev_counters = sum([abs(mean_counters - x) for x in counters[suit]])
-            std_counters = round(dev_counters / n_counters, 2)
+        if timer is not None:
+            print(timer)
+        if cache is not None:
+            print(f'Cache: {cache.hits} hits, {cache.misses} misses')
 
-            print(f'{suit} counter stats: min={min_counters}, max={max_counters}, mean={mean_counters}, std={std_counters}')
+        if args.output is not None:
+            export_results({'counters': counters, 'meld': meld}, args.output)
 
         # Plot the data
-        if len(counters):
+        if plot and len(counters):
             plot_data_by_suit(counters, title='Counters', x_min=0, x_max=50, chart_style='bar')
             plot_data_by_suit(counters, title='Counters', x_min=0, x_max=50)
             plot_data_by_suit(meld, title='Meld')
@@ -1,10 +1,32 @@
-from typing import Union, List
+import asyncio
+from concurrent.futures import Executor
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, List, NamedTuple, Optional, Union
 from uuid import uuid4
 import numpy as np
 from GameLogic.cards import Card, Hand, PinochleDeck
+from GameLogic.knowledge import CardKnowledge
+from GameLogic.mcts import Determinizer, InformationSetMCTS, RootParallelSearch, SearchNode
 from GameLogic.meld import Meld
+from GameLogic.rng import get_rng, choose
 from GameLogic.tricks import Trick
 
+if TYPE_CHECKING:
+    from GameLogic.tablebase import Tablebase
+
+
+class Decision(NamedTuple):
+    """A player's choice, the search iterations spent on it and the seconds it took"""
+    choice: Any
+    iterations: int = 0
+    elapsed: float = 0.0
+
+    @staticmethod
+    def timed(choose: Callable, *args, **kwargs) -> 'Decision':
+        start = monotonic()
+        choice = choose(*args, **kwargs)
+        return Decision(choice, 0, monotonic() - start)
+
 
 class PinochlePlayer:
 
@@ -14,23 +36,28 @@ class PinochlePlayer:
         super().__init_subclass__(**kwargs)
         PinochlePlayer.type_from_str[cls.__name__] = cls
 
-    def __init__(self, name, balance=0, user_name=None):
+    def __init__(self, name, balance=0, user_name=None, rng: Optional[np.random.Generator] = None):
         self.id = str(uuid4())
         self.name = name
         self.balance = balance
         self.user_name = user_name or name
         self.score = 0
+        self.rng = get_rng(rng)
 
         self.index = None
         self.tricks = []
         self.took_last_trick = None
-        self.hand = Hand()
+        self.hand = Hand(rng=self.rng)
         self.meld = Meld(self.hand)
         self.partner = None
         self.trump = None
         self.position = None
         self.is_high_bidder = False
 
+    def set_rng(self, rng: np.random.Generator):
+        self.rng = rng
+        self.hand.rng = rng
+
     def add_points(self, points):
         self.score += points
 
@@ -48,7 +75,8 @@ class PinochlePlayer:
 
         player.tricks = [Trick.restore_state(t) for t in state['tricks']]
         player.hand = Hand.restore_state(state['hand'])
-        player.meld = Meld(player.hand)
+        player.hand.rng = player.rng
+        player.update_meld()
 
         return player
 
@@ -88,16 +116,23 @@ class PinochlePlayer:
     def reset_hand_state(self):
         self.tricks = []
         self.took_last_trick = None
-        self.hand = Hand()
-        self.meld = Meld(self.hand)
+        self.hand = Hand(rng=self.rng)
+        self.update_meld()
         self.partner = None
         self.trump = None
         self.position = None
 
     def take_cards(self, cards):
         self.hand.add_cards(cards)
+        self.update_meld()
+
+    def update_meld(self):
         self.meld = Meld(self.hand)
 
+    def join_game(self, game):
+        """Called when the player is seated in ``game``; players that watch the game keep a reference to it"""
+        pass
+
     def place_bid(self, current_bid: int, bid_increment: int) -> int:
         pass
 
@@ -106,8 +141,8 @@ class PinochlePlayer:
 
     def choose_card_to_play(self, trick: Trick) -> Card:
         # Todo: improve card choice algorithm to account for who played what in the trick (pay partner)
-        # Todo: players should keep track of how many Aces and trump have been played (observe)
-        # Todo: players should know which other players are out of which suit (observe)
+        # Players that observe the game can follow the cards played and who is out of
+        # which suit with GameLogic.knowledge.CardKnowledge (see MonteCarloPinochlePlayer)
         pass
 
     def play_card(self, card: Card) -> Card:
@@ -132,6 +167,63 @@ class PinochlePlayer:
     def should_pay_trick(self, trick):
         pass
 
+    # Awaitable decisions, used when many games share one event loop.
+    # Players that wait on something (a remote client, a search) override these.
+
+    async def place_bid_async(self, current_bid: int, bid_increment: int) -> int:
+        return self.place_bid(current_bid, bid_increment)
+
+    async def choose_trump_async(self) -> str:
+        return self.choose_trump()
+
+    async def choose_cards_to_pass_async(self, n: int = 0) -> List[Card]:
+        return self._choose_cards_to_pass(n=n)
+
+    async def pass_cards_async(self, n: int = 0) -> List[Card]:
+        cards = await self.choose_cards_to_pass_async(n=n)
+        self.discard(cards)
+        return cards
+
+    async def choose_card_to_play_async(self, trick: Trick) -> Card:
+        return self.choose_card_to_play(trick)
+
+    # Anytime decisions: callers give a deadline (a time.monotonic() value) and get
+    # the choice with the work done for it. Search players stop when the deadline
+    # passes and return the best choice found; the others answer right away.
+    # Players with blocking_decisions make their awaitable decisions on a thread of
+    # the event loop's executor, so the other games on the loop go on meanwhile.
+
+    blocking_decisions = False
+
+    def decide_bid(self, current_bid: int, bid_increment: int, deadline: Optional[float] = None) -> 'Decision':
+        return Decision.timed(self.place_bid, current_bid, bid_increment)
+
+    def decide_trump(self, deadline: Optional[float] = None) -> 'Decision':
+        return Decision.timed(self.choose_trump)
+
+    def decide_cards_to_pass(self, n: int = 0, deadline: Optional[float] = None) -> 'Decision':
+        return Decision.timed(self._choose_cards_to_pass, n=n)
+
+    def decide_card_to_play(self, trick: Trick, deadline: Optional[float] = None) -> 'Decision':
+        return Decision.timed(self.choose_card_to_play, trick)
+
+    async def decide_bid_async(self, current_bid: int, bid_increment: int, deadline: Optional[float] = None) -> 'Decision':
+        return await self._decide_async(self.decide_bid, current_bid, bid_increment, deadline)
+
+    async def decide_trump_async(self, deadline: Optional[float] = None) -> 'Decision':
+        return await self._decide_async(self.decide_trump, deadline)
+
+    async def decide_cards_to_pass_async(self, n: int = 0, deadline: Optional[float] = None) -> 'Decision':
+        return await self._decide_async(self.decide_cards_to_pass, n, deadline)
+
+    async def decide_card_to_play_async(self, trick: Trick, deadline: Optional[float] = None) -> 'Decision':
+        return await self._decide_async(self.decide_card_to_play, trick, deadline)
+
+    async def _decide_async(self, decide: Callable[..., 'Decision'], *args) -> 'Decision':
+        if not self.blocking_decisions:
+            return decide(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, decide, *args)
+
     def counters(self, last_trick_value: int) -> int:
         counters = sum([1 for trick in self.tricks for card in trick if card.is_counter])
         return counters + last_trick_value if self.took_last_trick else counters
@@ -147,20 +239,47 @@ class RandomPinochlePlayer(PinochlePlayer):
 
     def choose_card_to_play(self, trick: Trick) -> Card:
         options = trick.legal_plays(self.hand)
-        return np.random.choice(options)
+        return choose(self.rng, options)
 
     def choose_trump(self):
         suit = None
-        for suit in np.random.permutation(Card.suits):
+        for idx in self.rng.permutation(len(Card.suits)):
+            suit = Card.suits[idx]
             if self.hand.can_call_suit_as_trump(suit):
                 break
         return suit
 
     def _choose_cards_to_pass(self, n: int = 0) -> List[Card]:
-        return np.random.choice(self.hand.cards, n, replace=False)
+        return [self.hand.cards[idx] for idx in self.rng.choice(len(self.hand.cards), n, replace=False)]
 
     def should_pay_trick(self, trick):
-        return bool(np.random.randint(2))
+        return bool(self.rng.integers(2))
+
+
+class CoupledRandomPinochlePlayer(RandomPinochlePlayer):
+    """
+    Random player whose plays can be coupled across simulations
+
+    The player draws a random priority for every card of the deck from its
+    stream, and plays the legal card with the lowest priority. Cards come out
+    in a random order like with :class:`RandomPinochlePlayer`, but two games
+    seeded alike make the same plays wherever their legal cards agree, which
+    keeps paired simulations (common random numbers) in step after they
+    branch, instead of shifting every later draw.
+    """
+
+    _priority = None
+
+    def set_rng(self, rng: np.random.Generator):
+        super().set_rng(rng)
+        self._priority = None
+
+    def choose_card_to_play(self, trick: Trick) -> Card:
+        options = trick.legal_plays(self.hand)
+        if self._priority is None:
+            self._priority = self.rng.random(len(Card.suits) * len(Card.values)).tolist()
+        n_values = len(Card.values)
+        return min(options, key=lambda c: self._priority[Card.suits.index(c.suit) * n_values + Card.values.index(c.value)])
 
 
 class SimplePinochlePlayer(RandomPinochlePlayer):
@@ -255,7 +374,17 @@ class SimplePinochlePlayer(RandomPinochlePlayer):
             if card in options[backup_suit]:
                 discard.append(card)
 
-        return discard[:n]
+        if len(discard) >= n:
+            return discard[:n]
+
+        # Discard the lowest remaining cards, trump last, so the hand size stays correct
+        for card in sorted(self.hand.cards, key=lambda c: (c.suit == self.trump, Card.values.index(c.value))):
+            if len(discard) >= n:
+                break
+            if discard.count(card) < self.hand.cards.count(card):
+                discard.append(card)
+
+        return discard
 
     def _choose_cards_to_pass(self, n: int = 0) -> List[Card]:
         if self.is_high_bidder:
@@ -300,35 +429,112 @@ class SkilledPinochlePlayer(SimplePinochlePlayer):
 
 
 class MonteCarloPinochlePlayer(SimplePinochlePlayer):
+    """
+    Plays cards with Information-Set Monte Carlo Tree Search (see ``GameLogic/mcts.py``)
+
+    Each card is chosen after ``iterations`` iterations, or ``time_limit``
+    seconds, of search over deals consistent with what the player has seen.
+    The search tree is kept between the player's decisions in a hand, so
+    statistics gathered for the moves that were actually played are reused.
+    With ``workers`` above 1, the same budget is also searched by other
+    processes and the root statistics are merged (see :class:`RootParallelSearch`);
+    call :meth:`close` to stop the pool. With a ``tablebase`` of the variant
+    (see ``GameLogic/tablebase.py``), playouts take the exact value of the
+    last tricks from it. Bidding, calling trump and passing cards are done
+    as by :class:`SimplePinochlePlayer`.
+    """
+
+    blocking_decisions = True
+
+    def __init__(self, name, balance=0, user_name=None, rng: Optional[np.random.Generator] = None,
+                 iterations: Optional[int] = 2000, time_limit: Optional[float] = None, exploration: float = 0.7,
+                 workers: int = 1, playouts_per_leaf: int = 1, executor: Optional[Executor] = None,
+                 tablebase: Optional['Tablebase'] = None):
+        super().__init__(name, balance, user_name, rng=rng)
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.playouts_per_leaf = playouts_per_leaf
+        self.tablebase = tablebase
+        self.parallel_search = None
+        if workers > 1:
+            self.parallel_search = RootParallelSearch(workers, exploration, playouts_per_leaf, executor=executor,
+                                                      tablebase=tablebase)
+        self.game = None
+        self.knowledge = None
+        self._search_root = None
+        self._search_hand = None
+        self._search_n_played = 0
+
+    def join_game(self, game):
+        if self.game is game:
+            return
+        if self.knowledge is not None:
+            self.knowledge.detach()
+        self.game = game
+        self.knowledge = CardKnowledge(game, self)
 
-    def place_bid(self, current_bid: int, bid_increment: int) -> int:
-        # Decide when to bet big
-        # Decide when to drop the bid on someone
-        pass
+    def reset_hand_state(self):
+        super().reset_hand_state()
+        self._search_root = None
 
     def choose_card_to_play(self, trick: Trick) -> Card:
-        # Decide whether to take the trick
-        # Decide what to play into partner (back-seat)
-        # Decide what to play into non-partner
-        # Decide when to pay trick
-        pass
-
-    def choose_trump(self):
-        pass
-
-    def _choose_cards_to_pass(self, n: int = 0) -> List[Card]:
-        # Do not discard meld, trump, aces
-        # Discard counters
-        pass
+        return self.decide_card_to_play(trick).choice
+
+    def decide_card_to_play(self, trick: Trick, deadline: Optional[float] = None) -> Decision:
+        """
+        Search until ``iterations`` are done or the deadline (by default
+        ``time_limit`` from now) passes, whichever comes first
+        """
+        start = monotonic()
+        if self.game is None:
+            return Decision(super().choose_card_to_play(trick), 0, monotonic() - start)
+        options = trick.legal_plays(self.hand)
+        if len(set(options)) == 1:
+            return Decision(options[0], 0, monotonic() - start)
+
+        if deadline is None and self.time_limit is not None:
+            deadline = start + self.time_limit
+        determinizer = Determinizer.from_game(self.game, self, self.knowledge)
+        root = self._reuse_search_root(determinizer.layout)
+        if self.parallel_search is None:
+            search = InformationSetMCTS(self.exploration, rng=self.rng, playouts_per_leaf=self.playouts_per_leaf,
+                                        tablebase=self.tablebase)
+            iterations = search.search(root, determinizer, self.iterations, min_iterations=1, deadline=deadline)
+            move = root.most_visited()
+        else:
+            stats, iterations = self.parallel_search.search(root, determinizer, self.rng, self.iterations,
+                                                            deadline=deadline)
+            move = max(stats, key=lambda m: stats[m][0])
+        return Decision(determinizer.layout.card(move), iterations, monotonic() - start)
+
+    def close(self):
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+
+    def _reuse_search_root(self, layout) -> 'SearchNode':
+        """Node of the current decision in the tree of the last search of this hand, or a new root"""
+        game = self.game
+        root = self._search_root if self._search_hand == game.hand_count else None
+        if root is not None:
+            for card, _ in game.cards_played[self._search_n_played:]:
+                root = root.child(layout.index(card))
+                if root is None:
+                    break
+
+        self._search_root = root or SearchNode()
+        self._search_hand = game.hand_count
+        self._search_n_played = len(game.cards_played)
+        return self._search_root
 
 
 class HumanPinochlePlayer(PinochlePlayer):
 
-    def __init__(self, name=None, balance=0, user_name=None):
+    def __init__(self, name=None, balance=0, user_name=None, rng: Optional[np.random.Generator] = None):
         if name is None:
             print(' ')
             name = input('What is your name?  ')
-        super().__init__(name, balance, user_name)
+        super().__init__(name, balance, user_name, rng=rng)
 
     def place_bid(self, current_bid: int, bid_increment: int) -> int:
         print(' ')
@@ -411,8 +617,8 @@ class HumanPinochlePlayer(PinochlePlayer):
 
 class Kitty(PinochlePlayer):
 
-    def __init__(self, name='Kitty', balance=0, user_name=None):
-        super().__init__(name, balance, user_name)
+    def __init__(self, name='Kitty', balance=0, user_name=None, rng: Optional[np.random.Generator] = None):
+        super().__init__(name, balance, user_name, rng=rng)
         self.index = -1
 
     def take_cards(self, cards):
@@ -429,4 +635,4 @@ class Kitty(PinochlePlayer):
         pass
 
     def _choose_cards_to_pass(self, n: int = 0) -> List[Card]:
-        return self.hand.cards
+        return list(self.hand.cards)
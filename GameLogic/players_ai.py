@@ -47,7 +47,7 @@ class DRLPinochlePlayer(SimplePinochlePlayer):
         # Convert game_state to a suitable format for the network
         # For now, let's assume it's already a suitable tensor
         action_probabilities = self.policy_network(game_state)
-        chosen_action = np.random.choice(self.available_action_keys, p=action_probabilities.detach().numpy())
+        chosen_action = self.rng.choice(self.available_action_keys, p=action_probabilities.detach().numpy())
         return self.available_actions[chosen_action]
 
     def _choose_cards_to_pass(self, n: int = 0) -> List[Card]:
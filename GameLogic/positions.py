@@ -0,0 +1,363 @@
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+from GameLogic.cards import Card
+from GameLogic.zobrist import ZobristKeys
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+    from GameLogic.players import PinochlePlayer
+    from GameLogic.tablebase import Tablebase
+
+
+class CardLayout:
+    """
+    Integer encoding of the cards of a deck
+
+    Card ``c`` has suit ``c // n_values`` (index into ``Card.suits``) and
+    rank ``c % n_values``, where ranks follow ``values`` from low to high.
+    Identical cards share the same integer, so a hand is a list of counts.
+    """
+
+    def __init__(self, values: Sequence[str], max_seats: int = 5, max_copies: int = 4):
+        self.values = list(values)
+        self.n_values = len(self.values)
+        self.n_cards = len(Card.suits) * self.n_values
+        self.suit_of = [c // self.n_values for c in range(self.n_cards)]
+        self.rank_of = [c % self.n_values for c in range(self.n_cards)]
+        self.points = [int(v in Card.counter_values) for v in self.values] * len(Card.suits)
+
+        # Shared by positions, live games and logged states; the seats cover
+        # four players and the kitty (see :class:`ZobristTracker`)
+        self.zobrist = ZobristKeys(self.n_cards, max_seats=max_seats, max_copies=max_copies)
+
+    @staticmethod
+    def for_values(values: Sequence[str]) -> 'CardLayout':
+        """Shared layout of the deck with the given values"""
+        key = tuple(values)
+        if key not in _layouts:
+            _layouts[key] = CardLayout(values)
+        return _layouts[key]
+
+    def index(self, card: Card) -> int:
+        return Card.suits.index(card.suit) * self.n_values + self.values.index(card.value)
+
+    def card(self, c: int) -> Card:
+        card = Card.__new__(Card)
+        card.suit = Card.suits[self.suit_of[c]]
+        card.value = self.values[self.rank_of[c]]
+        return card
+
+    def counts(self, cards) -> List[int]:
+        counts = [0] * self.n_cards
+        for card in cards:
+            counts[self.index(card)] += 1
+        return counts
+
+    def cards(self, counts: Sequence[int]) -> List[Card]:
+        return [self.card(c) for c, n in enumerate(counts) for _ in range(n)]
+
+
+_layouts = {}
+
+
+class Position:
+    """
+    Compact trick-playing state with all hands visible
+
+    This mirrors the rules of :class:`Trick` (follow suit, beat the winning
+    card if possible, trump when void, first of identical cards wins) on
+    card counts, and supports :meth:`play` / :meth:`undo` so searches can
+    walk the game tree without copying.
+
+    Parameters
+    ----------
+    layout: CardLayout
+        Encoding of the cards
+    hands: Sequence[Sequence[int]]
+        Card counts of each seat, in playing order
+    trump: int
+        Suit index of trump
+    side: Sequence[bool]
+        Whether each seat belongs to the high bidder's side
+    leader: int
+        Seat leading the current trick
+    trick: Sequence[int]
+        Cards already played to the current trick, starting with the leader's;
+        they are taken out of ``hands``
+    last_trick_value: int
+        Points for winning the last trick
+    """
+
+    def __init__(
+        self,
+        layout: CardLayout,
+        hands: Sequence[Sequence[int]],
+        trump: int,
+        side: Sequence[bool],
+        leader: int,
+        trick: Sequence[int] = (),
+        last_trick_value: int = 1,
+    ):
+        self.layout = layout
+        self.hands = [list(hand) for hand in hands]
+        self.n_seats = len(self.hands)
+        self.trump = trump
+        self.side = [bool(s) for s in side]
+        self.leader = leader
+        self.last_trick_value = last_trick_value
+
+        self.total = [sum(hand[c] for hand in self.hands) for c in range(layout.n_cards)]
+        self.n_cards = sum(self.total)
+        self.points_in_hands = sum(n * p for n, p in zip(self.total, layout.points))
+
+        # Current trick
+        self.trick = []
+        self.in_trick = [0] * layout.n_cards
+        self.best = None
+        self.best_seat = None
+        self.trick_points = 0
+
+        # Points won by the bidder's side since the position was built
+        self.side_points = 0
+
+        for c in trick:
+            self._add_to_trick(self.to_move, c)
+
+        # Zobrist key of the hands, the trick, the player to move and trump
+        # (cards already won do not change the rest of the hand, so they are left out)
+        keys = layout.zobrist
+        self.key = keys.trump[trump] ^ keys.to_move[self.to_move]
+        for seat, hand in enumerate(self.hands):
+            self.key ^= keys.counts_key(keys.hand, seat, hand)
+        for slot, c in enumerate(self.trick):
+            self.key ^= keys.trick[slot][c]
+
+    @staticmethod
+    def game_seats(game: 'Pinochle') -> List['PinochlePlayer']:
+        """
+        Players of the hand by seat
+
+        Seats follow the player indices, which keeps the playing order and,
+        unlike ``game.current_players``, does not rotate during the hand.
+        """
+        return sorted(game.current_players, key=lambda p: p.index)
+
+    @staticmethod
+    def from_game(game: 'Pinochle') -> 'Position':
+        """Build the position of the trick-playing phase of ``game``"""
+        layout = CardLayout.for_values(game.rules.deck_type.values)
+        seats = Position.game_seats(game)
+        bidder_side = {game.high_bidder, game.high_bidder.partner}
+
+        hands = [layout.counts(p.hand.cards) for p in seats]
+        trick = game.trick
+        if trick is None or trick.complete or not len(trick):
+            leader, trick_cards = seats.index(game.lead_player), []
+        else:
+            leader, trick_cards = seats.index(trick.card_players[0]), [layout.index(c) for c in trick.cards]
+
+            # The position takes the cards of the trick out of the hands again
+            for card, player in zip(trick_cards, trick.card_players):
+                hands[seats.index(player)][card] += 1
+
+        return Position(
+            layout,
+            hands,
+            Card.suits.index(game.trump),
+            [p in bidder_side for p in seats],
+            leader,
+            trick_cards,
+            game.rules.last_trick_value,
+        )
+
+    def copy(self) -> 'Position':
+        other = Position.__new__(Position)
+        other.__dict__.update(self.__dict__)
+        other.hands = [list(hand) for hand in self.hands]
+        other.total = list(self.total)
+        other.trick = list(self.trick)
+        other.in_trick = list(self.in_trick)
+        return other
+
+    @property
+    def to_move(self) -> int:
+        return (self.leader + len(self.trick)) % self.n_seats
+
+    @property
+    def is_over(self) -> bool:
+        return self.n_cards == 0 and not self.trick
+
+    @property
+    def points_left(self) -> int:
+        """Points still to be won, including the last trick"""
+        return self.points_in_hands + self.trick_points + self.last_trick_value
+
+    def legal_moves(self, merge: bool = True) -> List[int]:
+        """
+        Cards the player to move may play
+
+        With ``merge``, cards that are interchangeable for the rest of the
+        hand (same suit and points, and every card ranked between them
+        already played or also held by this player) are represented by the
+        lowest of them only.
+        """
+        layout = self.layout
+        hand = self.hands[self.to_move]
+        n_values = layout.n_values
+
+        if not self.trick:
+            suits, min_rank = range(len(Card.suits)), -1
+        else:
+            lead_suit = layout.suit_of[self.trick[0]]
+            best_suit, best_rank = layout.suit_of[self.best], layout.rank_of[self.best]
+            trump_played = best_suit == self.trump
+            if any(hand[lead_suit * n_values:(lead_suit + 1) * n_values]):
+                suits = (lead_suit,)
+                must_beat = not trump_played or lead_suit == self.trump
+                min_rank = best_rank if must_beat and any(hand[lead_suit * n_values + best_rank + 1:(lead_suit + 1) * n_values]) else -1
+            elif any(hand[self.trump * n_values:(self.trump + 1) * n_values]):
+                suits = (self.trump,)
+                min_rank = best_rank if trump_played and any(hand[self.trump * n_values + best_rank + 1:(self.trump + 1) * n_values]) else -1
+            else:
+                suits, min_rank = range(len(Card.suits)), -1
+
+        moves = []
+        for suit in suits:
+            start = suit * n_values
+            group_points = None
+            for c in range(start, start + n_values):
+                held = hand[c]
+                if held and (not merge or self.total[c] != held or self.in_trick[c]):
+                    # Someone else holds this rank, so it cannot be merged with its neighbours
+                    if c - start > min_rank:
+                        moves.append(c)
+                    group_points = None
+                elif held:
+                    if group_points != layout.points[c]:
+                        if c - start > min_rank:
+                            moves.append(c)
+                        group_points = layout.points[c]
+                elif self.total[c] or self.in_trick[c]:
+                    group_points = None
+        return moves
+
+    def _add_to_trick(self, seat: int, c: int):
+        hand = self.hands[seat]
+        if not hand[c]:
+            raise ValueError(f'Seat {seat} does not hold card {c}')
+        hand[c] -= 1
+        self.total[c] -= 1
+        self.n_cards -= 1
+        points = self.layout.points[c]
+        self.points_in_hands -= points
+        self.trick_points += points
+        self.in_trick[c] += 1
+        self.trick.append(c)
+
+        best = self.best
+        if best is None:
+            self.best, self.best_seat = c, seat
+        else:
+            suit_of, rank_of = self.layout.suit_of, self.layout.rank_of
+            if suit_of[c] == self.trump:
+                if suit_of[best] != self.trump or rank_of[c] > rank_of[best]:
+                    self.best, self.best_seat = c, seat
+            elif suit_of[c] == suit_of[best] and rank_of[c] > rank_of[best]:
+                self.best, self.best_seat = c, seat
+
+    def play(self, c: int) -> tuple:
+        """Play card ``c`` for the player to move and return what :meth:`undo` needs"""
+        record = (self.leader, self.best, self.best_seat, self.side_points, self.key)
+        seat, keys = self.to_move, self.layout.zobrist
+        held = self.hands[seat][c]
+        next_seat = (seat + 1) % self.n_seats
+        self.key ^= (keys.hand[seat][c][held] ^ keys.hand[seat][c][held - 1] ^ keys.trick[len(self.trick)][c]
+                     ^ keys.to_move[seat] ^ keys.to_move[next_seat])
+        self._add_to_trick(seat, c)
+
+        if len(self.trick) == self.n_seats:
+            winner = self.best_seat
+            points = self.trick_points + (self.last_trick_value if self.n_cards == 0 else 0)
+            if self.side[winner]:
+                self.side_points += points
+            record += (self.trick, self.trick_points)
+            self.key ^= keys.to_move[next_seat] ^ keys.to_move[winner]
+            for slot, card in enumerate(self.trick):
+                self.in_trick[card] -= 1
+                self.key ^= keys.trick[slot][card]
+            self.trick = []
+            self.trick_points = 0
+            self.best = self.best_seat = None
+            self.leader = winner
+        return record
+
+    def undo(self, record: tuple):
+        if len(record) > 5:
+            trick, self.trick_points = record[5], record[6]
+            self.trick = trick
+            for card in trick:
+                self.in_trick[card] += 1
+        self.leader, self.best, self.best_seat, self.side_points, self.key = record[:5]
+
+        c = self.trick.pop()
+        seat = (self.leader + len(self.trick)) % self.n_seats
+        hand = self.hands[seat]
+        hand[c] += 1
+        self.total[c] += 1
+        self.n_cards += 1
+        points = self.layout.points[c]
+        self.points_in_hands += points
+        self.trick_points -= points
+        self.in_trick[c] -= 1
+
+    def playout(self, randoms: Sequence[float], tablebase: Optional['Tablebase'] = None) -> int:
+        """
+        Play the rest of the hand with random legal cards and return the
+        points the bidder's side won; the position is left at the end of the hand
+
+        ``randoms`` holds one number in [0, 1) for each card left, so callers
+        draw all the randomness of a playout at once. With a ``tablebase``,
+        the playout stops as soon as every hand is small enough to be in
+        the table and adds the value of the rest of the hand from it (the
+        position is then left there).
+        """
+        before = self.side_points
+        table_cards = 0 if tablebase is None else tablebase.n_cards
+        for u in randoms:
+            if self.n_cards <= table_cards and not self.trick:
+                value = tablebase.lookup(self)
+                if value is not None:
+                    return self.side_points - before + value
+            if self.n_cards == 0:
+                break
+            moves = self.legal_moves(merge=False)
+            self.play(moves[int(u * len(moves))])
+        return self.side_points - before
+
+    def winning_move_order(self, moves: List[int]) -> List[int]:
+        """
+        Order moves so that good moves are usually searched first
+
+        Leads try high cards first. When following, a side already winning
+        the trick pays counters, otherwise it tries to take the trick as
+        cheaply as possible and then throws its lowest cards.
+        """
+        layout = self.layout
+        rank_of, points = layout.rank_of, layout.points
+        if not self.trick:
+            return sorted(moves, key=lambda c: (-rank_of[c], layout.suit_of[c] != self.trump))
+
+        if self.side[self.to_move] == self.side[self.best_seat]:
+            return sorted(moves, key=lambda c: (-points[c], self._beats(c), rank_of[c]))
+
+        def key(c):
+            beats = self._beats(c)
+            return not beats, 0 if beats else points[c], rank_of[c]
+        return sorted(moves, key=key)
+
+    def _beats(self, c: int) -> bool:
+        suit_of, rank_of = self.layout.suit_of, self.layout.rank_of
+        best = self.best
+        if suit_of[c] == self.trump:
+            return suit_of[best] != self.trump or rank_of[c] > rank_of[best]
+        return suit_of[c] == suit_of[best] and rank_of[c] > rank_of[best]
@@ -0,0 +1,121 @@
+from functools import wraps
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+
+
+class PhaseTimer:
+    """
+    Record cumulative wall time and call counts of the phases of a hand
+    and of the decision methods of each player type
+
+    Timing is switched on per game with :meth:`instrument`, which wraps the
+    methods of that game and its players only. A game that is not
+    instrumented runs the plain methods and pays nothing.
+
+    Times are inclusive: ``log_state`` and ``update_meld`` calls made
+    inside a phase are counted in the phase and on their own.
+    """
+
+    game_phases = (
+        'play_hand',
+        'deal',
+        'bidding_process',
+        'call_trump',
+        'pass_cards',
+        'declare_meld',
+        'play_tricks',
+        'update_scores',
+        'log_state',
+    )
+    player_methods = (
+        'place_bid',
+        'choose_trump',
+        '_choose_cards_to_pass',
+        'choose_card_to_play',
+        'update_meld',
+    )
+
+    def __init__(self):
+        self.totals = {}
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        record = self.totals.setdefault(name, [0.0, 0])
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record[0] += perf_counter() - start
+                record[1] += 1
+
+        timed.__wrapped_by_timer__ = self
+        return timed
+
+    def _instrument_object(self, obj, method_names, prefix: str = ''):
+        for name in method_names:
+            method = getattr(obj, name, None)
+            if method is None or getattr(method, '__wrapped_by_timer__', None) is self:
+                continue
+            setattr(obj, name, self.wrap(prefix + name, method))
+
+    def instrument(self, game: 'Pinochle') -> 'Pinochle':
+        """Time the phases of ``game`` and the decisions of its players"""
+        self._instrument_object(game, self.game_phases)
+        players = list(game.players)
+        if getattr(game, 'kitty', None) is not None:
+            players.append(game.kitty)
+        for player in players:
+            self._instrument_object(player, self.player_methods, prefix=f'{player.__class__.__name__}.')
+        return game
+
+    @staticmethod
+    def uninstrument(game: 'Pinochle') -> 'Pinochle':
+        """Remove the timing wrappers so the game runs the plain methods again"""
+        players = list(game.players)
+        if getattr(game, 'kitty', None) is not None:
+            players.append(game.kitty)
+        for obj in [game] + players:
+            for name, value in list(vars(obj).items()):
+                if hasattr(value, '__wrapped_by_timer__'):
+                    delattr(obj, name)
+        return game
+
+    def reset(self):
+        for record in self.totals.values():
+            record[0], record[1] = 0.0, 0
+
+    def merge(self, totals: Dict[str, list]):
+        """Add the totals of another timer, e.g. one filled in a worker process"""
+        for name, (seconds, calls) in totals.items():
+            record = self.totals.setdefault(name, [0.0, 0])
+            record[0] += seconds
+            record[1] += calls
+
+    def report(self) -> Dict[str, dict]:
+        """Seconds, calls and mean seconds per call of every timed method"""
+        return {
+            name: {
+                'seconds': seconds,
+                'calls': calls,
+                'mean': seconds / calls if calls else 0.0,
+            }
+            for name, (seconds, calls) in self.totals.items()
+            if calls
+        }
+
+    def to_str(self) -> str:
+        report = self.report()
+        total = report['play_hand']['seconds'] if 'play_hand' in report else None
+        lines = [f'{"phase":<45}{"seconds":>10}{"calls":>10}{"us/call":>10}{"share":>8}']
+        for name, r in sorted(report.items(), key=lambda item: -item[1]['seconds']):
+            share = f'{100 * r["seconds"] / total:.1f}%' if total else ''
+            lines.append(f'{name:<45}{r["seconds"]:>10.3f}{r["calls"]:>10}{1e6 * r["mean"]:>10.1f}{share:>8}')
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.to_str()
@@ -0,0 +1,90 @@
+from typing import List, Optional, Union
+import numpy as np
+
+
+SeedLike = Union[None, int, np.random.SeedSequence, np.random.Generator]
+
+# Process-wide generator used whenever no generator is injected
+_shared_rng = None
+
+
+def get_rng(rng: Optional[np.random.Generator] = None) -> np.random.Generator:
+    """Return the given generator, or the process-wide default generator"""
+    global _shared_rng
+    if rng is not None:
+        return rng
+    if _shared_rng is None:
+        _shared_rng = np.random.default_rng()
+    return _shared_rng
+
+
+def make_rng(seed: SeedLike = None) -> np.random.Generator:
+    """Build a generator from an int, a SeedSequence, or pass a Generator through"""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def as_seed_sequence(seed: SeedLike = None) -> np.random.SeedSequence:
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2 ** 63))
+    return np.random.SeedSequence(seed)
+
+
+def spawn_seeds(seed: SeedLike, n: int) -> List[np.random.SeedSequence]:
+    """
+    Split a master seed into ``n`` independent seed sequences,
+    one for each worker of a pool
+    """
+    return as_seed_sequence(seed).spawn(n)
+
+
+def trial_seed(seed: SeedLike, index: int) -> np.random.SeedSequence:
+    """
+    Return the seed sequence of trial number ``index`` under a master seed
+
+    The seed of a trial only depends on the master seed and the trial
+    index, so a run gives identical results no matter how the trials
+    are split among workers.
+    """
+    master = as_seed_sequence(seed)
+    return np.random.SeedSequence(master.entropy, spawn_key=tuple(master.spawn_key) + (index,))
+
+
+def choose(rng: np.random.Generator, options: list):
+    """Pick a random element of a list without converting it to an array"""
+    return options[rng.integers(len(options))]
+
+
+class AntitheticGenerator:
+    """
+    Mirror image of the draws of a generator, for antithetic sampling
+
+    ``integers`` returns ``low + high - 1 - x`` where the wrapped generator
+    would return ``x``, ``random`` returns ``1 - x`` and ``permutation``
+    reverses the order. A trial run with the mirrored streams of another
+    trial makes the opposite random choices (e.g. the highest legal card
+    where the other played the lowest), so the outcomes of the two trials
+    are negatively correlated and their average varies less.
+    Other methods are passed through unchanged.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+
+    def integers(self, low, high=None, size=None, dtype=np.int64, endpoint=False):
+        if high is None:
+            low, high = 0, low
+        x = self.rng.integers(low, high, size=size, dtype=dtype, endpoint=endpoint)
+        return (low + high - x) if endpoint else (low + high - 1 - x)
+
+    def random(self, size=None, dtype=np.float64, out=None):
+        return 1 - self.rng.random(size=size, dtype=dtype, out=out)
+
+    def permutation(self, x, axis=0):
+        return np.flip(self.rng.permutation(x, axis=axis), axis=axis)
+
+    def __getattr__(self, name):
+        return getattr(self.rng, name)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field, fields, replace
+from itertools import product
+from typing import Iterator
+
+from GameLogic.cards import PinochleDeck
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """
+    Immutable settings of a game variant
+
+    The constants derived from the settings (``start_bid_amt``,
+    ``total_counters``) are computed once when the rule set is built, so
+    the game loop and the simulators read plain attributes of a single
+    object. Rule sets are hashable and can be used as dictionary keys.
+    """
+
+    deck_type: type = PinochleDeck
+    n_players: int = 4
+    last_trick_value: int = 1
+    dropped_bid_amt: int = 25
+    minimum_bid_amt: int = 30
+    bid_increment_amt: int = 5
+    n_cards_to_pass: int = 3
+    winning_score: int = 350
+    partner_gets_points: bool = False
+
+    # Derived constants
+    start_bid_amt: int = field(init=False, repr=False, compare=False)
+    total_counters: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.bid_increment_amt <= 0:
+            raise ValueError('The bid increment must be positive')
+        if self.minimum_bid_amt % self.bid_increment_amt != 0:
+            raise ValueError('The minimum bid must be a multiple of the bid increment')
+
+        # The bid starts one increment below the minimum, and is dropped if no one raises it
+        object.__setattr__(self, 'start_bid_amt', self.minimum_bid_amt - self.bid_increment_amt)
+        object.__setattr__(self, 'total_counters', self.deck_type.total_counters() + self.last_trick_value)
+
+    def replace(self, **changes) -> 'RuleSet':
+        """Return a copy of the rule set with some settings changed"""
+        return replace(self, **changes)
+
+    def get_state(self) -> dict:
+        state = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+        state['deck_type'] = self.deck_type.__name__
+        return state
+
+    @staticmethod
+    def restore_state(state: dict) -> 'RuleSet':
+        """Build a rule set from the settings found in ``state``, ignoring other keys"""
+        settings = {f.name: state[f.name] for f in fields(RuleSet) if f.init and f.name in state}
+        if isinstance(settings.get('deck_type'), str):
+            settings['deck_type'] = PinochleDeck.type_from_str[settings['deck_type']]
+        return RuleSet(**settings)
+
+
+def rules_grid(base: RuleSet, **options) -> Iterator[RuleSet]:
+    """
+    Yield a copy of ``base`` for every combination of the given settings
+
+    Example: ``rules_grid(FirehousePinochle.rules, minimum_bid_amt=[50, 60], last_trick_value=[1, 2])``
+    yields four rule sets.
+    """
+    names = list(options)
+    for values in product(*options.values()):
+        yield base.replace(**dict(zip(names, values)))
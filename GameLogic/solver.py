@@ -0,0 +1,222 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from GameLogic.cards import Card
+from GameLogic.positions import Position
+
+if TYPE_CHECKING:
+    from GameLogic.tablebase import Tablebase
+
+
+class DoubleDummySolver:
+    """
+    Perfect-information solver of the trick-playing phase
+
+    The value of a position is the number of points (counters and the last
+    trick bonus) the high bidder's side takes from the cards that are left,
+    assuming both sides play perfectly with all hands visible. Points won
+    before the position, and counters held by the kitty, are not included.
+
+    The search is a fail-soft alpha-beta with move ordering, merging of
+    interchangeable cards (see :meth:`Position.legal_moves`) and a
+    transposition table of value bounds keyed by the Zobrist hash of the
+    position at the start of each trick (see :class:`ZobristKeys`). The
+    table is kept between calls, so solving many related positions (e.g.
+    every move of one position) reuses earlier work; it is cleared when the
+    sides or the last trick value change.
+
+    Parameters
+    ----------
+    max_table_size: int
+        The transposition table is cleared when it grows past this many entries
+    merge_equivalent: bool
+        Search only one card out of each group of interchangeable cards
+    tablebase: Tablebase, optional
+        Endgame tables used instead of searching the last tricks
+    """
+
+    def __init__(self, max_table_size: int = 2_000_000, merge_equivalent: bool = True,
+                 tablebase: Optional['Tablebase'] = None):
+        self.max_table_size = max_table_size
+        self.merge_equivalent = merge_equivalent
+        self.tablebase = tablebase
+        self.tablebase_cards = 0 if tablebase is None else tablebase.n_seats * max(tablebase.layers, default=0)
+        self.table = {}
+        self.nodes = 0
+        self._context = None
+
+    def clear(self):
+        self.table = {}
+        self.nodes = 0
+
+    def solve(self, position: Position) -> int:
+        """Points the high bidder's side takes from here with perfect play"""
+        context = (tuple(position.side), position.last_trick_value)
+        if len(self.table) > self.max_table_size or context != self._context:
+            self.table = {}
+            self._context = context
+        return self._search(position, -1, position.points_left + 1)
+
+    def evaluate_moves(self, position: Position) -> Dict[int, int]:
+        """Value of the position after each legal move of the player to move"""
+        values = {}
+        for move in position.legal_moves(self.merge_equivalent):
+            before = position.side_points
+            record = position.play(move)
+            values[move] = position.side_points - before + self.solve(position)
+            position.undo(record)
+        return values
+
+    def best_move(self, position: Position) -> Tuple[int, int]:
+        """Best move of the player to move and the resulting value of the position"""
+        values = self.evaluate_moves(position)
+        choose = max if position.side[position.to_move] else min
+        move = choose(values, key=lambda m: values[m])
+        return move, values[move]
+
+    def best_card(self, game: 'Pinochle') -> Card:
+        """Best card for the player to move in ``game``, assuming every hand is known"""
+        position = Position.from_game(game)
+        move, _ = self.best_move(position)
+        return position.layout.card(move)
+
+    def _search(self, pos: Position, alpha: int, beta: int) -> int:
+        if pos.n_cards == 0 and not pos.trick:
+            return 0
+        self.nodes += 1
+
+        # The value is between 0 and the points that are left
+        upper = pos.points_left
+        if upper <= alpha:
+            return upper
+        if beta <= 0:
+            return 0
+
+        # Look up the bounds found earlier for this position (only between
+        # tricks, which is where transpositions happen)
+        key, lower, tt_move = None, 0, None
+        if not pos.trick:
+            if pos.n_cards <= self.tablebase_cards:
+                value = self.tablebase.lookup(pos)
+                if value is not None:
+                    return value
+
+            key = pos.key
+            entry = self.table.get(key)
+            if entry is not None:
+                lower, upper, tt_move = entry
+                if lower >= beta:
+                    return lower
+                if upper <= alpha or lower == upper:
+                    return upper
+                alpha, beta = max(alpha, lower), min(beta, upper)
+
+        moves = pos.winning_move_order(pos.legal_moves(self.merge_equivalent))
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        maximizing = pos.side[pos.to_move]
+        best_value = -1 if maximizing else pos.points_left + 1
+        best_move = None
+        a, b = alpha, beta
+        for move in moves:
+            before = pos.side_points
+            record = pos.play(move)
+            gain = pos.side_points - before
+            value = gain + self._search(pos, a - gain, b - gain)
+            pos.undo(record)
+
+            if maximizing:
+                if value > best_value:
+                    best_value, best_move = value, move
+                    a = max(a, value)
+            elif value < best_value:
+                best_value, best_move = value, move
+                b = min(b, value)
+            if a >= b:
+                break
+
+        if key is not None:
+            if best_value <= alpha:
+                upper = min(upper, best_value)
+            elif best_value >= beta:
+                lower = max(lower, best_value)
+            else:
+                lower = upper = best_value
+            self.table[key] = (lower, upper, best_move)
+
+        return best_value
+
+
+def solve_game(game: 'Pinochle', solver: Optional[DoubleDummySolver] = None) -> int:
+    """
+    Points the high bidder's side would end the hand with, given perfect play
+    with all hands visible from the current position of ``game``
+
+    This includes counters already won and, in Firehouse, counters in the kitty.
+    """
+    solver = solver or DoubleDummySolver()
+    last_trick_value = game.rules.last_trick_value
+    taken = game.high_bidder.counters(last_trick_value) + game.high_bidder.partner.counters(last_trick_value)
+    return taken + solver.solve(Position.from_game(game))
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    from time import time
+
+    from GameLogic.games import (
+        Pinochle,
+        DoubleDeckPinochle,
+        FirehousePinochle,
+    )
+    from GameLogic.players import SimplePinochlePlayer
+    from GameLogic.rng import make_rng
+
+    parser = ArgumentParser('Solve random endgames with all hands visible')
+    parser.add_argument('--game', type=str, default='firehouse', choices=['single', 'double', 'firehouse'], help='Game variant')
+    parser.add_argument('--cards', type=int, default=6, help='Cards left in each hand')
+    parser.add_argument('--positions', type=int, default=20, help='Number of positions to solve')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the deals')
+    args = parser.parse_args()
+
+    game_type = {
+        'single': Pinochle,
+        'double': DoubleDeckPinochle,
+        'firehouse': FirehousePinochle,
+    }[args.game]
+
+    rng = make_rng(args.seed)
+    total_time, total_nodes = 0.0, 0
+    for idx in range(args.positions):
+        # Play a hand with the simple AI until each player has the requested number of cards
+        game = game_type([SimplePinochlePlayer(f'P{i}') for i in range(game_type.rules.n_players)])
+        game.seed(int(rng.integers(2 ** 32)))
+        game.start_next_hand()
+        game.update_current_players()
+        game.deal()
+        game.bidding_process()
+        game.set_partners()
+        game.set_position()
+        game.call_trump()
+        game.pass_cards()
+        game.declare_meld()
+        while len(game.high_bidder.hand) > args.cards:
+            game.play_next_trick()
+        game.set_up_trick()
+
+        solver = DoubleDummySolver()
+        start = time()
+        position = Position.from_game(game)
+        value = solver.solve(position)
+        elapsed = time() - start
+        total_time += elapsed
+        total_nodes += solver.nodes
+        print(f'Position {idx}: value {value} of {position.points_left}, {solver.nodes} nodes, {elapsed:.3f} seconds')
+
+    print(f'Average: {total_nodes / args.positions:.0f} nodes, {total_time / args.positions:.3f} seconds')
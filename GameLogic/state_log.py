@@ -1,8 +1,11 @@
 import os
 import re
 import json
+from typing import Optional
 import numpy as np
 
+from GameLogic.rng import get_rng, choose
+
 
 class StateLog:
 
@@ -69,9 +72,9 @@ class StateLog:
 
         return indices
 
-    def get_random_card_play(self) -> int:
+    def get_random_card_play(self, rng: Optional[np.random.Generator] = None) -> int:
         indices = self.get_card_play_indices()
-        return np.random.choice(indices)
+        return choose(get_rng(rng), indices)
 
     def __getitem__(self, item):
         return self.log[item]
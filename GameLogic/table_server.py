@@ -0,0 +1,571 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+import asyncio
+import json
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from GameLogic.cards import Card
+from GameLogic.events import (
+    GameObserver,
+    HandStarted,
+    BidPlaced,
+    TrumpCalled,
+    CardsPassed,
+    CardPlayed,
+    TrickWon,
+    HandScored,
+)
+from GameLogic.games import (
+    Pinochle,
+    DoubleDeckPinochle,
+    FirehousePinochle,
+)
+from GameLogic.players import (
+    Decision,
+    PinochlePlayer,
+    SimplePinochlePlayer,
+)
+from GameLogic.rng import SeedLike, as_seed_sequence, trial_seed
+from GameLogic.tricks import Trick
+
+
+class AsyncTable:
+    """
+    Drive one game on an event loop, awaiting every player decision
+
+    The game rules, logging and events are those of the wrapped
+    :class:`Pinochle` instance; only the order of the phases is repeated
+    here so that decisions can be awaited instead of blocking.
+
+    With ``move_time``, every decision gets a deadline that many seconds
+    away, and the table keeps count of the decisions, the search iterations
+    spent on them, the slowest one and the ones that missed the deadline.
+    The time of a decision counts from when the table asks for it, so it
+    includes any wait for the event loop or for a busy pool.
+    """
+
+    def __init__(self, table_id: str, game: Pinochle, n_hands: Optional[int] = None,
+                 move_time: Optional[float] = None):
+        self.table_id = table_id
+        self.game = game
+        self.n_hands = n_hands
+        self.move_time = move_time
+        self.hands_played = 0
+        self.finished = False
+
+        self.decisions = 0
+        self.iterations = 0
+        self.max_elapsed = 0.0
+        self.late_decisions = 0
+
+    @property
+    def remote_players(self) -> List['RemotePinochlePlayer']:
+        return [p for p in self.game.players if isinstance(p, RemotePinochlePlayer)]
+
+    async def decide(self, decide_async: Callable[..., Awaitable[Decision]], *args):
+        """Await a decision with the table's deadline, keep its statistics and return its choice"""
+        requested = monotonic()
+        deadline = None if self.move_time is None else requested + self.move_time
+        decision = await decide_async(*args, deadline)
+        elapsed = monotonic() - requested
+
+        self.decisions += 1
+        self.iterations += decision.iterations
+        self.max_elapsed = max(self.max_elapsed, elapsed)
+        if self.move_time is not None and elapsed > self.move_time:
+            self.late_decisions += 1
+        return decision.choice
+
+    async def bidding_process(self):
+        game = self.game
+        passed = game.start_bidding()
+
+        idx = 0
+        n_players = len(game.current_players)
+        while not game.bidding_is_over(passed):
+            player = game.current_players[idx]
+            if not passed[player]:
+                game.log_state(f'WAITING ON PLAYER {player.index} TO BID', save_state=False)
+                bid = await self.decide(player.decide_bid_async, game.high_bid, game.rules.bid_increment_amt)
+                game.apply_bid(player, None if game.bid_error(bid) else bid, passed)
+            idx = (idx + 1) % n_players
+
+        game.finish_bidding()
+
+    async def call_trump(self):
+        game = self.game
+        if game.preset_trump:
+            trump = game.preset_trump
+        else:
+            game.log_state(f'WAITING ON PLAYER {game.high_bidder.index} TO CALL TRUMP', save_state=False)
+            trump = await self.decide(game.high_bidder.decide_trump_async)
+        game.apply_trump(trump)
+
+    async def player_passes_cards(self, player: PinochlePlayer) -> List[Card]:
+        cards = await self.decide(player.decide_cards_to_pass_async, self.game.rules.n_cards_to_pass)
+        player.discard(cards)
+        return cards
+
+    async def pass_cards(self):
+        game = self.game
+        game.log_state(f'WAITING FOR PLAYER {game.high_bidder.partner.index} TO PASS CARDS', save_state=False)
+        game.apply_take_cards(await self.player_passes_cards(game.high_bidder.partner))
+        game.high_bidder_chooses_meld()
+        game.log_state(f'WAITING FOR PLAYER {game.high_bidder.index} TO PASS CARDS', save_state=False)
+        game.apply_give_cards(await self.player_passes_cards(game.high_bidder))
+
+    async def play_tricks(self):
+        game = self.game
+        while game.high_bidder.hand:
+            game.set_up_trick()
+            while len(game.trick) < len(game.current_players):
+                player = game.get_next_player()
+                card = await self.decide(player.decide_card_to_play_async, game.trick)
+                game.play_next_card(card)
+            game.finish_trick()
+
+            # Let the other tables run between tricks
+            await asyncio.sleep(0)
+
+    async def play_hand(self):
+        game = self.game
+        game.log_state('START HAND', save_state=False)
+        game.start_next_hand()
+        game.update_current_players()
+        game.deal()
+
+        game.log_state('START BIDDING PROCESS', save_state=False)
+        await self.bidding_process()
+        game.log_state('END BIDDING PROCESS', save_state=False)
+
+        game.set_partners()
+        game.set_position()
+        await self.call_trump()
+        await self.pass_cards()
+        game.declare_meld()
+
+        if game.can_play_hand():
+            game.log_state('START TRICKS', save_state=False)
+            await self.play_tricks()
+            game.log_state('END TRICKS', save_state=False)
+
+        game.update_scores()
+        game.log_state('END HAND', save_state=False)
+        self.hands_played += 1
+
+    def game_over(self) -> bool:
+        if self.n_hands is not None:
+            return self.hands_played >= self.n_hands
+        return any([p.score > self.game.rules.winning_score for p in self.game.players])
+
+    async def run(self):
+        """Play hands until the game is won (or ``n_hands`` were played)"""
+        broadcaster = TableBroadcaster(self)
+        self.game.attach(broadcaster)
+        try:
+            while not self.game_over():
+                await self.play_hand()
+            scores = {p.name: p.score for p in self.game.players}
+            for player in self.remote_players:
+                player.send({'type': 'game_over', 'scores': scores})
+        finally:
+            self.game.detach(broadcaster)
+            for player in self.remote_players:
+                await player.close()
+            self.finished = True
+
+
+def card_to_json(card: Card) -> str:
+    return card.to_str()
+
+
+class TableBroadcaster(GameObserver):
+    """Forward the public events of a table to its remote players"""
+
+    def __init__(self, table: AsyncTable):
+        self.table = table
+
+    def broadcast(self, message: dict):
+        for player in self.table.remote_players:
+            player.send(message)
+
+    def on_hand_started(self, event: HandStarted):
+        self.broadcast({'type': 'event', 'event': 'hand_started', 'hand_count': event.hand_count})
+        for player in self.table.remote_players:
+            if player in event.game.current_players:
+                player.send({'type': 'hand', 'cards': [card_to_json(c) for c in player.hand]})
+
+    def on_bid_placed(self, event: BidPlaced):
+        self.broadcast({'type': 'event', 'event': 'bid', 'player': event.player.name, 'bid': event.bid})
+
+    def on_trump_called(self, event: TrumpCalled):
+        self.broadcast({'type': 'event', 'event': 'trump', 'player': event.player.name, 'trump': event.trump})
+
+    def on_cards_passed(self, event: CardsPassed):
+        self.broadcast({'type': 'event', 'event': 'cards_passed', 'player': event.from_player.name,
+                        'to': event.to_player.name, 'n_cards': len(event.cards)})
+        if isinstance(event.to_player, RemotePinochlePlayer):
+            event.to_player.send({'type': 'received_cards', 'cards': [card_to_json(c) for c in event.cards]})
+
+    def on_card_played(self, event: CardPlayed):
+        self.broadcast({'type': 'event', 'event': 'card_played', 'player': event.player.name,
+                        'card': card_to_json(event.card)})
+
+    def on_trick_won(self, event: TrickWon):
+        self.broadcast({'type': 'event', 'event': 'trick_won', 'player': event.player.name,
+                        'counters': event.trick.counters()})
+
+    def on_hand_scored(self, event: HandScored):
+        self.broadcast({'type': 'event', 'event': 'hand_scored', 'high_bidder': event.high_bidder.name,
+                        'bid': event.high_bid, 'saved': event.saved, 'counters': event.counters,
+                        'meld': event.meld, 'scores': {p.name: p.score for p in event.game.players}})
+
+
+class RemotePinochlePlayer(SimplePinochlePlayer):
+    """
+    Player making its decisions through a client connected to a socket
+
+    Each decision is sent as a JSON ``prompt`` line and the reply is a JSON
+    line holding the chosen index. When the client disconnects or does not
+    answer within ``decision_timeout`` seconds, the decision falls back to
+    the :class:`SimplePinochlePlayer` logic so the table keeps playing.
+    """
+
+    max_attempts = 3
+
+    def __init__(
+        self,
+        name,
+        reader: asyncio.StreamReader = None,
+        writer: asyncio.StreamWriter = None,
+        decision_timeout: Optional[float] = 60.0,
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self.reader = reader
+        self.writer = writer
+        self.decision_timeout = decision_timeout
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    def send(self, message: dict):
+        if self.connected:
+            self.writer.write((json.dumps(message) + '\n').encode())
+
+    async def request(self, message: dict) -> Optional[dict]:
+        """Send a prompt and wait for the reply, or return None if there is none"""
+        if not self.connected:
+            return None
+        self.send({'type': 'prompt', **message})
+        try:
+            await self.writer.drain()
+            line = await asyncio.wait_for(self.reader.readline(), self.decision_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            return None
+        if not line:
+            self.writer.close()
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return {}
+
+    async def close(self):
+        if self.connected:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def hand_json(self) -> List[str]:
+        return [card_to_json(card) for card in self.hand]
+
+    async def place_bid_async(self, current_bid: int, bid_increment: int) -> int:
+        for _ in range(self.max_attempts):
+            reply = await self.request({
+                'decision': 'bid',
+                'current_bid': current_bid,
+                'increment': bid_increment,
+                'hand': self.hand_json(),
+            })
+            if reply is None:
+                return self.place_bid(current_bid, bid_increment)
+            bid = reply.get('bid')
+            if bid is None:
+                return None
+            if isinstance(bid, int) and bid > current_bid and bid % bid_increment == 0:
+                return bid
+            self.send({'type': 'error', 'message': 'Invalid bid'})
+        return None
+
+    async def _choose_index(self, message: dict, key: str, n_options: int) -> Optional[int]:
+        for _ in range(self.max_attempts):
+            reply = await self.request(message)
+            if reply is None:
+                return None
+            choice = reply.get(key)
+            if isinstance(choice, int) and 0 <= choice < n_options:
+                return choice
+            self.send({'type': 'error', 'message': f'Choose an index from 0 to {n_options - 1}'})
+        return None
+
+    async def choose_trump_async(self) -> str:
+        message = {'decision': 'trump', 'options': Card.suits, 'hand': self.hand_json()}
+        choice = await self._choose_index(message, 'trump', len(Card.suits))
+        return self.choose_trump() if choice is None else Card.suits[choice]
+
+    async def choose_cards_to_pass_async(self, n: int = 0) -> List[Card]:
+        cards = list(self.hand.cards)
+        for _ in range(self.max_attempts):
+            reply = await self.request({'decision': 'pass', 'n': n, 'options': self.hand_json()})
+            if reply is None:
+                break
+            choice = reply.get('cards')
+            if isinstance(choice, list) and len(choice) == n and len(set(choice)) == n and \
+                    all([isinstance(idx, int) and 0 <= idx < len(cards) for idx in choice]):
+                return [cards[idx] for idx in choice]
+            self.send({'type': 'error', 'message': f'Choose {n} different card indices'})
+        return self._choose_cards_to_pass(n)
+
+    # A person at the other end of the socket is not held to the deadline of
+    # the table, only to ``decision_timeout``
+
+    async def decide_bid_async(self, current_bid: int, bid_increment: int, deadline: Optional[float] = None) -> Decision:
+        return await self._timed(self.place_bid_async(current_bid, bid_increment))
+
+    async def decide_trump_async(self, deadline: Optional[float] = None) -> Decision:
+        return await self._timed(self.choose_trump_async())
+
+    async def decide_cards_to_pass_async(self, n: int = 0, deadline: Optional[float] = None) -> Decision:
+        return await self._timed(self.choose_cards_to_pass_async(n))
+
+    async def decide_card_to_play_async(self, trick: Trick, deadline: Optional[float] = None) -> Decision:
+        return await self._timed(self.choose_card_to_play_async(trick))
+
+    @staticmethod
+    async def _timed(choice: Awaitable) -> Decision:
+        start = monotonic()
+        return Decision(await choice, 0, monotonic() - start)
+
+    async def choose_card_to_play_async(self, trick: Trick) -> Card:
+        legal = list(trick.legal_plays(self.hand))
+        message = {
+            'decision': 'play',
+            'options': [card_to_json(c) for c in legal],
+            'trick': [card_to_json(c) for c in trick],
+            'hand': self.hand_json(),
+            'position': self.position,
+        }
+        choice = await self._choose_index(message, 'card', len(legal))
+        return self.choose_card_to_play(trick) if choice is None else legal[choice]
+
+
+class TableServer:
+    """
+    Host many concurrent tables on one event loop
+
+    Clients connect to a local socket and send ``{"name": ...}``. As soon
+    as ``humans_per_table`` clients are waiting, a table is opened with the
+    remaining seats filled by AI players. AI-only tables can be added with
+    :meth:`add_table`.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        game_type: type = FirehousePinochle,
+        ai_player_type: type = SimplePinochlePlayer,
+        humans_per_table: int = 1,
+        n_hands: Optional[int] = None,
+        decision_timeout: Optional[float] = 60.0,
+        move_time: Optional[float] = None,
+        seed: SeedLike = None,
+    ):
+        self.host = host
+        self.port = port
+        self.game_type = game_type
+        self.ai_player_type = ai_player_type
+        self.humans_per_table = humans_per_table
+        self.n_hands = n_hands
+        self.decision_timeout = decision_timeout
+        self.move_time = move_time
+        self.seed = as_seed_sequence(seed)
+
+        self.tables: Dict[str, AsyncTable] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.waiting: List[RemotePinochlePlayer] = []
+
+    def add_table(self, players: Sequence[PinochlePlayer]) -> AsyncTable:
+        """Open a table with the given players and start playing right away"""
+        game = self.game_type(list(players))
+        game.seed(trial_seed(self.seed, len(self.tables)))
+        table = AsyncTable(game.game_id, game, n_hands=self.n_hands, move_time=self.move_time)
+        self.tables[table.table_id] = table
+        self.tasks[table.table_id] = asyncio.ensure_future(self._run_table(table))
+        return table
+
+    def add_ai_table(self, player_types: Optional[Sequence[type]] = None) -> AsyncTable:
+        player_types = player_types or [self.ai_player_type] * self.game_type.rules.n_players
+        return self.add_table([player_type(f'{player_type.__name__} {idx}') for idx, player_type in enumerate(player_types)])
+
+    async def _run_table(self, table: AsyncTable):
+        try:
+            await table.run()
+        finally:
+            self.tables.pop(table.table_id, None)
+            self.tasks.pop(table.table_id, None)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        line = await reader.readline()
+        try:
+            name = json.loads(line).get('name') or 'Guest'
+        except (json.JSONDecodeError, AttributeError):
+            name = 'Guest'
+
+        player = RemotePinochlePlayer(name, reader, writer, decision_timeout=self.decision_timeout)
+        self.waiting.append(player)
+        player.send({'type': 'welcome', 'message': f'Waiting for {self.humans_per_table - len(self.waiting)} more players'})
+
+        if len(self.waiting) >= self.humans_per_table:
+            humans, self.waiting = self.waiting[:self.humans_per_table], self.waiting[self.humans_per_table:]
+            n_ai = self.game_type.rules.n_players - len(humans)
+            ai_players = [self.ai_player_type(f'{self.ai_player_type.__name__} {idx}') for idx in range(n_ai)]
+            table = self.add_table(humans + ai_players)
+            for human in humans:
+                human.send({'type': 'table', 'table': table.table_id, 'players': [p.name for p in table.game.players]})
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def wait_for_tables(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks.values()))
+
+
+def play_remote(host: str = '127.0.0.1', port: int = 8765, name: Optional[str] = None):
+    """Console client for a human playing at a :class:`TableServer`"""
+    import socket
+
+    name = name or input('What is your name?  ')
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile('rw')
+        stream.write(json.dumps({'name': name}) + '\n')
+        stream.flush()
+
+        for line in stream:
+            message = json.loads(line)
+            kind = message.get('type')
+            if kind != 'prompt':
+                print(message)
+                if kind == 'game_over':
+                    return
+                continue
+
+            decision = message['decision']
+            print(' ')
+            print('Hand:', ', '.join(message.get('hand', [])))
+            if decision == 'bid':
+                print(f'Current bid is {message["current_bid"]}, increments of {message["increment"]}')
+                bid = input('Bid (press Enter to pass):  ')
+                reply = {'bid': int(bid) if bid.strip().isdigit() else None}
+            elif decision == 'trump':
+                print(', '.join([f'{idx}: {suit}' for idx, suit in enumerate(message['options'])]))
+                choice = input('Trump:  ')
+                reply = {'trump': int(choice) if choice.strip().isdigit() else 0}
+            elif decision == 'pass':
+                print(', '.join([f'{idx}: {card}' for idx, card in enumerate(message['options'])]))
+                choice = input(f'Choose {message["n"]} cards to pass (space separated):  ')
+                reply = {'cards': [int(idx) for idx in choice.split() if idx.isdigit()]}
+            else:
+                print('Trick:', ' | '.join(message['trick']))
+                print(', '.join([f'{idx}: {card}' for idx, card in enumerate(message['options'])]))
+                choice = input('Choice:  ')
+                reply = {'card': int(choice) if choice.strip().isdigit() else -1}
+
+            stream.write(json.dumps(reply) + '\n')
+            stream.flush()
+
+
+async def run_ai_tables(
+    n_tables: int,
+    n_hands: int,
+    game_type: type = FirehousePinochle,
+    player_type: type = SimplePinochlePlayer,
+    move_time: Optional[float] = None,
+    seed: SeedLike = None,
+) -> TableServer:
+    """Play ``n_tables`` AI-only tables concurrently on the running event loop"""
+    server = TableServer(game_type=game_type, ai_player_type=player_type, n_hands=n_hands, move_time=move_time, seed=seed)
+    for _ in range(n_tables):
+        server.add_ai_table()
+    await server.wait_for_tables()
+    return server
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    from time import time
+
+    parser = ArgumentParser('Host many Pinochle tables on one event loop')
+    parser.add_argument('--serve', action='store_true', help='Accept human players on a local socket')
+    parser.add_argument('--client', action='store_true', help='Connect to a server and play as a human')
+    parser.add_argument('--ai_tables', type=int, default=0, help='Number of AI-only tables to run')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host of the server')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the server')
+    parser.add_argument('--name', type=str, default=None, help='Name of the human player (client)')
+    parser.add_argument('--game', type=str, default='firehouse', choices=['single', 'double', 'firehouse'], help='Game variant')
+    parser.add_argument('--humans', type=int, default=1, help='Number of human seats per table')
+    parser.add_argument('--hands', type=int, default=None, help='Number of hands per table (default: play to the winning score)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds a human has for each decision')
+    parser.add_argument('--ai', type=str, default='simplepinochleplayer', help='Player type of the AI seats')
+    parser.add_argument('--move_time', type=float, default=None, help='Seconds an AI player has for each decision')
+    parser.add_argument('--seed', type=int, default=None, help='Master seed for reproducible tables')
+    args = parser.parse_args()
+
+    game_types = {
+        'single': Pinochle,
+        'double': DoubleDeckPinochle,
+        'firehouse': FirehousePinochle,
+    }
+    player_types = {name.lower(): player_type for name, player_type in PinochlePlayer.type_from_str.items()}
+
+    if args.client:
+        play_remote(args.host, args.port, args.name)
+        exit()
+
+    async def main():
+        server = TableServer(
+            host=args.host,
+            port=args.port,
+            game_type=game_types[args.game],
+            ai_player_type=player_types[args.ai.lower()],
+            humans_per_table=args.humans,
+            n_hands=args.hands,
+            decision_timeout=args.timeout,
+            move_time=args.move_time,
+            seed=args.seed,
+        )
+        start = time()
+        tables = [server.add_ai_table() for _ in range(args.ai_tables)]
+        if args.serve:
+            await server.serve()
+        else:
+            await server.wait_for_tables()
+            print(f'Played {args.ai_tables} tables in {round(time() - start, 1)} seconds')
+            decisions = sum(t.decisions for t in tables)
+            if decisions:
+                print(f'{decisions} decisions, {sum(t.iterations for t in tables) / decisions:.0f} iterations each, '
+                      f'slowest {max(t.max_elapsed for t in tables):.3f} seconds, '
+                      f'{sum(t.late_decisions for t in tables)} past the deadline')
+
+    asyncio.run(main())
@@ -0,0 +1,330 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+from itertools import combinations_with_replacement, product
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from GameLogic.cards import Card
+from GameLogic.positions import CardLayout, Position
+from GameLogic.rules import RuleSet
+
+
+# Value of the entries of impossible positions (more copies of a card than the deck has)
+INVALID = 255
+
+
+def canonical_side(n_seats: int) -> Tuple[bool, ...]:
+    """Bidder's side used by the tables: seat 0, plus seat 2 when partners sit across"""
+    return tuple(seat == 0 or (n_seats == 4 and seat == 2) for seat in range(n_seats))
+
+
+class TablebaseLayer:
+    """
+    Values of every position between tricks with ``k`` cards in each hand
+
+    Hands are multisets of ``k`` card types, numbered in lexicographic
+    order. Trump is always suit 0 (other trumps are mapped onto it by
+    swapping suits), and the bidder's side is :func:`canonical_side`. The
+    entry of a position is at ``leader * H**n + sum(hand[s] * H**(n-1-s))``
+    for ``H`` hands per seat and ``n`` seats.
+    """
+
+    def __init__(self, layout: CardLayout, n_seats: int, k: int, copies: int, values: Optional[np.ndarray] = None):
+        self.layout = layout
+        self.n_seats = n_seats
+        self.k = k
+        self.copies = copies
+        self.hands = [hand for hand in combinations_with_replacement(range(layout.n_cards), k)
+                      if all(hand.count(c) <= copies for c in set(hand))]
+        self.hand_index = {hand: idx for idx, hand in enumerate(self.hands)}
+        self.n_hands = len(self.hands)
+        self.values = values
+
+    @staticmethod
+    def size(layout: CardLayout, n_seats: int, k: int, copies: int) -> int:
+        n_hands = sum(1 for hand in combinations_with_replacement(range(layout.n_cards), k)
+                      if all(hand.count(c) <= copies for c in set(hand)))
+        return n_seats * n_hands ** n_seats
+
+    def __len__(self):
+        return self.n_seats * self.n_hands ** self.n_seats
+
+    def index(self, leader: int, hands: Sequence[Tuple[int, ...]]) -> int:
+        idx = leader
+        for hand in hands:
+            idx = idx * self.n_hands + self.hand_index[hand]
+        return idx
+
+
+class Tablebase:
+    """
+    Precomputed double-dummy values of endgames
+
+    :meth:`build` solves every position between tricks with at most
+    ``max_cards`` cards in each hand, layer by layer: a position with ``k``
+    cards is solved by trying every legal trick and looking the resulting
+    positions up in the layer with ``k - 1`` cards. Tricks are evaluated
+    for many positions at once with numpy. Each layer is stored as a
+    ``.npy`` file of uint8 values that is memory-mapped when loaded, so
+    many processes can share one copy.
+
+    The number of positions grows very fast with ``max_cards``:
+
+    =========  ======  ==============  ================
+    variant    seats   1 card/hand     2 cards/hand
+    =========  ======  ==============  ================
+    single     4       1.3 million     (8 billion)
+    double     4       0.6 million     (7.8 billion)
+    firehouse  3       24 thousand     28 million
+    =========  ======  ==============  ================
+
+    A table of the last trick alone holds no decisions (every card is
+    forced), so tables start at two cards per hand, and only Firehouse can
+    have one (under two minutes to build and 28 MB). :meth:`build` refuses
+    layers larger than ``max_entries``. Deeper endgames are left to
+    :class:`DoubleDummySolver` and :class:`InformationSetMCTS`, which look
+    the last tricks up in the tablebase.
+
+    Tables saved to a directory are pickled as their directory, so worker
+    processes memory-map the files instead of receiving copies of them.
+    """
+
+    def __init__(self, rules: RuleSet, max_cards: int, layers: Optional[Dict[int, TablebaseLayer]] = None,
+                 directory: Optional[str] = None):
+        if max_cards < 2:
+            raise ValueError('A tablebase needs at least 2 cards per hand, the last trick has no decisions')
+        self.rules = rules
+        self.max_cards = max_cards
+        self.n_seats = rules.n_players
+        self.layout = CardLayout.for_values(rules.deck_type.values)
+        self.copies = rules.deck_type.card_instances
+        self.side = canonical_side(self.n_seats)
+        self.layers = layers or {}
+        self.directory = directory
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if self.directory is not None:
+            del state['layers']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if 'layers' not in state:
+            self.layers = Tablebase.load(self.rules, self.max_cards, self.directory).layers
+
+    @property
+    def n_cards(self) -> int:
+        """Most cards left in a position of the table, over all hands"""
+        return self.n_seats * self.max_cards
+
+    @staticmethod
+    def filename(rules: RuleSet, k: int) -> str:
+        return f'tablebase_{rules.deck_type.__name__}_{rules.n_players}p_ltv{rules.last_trick_value}_{k}.npy'
+
+    @staticmethod
+    def build(
+        rules: RuleSet,
+        max_cards: int,
+        directory: Optional[str] = None,
+        max_entries: int = 100_000_000,
+        chunk_size: int = 200_000,
+    ) -> 'Tablebase':
+        """
+        Solve all positions with up to ``max_cards`` cards per hand
+
+        Parameters
+        ----------
+        rules: RuleSet
+            Deck, number of players and last trick value of the variant
+        max_cards: int
+            Largest number of cards per hand, at least 2
+        directory: str, optional
+            Save each layer in this directory; layers already there are loaded instead of rebuilt
+        max_entries: int
+            Refuse to build a layer with more positions than this
+        chunk_size: int
+            Number of positions evaluated at once, which bounds the memory used
+        """
+        table = Tablebase(rules, max_cards, directory=directory)
+        for k in range(1, max_cards + 1):
+            size = TablebaseLayer.size(table.layout, table.n_seats, k, table.copies)
+            if size > max_entries:
+                raise ValueError(f'The layer with {k} cards per hand has {size} positions, more than max_entries={max_entries}')
+
+            filename = None if directory is None else os.path.join(directory, Tablebase.filename(rules, k))
+            if filename is not None and os.path.exists(filename):
+                table.layers[k] = TablebaseLayer(table.layout, table.n_seats, k, table.copies,
+                                                 np.load(filename, mmap_mode='r'))
+                continue
+
+            layer = TablebaseLayer(table.layout, table.n_seats, k, table.copies)
+            if filename is not None:
+                os.makedirs(directory, exist_ok=True)
+                layer.values = np.lib.format.open_memmap(filename, mode='w+', dtype=np.uint8, shape=(len(layer),))
+            else:
+                layer.values = np.empty(len(layer), dtype=np.uint8)
+
+            for start in range(0, len(layer), chunk_size):
+                stop = min(start + chunk_size, len(layer))
+                layer.values[start:stop] = table._solve_chunk(layer, np.arange(start, stop, dtype=np.int64))
+            if filename is not None:
+                layer.values.flush()
+            table.layers[k] = layer
+        return table
+
+    @staticmethod
+    def load(rules: RuleSet, max_cards: int, directory: str) -> 'Tablebase':
+        """Memory-map the layers saved by :meth:`build`"""
+        table = Tablebase(rules, max_cards, directory=directory)
+        for k in range(1, max_cards + 1):
+            values = np.load(os.path.join(directory, Tablebase.filename(rules, k)), mmap_mode='r')
+            table.layers[k] = TablebaseLayer(table.layout, table.n_seats, k, table.copies, values)
+        return table
+
+    def _solve_chunk(self, layer: TablebaseLayer, positions: np.ndarray) -> np.ndarray:
+        layout, n, k = self.layout, self.n_seats, layer.k
+        suit_of = np.array(layout.suit_of)
+        rank_of = np.array(layout.rank_of)
+        points = np.array(layout.points)
+        side = np.array(self.side)
+        trump = 0
+
+        # Decode the positions
+        hand_cards = np.array(layer.hands, dtype=np.int64)
+        hand_ids = np.empty((len(positions), n), dtype=np.int64)
+        rest = positions.copy()
+        for seat in reversed(range(n)):
+            hand_ids[:, seat] = rest % layer.n_hands
+            rest //= layer.n_hands
+        leader = rest
+
+        # Positions holding more copies of a card than the deck has are impossible
+        counts = np.zeros((len(positions), layout.n_cards), dtype=np.int64)
+        for seat in range(n):
+            for slot in range(k):
+                np.add.at(counts, (np.arange(len(positions)), hand_cards[hand_ids[:, seat], slot]), 1)
+        valid = (counts <= self.copies).all(axis=1)
+
+        # Every combination of one card slot per player, in playing order
+        choices = np.array(list(product(range(k), repeat=n)), dtype=np.int64)
+        rows = np.arange(len(positions))[:, None]
+        player_seats = (leader[:, None] + np.arange(n)[None, :]) % n
+        player_hands = hand_cards[hand_ids[rows, player_seats]]
+
+        cards = np.stack([player_hands[:, i, :][rows, choices[None, :, i]] for i in range(n)], axis=-1)
+        suits, ranks = suit_of[cards], rank_of[cards]
+
+        # Follow the trick card by card, checking that each card is legal
+        legal = [np.ones(cards.shape[:2], dtype=bool)]
+        lead_suit = suits[..., 0]
+        best_suit, best_rank, best_player = suits[..., 0].copy(), ranks[..., 0].copy(), np.zeros(cards.shape[:2], dtype=np.int64)
+        for i in range(1, n):
+            hand_suits = suit_of[player_hands[:, i, :]][:, None, :]
+            hand_ranks = rank_of[player_hands[:, i, :]][:, None, :]
+            trump_played = best_suit == trump
+
+            in_lead = hand_suits == lead_suit[..., None]
+            in_trump = hand_suits == trump
+            has_lead, has_trump = in_lead.any(axis=-1), in_trump.any(axis=-1)
+            beats_lead = (in_lead & (hand_ranks > best_rank[..., None])).any(axis=-1)
+            beats_trump = (in_trump & (hand_ranks > best_rank[..., None])).any(axis=-1)
+
+            suit, rank = suits[..., i], ranks[..., i]
+            must_beat_lead = (~trump_played | (lead_suit == trump)) & beats_lead
+            follow = (suit == lead_suit) & (~must_beat_lead | (rank > best_rank))
+            must_beat_trump = trump_played & beats_trump
+            ruff = (suit == trump) & (~must_beat_trump | (rank > best_rank))
+            legal.append(np.where(has_lead, follow, np.where(has_trump, ruff, True)))
+
+            wins = np.where(suit == trump, (best_suit != trump) | (rank > best_rank),
+                            (suit == best_suit) & (rank > best_rank))
+            best_suit = np.where(wins, suit, best_suit)
+            best_rank = np.where(wins, rank, best_rank)
+            best_player = np.where(wins, i, best_player)
+
+        # Points of the trick and value of the position after it
+        winner = (leader[:, None] + best_player) % n
+        trick_points = points[cards].sum(axis=-1) + (self.rules.last_trick_value if k == 1 else 0)
+        value = np.where(side[winner], trick_points, 0)
+        if k > 1:
+            previous = self.layers[k - 1]
+            removed = np.array([[previous.hand_index[hand[:slot] + hand[slot + 1:]] for slot in range(k)]
+                                for hand in layer.hands], dtype=np.int64)
+            child = winner.copy()
+            for seat in range(n):
+                slot = choices[:, (seat - leader) % n].T
+                child = child * previous.n_hands + removed[hand_ids[:, seat][:, None], slot]
+            value = value + np.asarray(previous.values)[child]
+
+        # Minimax over the choices, from the last player back to the leader
+        value = value.astype(np.int16).reshape((len(positions),) + (k,) * n)
+        for i in reversed(range(n)):
+            maximizing = side[player_seats[:, i]].reshape((-1,) + (1,) * i)
+            is_legal = legal[i].reshape((len(positions),) + (k,) * n)[(slice(None),) * (i + 2) + (0,) * (n - i - 1)]
+            masked = np.where(is_legal, value, np.where(maximizing[..., None], -1, 10_000))
+            value = np.where(maximizing, masked.max(axis=-1), masked.min(axis=-1))
+
+        return np.where(valid, value, INVALID).astype(np.uint8)
+
+    def lookup(self, position: Position) -> Optional[int]:
+        """Value of ``position`` (as :meth:`DoubleDummySolver.solve`) if it is in the table, otherwise None"""
+        if position.trick or position.n_cards == 0:
+            return None if position.trick else 0
+        k, extra = divmod(position.n_cards, self.n_seats)
+        layer = self.layers.get(k)
+        if extra or layer is None or position.n_seats != self.n_seats:
+            return None
+
+        # Rotate the seats so the bidder's side matches the table
+        shift = position.side.index(True)
+        if tuple(position.side[shift:] + position.side[:shift]) != self.side:
+            return None
+
+        # Swap trump with suit 0
+        n_values, trump = self.layout.n_values, position.trump
+        suit_map = list(range(len(Card.suits)))
+        suit_map[0], suit_map[trump] = trump, 0
+
+        hands = []
+        for offset in range(self.n_seats):
+            hand = position.hands[(shift + offset) % self.n_seats]
+            cards = []
+            for c, count in enumerate(hand):
+                if count:
+                    cards += [suit_map[c // n_values] * n_values + c % n_values] * count
+            if len(cards) != k:
+                return None
+            hands.append(tuple(sorted(cards)))
+
+        value = int(layer.values[layer.index((position.leader - shift) % self.n_seats, hands)])
+        return None if value == INVALID else value
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    from time import time
+
+    from GameLogic.games import FirehousePinochle
+
+    parser = ArgumentParser('Build the endgame tablebase of a game variant')
+    parser.add_argument('--game', type=str, default='firehouse', choices=['firehouse'],
+                        help='Game variant (four-player variants are too large for two cards per hand)')
+    parser.add_argument('--cards', type=int, default=2, help='Largest number of cards per hand')
+    parser.add_argument('--directory', type=str, default='tablebases', help='Directory of the table files')
+    parser.add_argument('--max_entries', type=int, default=100_000_000, help='Largest number of positions in one layer')
+    args = parser.parse_args()
+
+    game_type = {
+        'firehouse': FirehousePinochle,
+    }[args.game]
+
+    start = time()
+    tablebase = Tablebase.build(game_type.rules, args.cards, args.directory, max_entries=args.max_entries)
+    for k, layer in tablebase.layers.items():
+        print(f'{k} cards per hand: {len(layer)} positions')
+    print(f'Built in {round(time() - start, 1)} seconds')
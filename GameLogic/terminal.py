@@ -0,0 +1,40 @@
+import os
+
+# termcolor's colored function, imported when text is first colored
+_colored = None
+
+
+def colored(text: str, color: str) -> str:
+    """
+    Wrap ``text`` in the ANSI codes of ``color``
+
+    Coloring only matters when printing to a terminal, so termcolor is
+    imported (and the Windows console set up) on the first call rather
+    than when the engine is imported, e.g. by every worker of a pool.
+    """
+    global _colored
+    if _colored is None:
+        from termcolor import colored as termcolor_colored
+        _enable_ansi_console()
+        _colored = termcolor_colored
+    return _colored(text, color)
+
+
+def _enable_ansi_console():
+    """
+    Let the Windows console interpret ANSI color codes
+
+    This sets the console mode directly instead of running ``os.system('color')``,
+    which spawns a shell just for its side effect on the console.
+    """
+    if os.name != 'nt':
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)  # Standard output
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except (AttributeError, OSError):
+        pass
@@ -0,0 +1,256 @@
+import os
+import sys
+sys.path.append(os.path.abspath('./'))
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from GameLogic.games import (
+    Pinochle,
+    DoubleDeckPinochle,
+    FirehousePinochle,
+)
+from GameLogic.players import (
+    PinochlePlayer,
+    RandomPinochlePlayer,
+    SimplePinochlePlayer,
+)
+from GameLogic.rng import SeedLike, as_seed_sequence, trial_seed
+
+
+stat_names = ('seats', 'bids_won', 'dropped', 'saved', 'counters', 'score', 'games_won')
+
+
+def empty_stats() -> Dict[str, int]:
+    return {name: 0 for name in stat_names}
+
+
+def seat_rotations(lineup: Sequence[type]) -> List[tuple]:
+    """Every cyclic rotation of the lineup, so each player type sits in each seat"""
+    return [tuple(lineup[i:]) + tuple(lineup[:i]) for i in range(len(lineup))]
+
+
+def _build_game(game_type: type, lineup: Sequence[type]) -> Pinochle:
+    players = [player_type(f'{player_type.__name__} {seat}') for seat, player_type in enumerate(lineup)]
+    return game_type(players)
+
+
+def _record_hand(game: Pinochle, stats: Dict[str, dict], scores_before: Dict[PinochlePlayer, int]):
+    for player in game.current_players:
+        player_stats = stats[player.__class__.__name__]
+        player_stats['seats'] += 1
+        player_stats['counters'] += player.counters(game.rules.last_trick_value)
+        player_stats['score'] += player.score - scores_before[player]
+
+    bidder_stats = stats[game.high_bidder.__class__.__name__]
+    bidder_stats['bids_won'] += 1
+    bidder_stats['dropped'] += int(bool(game.dropped_bid))
+    bidder_stats['saved'] += int(bool(game.saved_bid))
+
+
+def play_batch(
+    game_type: type,
+    lineup: Sequence[type],
+    n_hands: int,
+    seed: SeedLike,
+    mode: str = 'hands',
+    max_hands_per_game: int = 200,
+) -> dict:
+    """
+    Play one batch of a tournament and return its aggregate statistics
+
+    Parameters
+    ----------
+    game_type: type[Pinochle]
+        Game variant to play
+    lineup: Sequence[type[PinochlePlayer]]
+        Player type of each seat
+    n_hands: int
+        Number of hands (``mode='hands'``) or games (``mode='games'``)
+    seed: int or SeedSequence
+        Seed of the batch; hand ``i`` is reseeded from ``(seed, i)``
+    mode: str
+        Play independent hands, or complete games up to the winning score
+    max_hands_per_game: int
+        Safety limit on the length of a game in ``mode='games'``
+
+    Returns
+    -------
+    dict
+        Statistics summed over the batch for each player type
+    """
+    stats = {player_type.__name__: empty_stats() for player_type in lineup}
+    game = _build_game(game_type, lineup)
+
+    hand_idx = 0
+    for _ in range(n_hands):
+        if mode == 'games':
+            for player in game.players:
+                player.score = 0
+
+        for _ in range(max_hands_per_game if mode == 'games' else 1):
+            game.seed(trial_seed(seed, hand_idx))
+            hand_idx += 1
+            scores_before = {p: p.score for p in game.players}
+            game.play_hand()
+            _record_hand(game, stats, scores_before)
+            if any([p.score > game.rules.winning_score for p in game.players]):
+                break
+
+        if mode == 'games':
+            winner = max(game.players, key=lambda p: p.score)
+            stats[winner.__class__.__name__]['games_won'] += 1
+
+    return {
+        'lineup': [player_type.__name__ for player_type in lineup],
+        'n_hands': hand_idx,
+        'stats': stats,
+    }
+
+
+def run_tournament(
+    game_type: type,
+    lineup: Sequence[type],
+    n_hands: int,
+    batch_size: int = 1000,
+    n_workers: Optional[int] = None,
+    rotate_seats: bool = True,
+    mode: str = 'hands',
+    seed: SeedLike = None,
+) -> Iterator[dict]:
+    """
+    Play many hands (or games) across a process pool and stream the
+    aggregate statistics of each batch back as soon as it finishes
+
+    Batches are seeded from the master seed and their batch index, so
+    the merged results are identical for any number of workers.
+
+    Parameters
+    ----------
+    game_type: type[Pinochle]
+        Game variant to play
+    lineup: Sequence[type[PinochlePlayer]]
+        Player type of each seat, one per seat of the game variant
+    n_hands: int
+        Total number of hands (or games) to play for each seat rotation
+    batch_size: int
+        Number of hands (or games) played by a worker per batch
+    n_workers: int, optional
+        Size of the process pool; defaults to the number of cores.
+        With a single worker the batches run in this process.
+    rotate_seats: bool
+        If True, play every cyclic rotation of the lineup
+    mode: str
+        ``'hands'`` to play independent hands, ``'games'`` to play full games
+    seed: int, optional
+        Master seed of the tournament
+
+    Yields
+    ------
+    dict
+        Aggregates of one batch, see :func:`play_batch`
+    """
+    if len(lineup) != game_type.rules.n_players:
+        raise ValueError(f'{game_type.__name__} needs {game_type.rules.n_players} players, got {len(lineup)}')
+
+    master_seed = as_seed_sequence(seed)
+    rotations = seat_rotations(lineup) if rotate_seats else [tuple(lineup)]
+    jobs = []
+    for rotation in rotations:
+        for start in range(0, n_hands, batch_size):
+            batch_seed = trial_seed(master_seed, len(jobs))
+            jobs.append((game_type, rotation, min(batch_size, n_hands - start), batch_seed, mode))
+
+    n_workers = n_workers or os.cpu_count()
+    if n_workers == 1:
+        for job in jobs:
+            yield play_batch(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(play_batch, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class TournamentResults:
+    """Running totals of the batches streamed back by :func:`run_tournament`"""
+
+    def __init__(self):
+        self.n_batches = 0
+        self.n_hands = 0
+        self.stats = {}
+
+    def add(self, batch: dict):
+        self.n_batches += 1
+        self.n_hands += batch['n_hands']
+        for name, batch_stats in batch['stats'].items():
+            totals = self.stats.setdefault(name, empty_stats())
+            for key, value in batch_stats.items():
+                totals[key] += value
+
+    def summary(self) -> Dict[str, dict]:
+        summary = {}
+        for name, totals in self.stats.items():
+            seats, bids_won = totals['seats'], totals['bids_won']
+            summary[name] = {
+                **totals,
+                'save_rate': totals['saved'] / bids_won if bids_won else 0.0,
+                'bid_rate': bids_won / seats if seats else 0.0,
+                'mean_counters': totals['counters'] / seats if seats else 0.0,
+                'mean_score': totals['score'] / seats if seats else 0.0,
+            }
+        return summary
+
+    def to_str(self) -> str:
+        lines = [f'{self.n_hands} hands in {self.n_batches} batches']
+        for name, s in self.summary().items():
+            lines.append(f'{name}: bid rate={s["bid_rate"]:.3f}, save rate={s["save_rate"]:.3f}, '
+                         f'counters={s["mean_counters"]:.2f}, score={s["mean_score"]:.2f}, '
+                         f'games won={s["games_won"]}')
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.to_str()
+
+
+if __name__ == "__main__":
+
+    from argparse import ArgumentParser
+    parser = ArgumentParser('Compare player types by playing many hands across a process pool')
+    parser.add_argument('--game', type=str, default='firehouse', choices=['single', 'double', 'firehouse'], help='Game variant')
+    parser.add_argument('--players', type=str, nargs='+', default=['simple', 'random', 'random'], help='Player type of each seat')
+    parser.add_argument('--hands', type=int, default=10000, help='Number of hands (or games) per seat rotation')
+    parser.add_argument('--batch_size', type=int, default=1000, help='Number of hands (or games) per batch')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--games', action='store_true', help='Play full games instead of single hands')
+    parser.add_argument('--no_rotation', action='store_true', help='Do not rotate the seats')
+    parser.add_argument('--seed', type=int, default=None, help='Master seed for reproducible runs')
+    args = parser.parse_args()
+
+    game_types = {
+        'single': Pinochle,
+        'double': DoubleDeckPinochle,
+        'firehouse': FirehousePinochle,
+    }
+    player_types = {
+        'simple': SimplePinochlePlayer,
+        'random': RandomPinochlePlayer,
+        **{name.lower(): player_type for name, player_type in PinochlePlayer.type_from_str.items()},
+    }
+
+    results = TournamentResults()
+    batches = run_tournament(
+        game_types[args.game],
+        [player_types[name] for name in args.players],
+        args.hands,
+        batch_size=args.batch_size,
+        n_workers=args.workers,
+        rotate_seats=not args.no_rotation,
+        mode='games' if args.games else 'hands',
+        seed=args.seed,
+    )
+    for batch in batches:
+        results.add(batch)
+        print(results)
+        print('---')
@@ -0,0 +1,196 @@
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from GameLogic.cards import Card
+from GameLogic.events import (
+    GameObserver,
+    HandStarted,
+    TrumpCalled,
+    CardsPassed,
+    CardPlayed,
+    TrickWon,
+)
+
+if TYPE_CHECKING:
+    from GameLogic.games import Pinochle
+    from GameLogic.players import PinochlePlayer
+
+
+# Seed of the random keys, fixed so keys are stable across runs and processes
+ZOBRIST_SEED = 20_231_120
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys whose XOR identifies a position
+
+    A position's key is the XOR of one key per fact about it:
+
+    - ``hand[seat][card][count]``: ``seat`` holds ``count`` copies of ``card``
+      (the key of a count of 0 is 0)
+    - ``pile[seat][card][count]``: ``seat`` has won ``count`` copies of ``card``
+    - ``trick[slot][card]``: ``card`` is the ``slot``-th card of the current trick
+    - ``to_move[seat]``: ``seat`` plays next
+    - ``trump[suit]``: ``suit`` is trump
+
+    Moving one card changes a handful of facts, so keys are updated in O(1)
+    with :meth:`move_count` and friends instead of being recomputed. Cards
+    are integers as in :class:`CardLayout`.
+    """
+
+    def __init__(self, n_cards: int, max_seats: int = 5, max_copies: int = 4, seed: int = ZOBRIST_SEED):
+        self.n_cards = n_cards
+        self.max_seats = max_seats
+        self.max_copies = max_copies
+
+        rng = np.random.default_rng(seed)
+
+        def keys(*shape):
+            return rng.integers(1, 2 ** 63, size=shape, dtype=np.int64).tolist()
+
+        def count_keys():
+            return [[[0] + row for row in seat] for seat in keys(max_seats, n_cards, max_copies)]
+
+        self.hand = count_keys()
+        self.pile = count_keys()
+        self.trick = keys(max_seats, n_cards)
+        self.to_move = keys(max_seats)
+        self.trump = keys(len(Card.suits))
+
+    def counts_key(self, table: list, seat: int, counts) -> int:
+        key = 0
+        for c, n in enumerate(counts):
+            key ^= table[seat][c][n]
+        return key
+
+    @staticmethod
+    def move_count(table: list, seat: int, card: int, old: int, new: int) -> int:
+        """Key change when ``seat`` goes from ``old`` to ``new`` copies of ``card``"""
+        keys = table[seat][card]
+        return keys[old] ^ keys[new]
+
+
+class ZobristTracker(GameObserver):
+    """
+    Keep the Zobrist key of a live game up to date from its events
+
+    The key covers the hands of the players in the hand (and the kitty),
+    the cards each player has won, the current trick, trump and the player
+    to move, so it identifies the position for caching and for finding
+    duplicate positions in logs. Each card moved costs O(1); only the start
+    of a hand recomputes the key.
+
+    Seats are player indices, and the kitty uses the seat after the players.
+    By default the keys are those of the deck's :class:`CardLayout`, which
+    :class:`Position` and :func:`state_key` use too, so keys of live games,
+    solver positions and logged states come from one table.
+    """
+
+    def __init__(self, game: 'Pinochle', keys: Optional[ZobristKeys] = None):
+        from GameLogic.positions import CardLayout
+
+        self.game = game
+        self.layout = CardLayout.for_values(game.rules.deck_type.values)
+        self.keys = keys or self.layout.zobrist
+        self.hand_counts = {}
+        self.pile_counts = {}
+        self.key = self.reset(game)
+        game.attach(self)
+
+    def detach(self):
+        self.game.detach(self)
+
+    def seat(self, player: 'PinochlePlayer') -> int:
+        return len(self.game.players) if player.index == -1 else player.index
+
+    def reset(self, game: 'Pinochle') -> int:
+        """Recompute the card counts and the key of ``game`` from scratch"""
+        layout, keys, key = self.layout, self.keys, 0
+        players = list(game.current_players)
+        if getattr(game, 'kitty', None) is not None:
+            players.append(game.kitty)
+
+        self.hand_counts, self.pile_counts = {}, {}
+        for player in players:
+            seat = self.seat(player)
+            self.hand_counts[seat] = layout.counts(player.hand.cards)
+            self.pile_counts[seat] = layout.counts(card for trick in player.tricks for card in trick)
+            key ^= keys.counts_key(keys.hand, seat, self.hand_counts[seat])
+            key ^= keys.counts_key(keys.pile, seat, self.pile_counts[seat])
+
+        if game.trump is not None:
+            key ^= keys.trump[Card.suits.index(game.trump)]
+            to_move = self._to_move(game)
+            if to_move is not None:
+                key ^= keys.to_move[self.seat(to_move)]
+
+        trick = game.trick
+        if trick is not None and not self._trick_won(game):
+            for slot, card in enumerate(trick.cards):
+                key ^= keys.trick[slot][layout.index(card)]
+
+        self.key = key
+        return key
+
+    @staticmethod
+    def _trick_won(game: 'Pinochle') -> bool:
+        # Once a trick is won, every card played this hand is in someone's pile
+        won = sum(len(trick) for player in game.current_players for trick in player.tricks)
+        return won == len(game.cards_played)
+
+    @staticmethod
+    def _to_move(game: 'Pinochle') -> Optional['PinochlePlayer']:
+        trick = game.trick
+        if trick is None or not len(trick):
+            return game.lead_player
+        if trick.complete:
+            return trick.winner()
+        return game.get_next_player()
+
+    def _move(self, table: list, counts: dict, seat: int, c: int, change: int):
+        old = counts[seat][c]
+        counts[seat][c] = old + change
+        self.key ^= ZobristKeys.move_count(table, seat, c, old, old + change)
+
+    def on_hand_started(self, event: HandStarted):
+        self.reset(event.game)
+
+    def on_trump_called(self, event: TrumpCalled):
+        self.key ^= self.keys.trump[Card.suits.index(event.trump)]
+        self.key ^= self.keys.to_move[self.seat(event.game.lead_player)]
+
+    def on_cards_passed(self, event: CardsPassed):
+        from_seat, to_seat = self.seat(event.from_player), self.seat(event.to_player)
+        for card in event.cards:
+            c = self.layout.index(card)
+            self._move(self.keys.hand, self.hand_counts, from_seat, c, -1)
+            self._move(self.keys.hand, self.hand_counts, to_seat, c, 1)
+
+    def on_card_played(self, event: CardPlayed):
+        keys, seat = self.keys, self.seat(event.player)
+        c = self.layout.index(event.card)
+        self._move(keys.hand, self.hand_counts, seat, c, -1)
+        self.key ^= keys.trick[len(event.trick) - 1][c]
+
+        # The player to move changes from this player to the next one, or to the trick winner
+        trick = event.trick
+        next_player = trick.winner() if trick.complete else event.game.get_next_player()
+        self.key ^= keys.to_move[seat] ^ keys.to_move[self.seat(next_player)]
+
+    def on_trick_won(self, event: TrickWon):
+        keys, seat = self.keys, self.seat(event.player)
+        for slot, card in enumerate(event.trick.cards):
+            c = self.layout.index(card)
+            self.key ^= keys.trick[slot][c]
+            self._move(keys.pile, self.pile_counts, seat, c, 1)
+
+
+def state_key(state: dict, keys: Optional[ZobristKeys] = None) -> int:
+    """Zobrist key of a logged game state, e.g. to find duplicate positions in state logs"""
+    from GameLogic.games import Pinochle
+
+    game = Pinochle.restore_state(state)
+    tracker = ZobristTracker(game, keys)
+    tracker.detach()
+    return tracker.key
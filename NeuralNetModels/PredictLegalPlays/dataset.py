@@ -52,7 +52,7 @@ class LegalPlaysDatasetBuilder(DatasetBuilder):
         for idx in range(n):
             self.deck.shuffle()
             hands = [Hand(cards) for cards in self.deck.deal()]
-            n_cards_played = np.random.randint(self.deck.n_players - 1)
+            n_cards_played = self.deck.rng.integers(self.deck.n_players - 1)
             trump = hands[idx % self.deck.n_players].choose_random_suit()
             trick = Trick(trump)
             for hand_idx in range(n_cards_played):